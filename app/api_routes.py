@@ -1,9 +1,11 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel as PydanticBaseModel
 from typing import Optional
 from uuid import uuid4
 
 from app.flow_controller import handle_message
+from app import index_status, llm_breaker, llm_scheduler, llm_telemetry
 
 router = APIRouter()
 
@@ -25,3 +27,31 @@ async def chat_endpoint(body: ChatRequest):
     reply, needs_human = handle_message(message=message, session_id=session_id)
 
     return ChatResponse(reply=reply, needs_human=needs_human, session_id=session_id)
+
+
+@router.get("/health/live")
+async def health_live():
+    # processo de pe e event loop respondendo (nao depende de banco/indices)
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def health_ready():
+    components = index_status.snapshot()
+    warming = [name for name, c in components.items() if c.get("status") in ("idle", "pending", "building")]
+    failed = [name for name, c in components.items() if c.get("status") == "failed"]
+    # sem banco o bot nao funciona; indices com falha apenas degradam para o caminho lexical
+    ready = not warming and components.get("db", {}).get("status") != "failed"
+    body = {
+        "status": "ready" if ready else "warming",
+        "degraded": bool(failed),
+        "components": components,
+    }
+    return JSONResponse(content=body, status_code=200 if ready else 503)
+
+
+@router.get("/metrics")
+async def metrics():
+    # contadores/histogramas das chamadas LLM, circuit breakers e orcamento do scheduler (texto do Prometheus)
+    body = llm_telemetry.render_prometheus() + llm_breaker.render_prometheus() + llm_scheduler.render_prometheus()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,165 @@
+"""
+Cache em memoria dos dados vivos do catalogo (preco, estoque, ativo...).
+
+O indice vetorial guarda so o que muda pouco (texto, nome, unidade); preco e
+estoque sao sobrepostos na hora da busca a partir deste cache. O snapshot do
+catalogo inteiro e recarregado numa unica query quando passa do TTL; ids que
+nao estao no snapshot (produto recem-criado) sao buscados com um unico `IN`.
+
+Cada produto carrega tambem a tabela de conversao de embalagem ("conversao":
+kg/L/m/m2 por unidade, pecas por caixa) calculada no sync de atributos.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from database import SessionLocal, Produto, CategoriaProduto, ProdutoAtributo
+from app.text_utils import norm
+from app import product_attributes, settings
+
+_lock = threading.Lock()
+_rows: Dict[int, Dict[str, Any]] = {}
+_categories: Dict[int, str] = {}
+_loaded_at: float = 0.0
+
+
+def _row(p: Produto) -> Dict[str, Any]:
+    return {
+        "id_produto": int(p.id),
+        "nome": p.nome,
+        "unidade": (p.unidade or "UN").strip(),
+        "preco": float(p.preco) if p.preco is not None else 0.0,
+        "estoque": float(p.estoque_atual) if p.estoque_atual is not None else 0.0,
+        "ativo": bool(p.ativo),
+        "id_categoria": p.id_categoria,
+    }
+
+
+def _fetch(ids: Optional[List[int]] = None) -> Dict[int, Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        qry = db.query(Produto)
+        if ids is not None:
+            qry = qry.filter(Produto.id.in_(ids))
+        return {int(p.id): _row(p) for p in qry.all()}
+    finally:
+        db.close()
+
+
+def _fetch_conversions(ids: Optional[List[int]] = None) -> Dict[int, Dict[str, float]]:
+    db = SessionLocal()
+    try:
+        qry = db.query(ProdutoAtributo)
+        if ids is not None:
+            qry = qry.filter(ProdutoAtributo.id_produto.in_(ids))
+        return {int(a.id_produto): product_attributes.conversion_row(a) for a in qry.all()}
+    except Exception as e:
+        # sem a tabela (sync ainda nao rodou): conversao sai do nome sob demanda
+        print(f"[catalog_cache] conversoes indisponiveis: {str(e)[:120]}")
+        return {}
+    finally:
+        db.close()
+
+
+def _with_conversions(rows: Dict[int, Dict[str, Any]], conversions: Dict[int, Dict[str, float]]) -> Dict[int, Dict[str, Any]]:
+    for pid, row in rows.items():
+        row["conversao"] = conversions.get(pid)
+    return rows
+
+
+def _fetch_categories() -> Dict[int, str]:
+    db = SessionLocal()
+    try:
+        return {int(c.id): c.nome or "" for c in db.query(CategoriaProduto).all()}
+    finally:
+        db.close()
+
+
+def _is_stale(now: float) -> bool:
+    return not _rows or (now - _loaded_at) > settings.CATALOG_CACHE_TTL_S
+
+
+def refresh() -> int:
+    """Recarrega o snapshot inteiro do catalogo. Retorna quantos produtos carregou."""
+    global _rows, _categories, _loaded_at
+    rows = _with_conversions(_fetch(), _fetch_conversions())
+    categories = _fetch_categories()
+    with _lock:
+        _rows = rows
+        _categories = categories
+        _loaded_at = time.monotonic()
+    return len(rows)
+
+
+def snapshot() -> Dict[int, Dict[str, Any]]:
+    """Catalogo vivo por id (recarrega se passou do TTL). Nao altere os dicts retornados."""
+    if _is_stale(time.monotonic()):
+        refresh()
+    return _rows
+
+
+def get_many(ids: Iterable[Any]) -> Dict[int, Dict[str, Any]]:
+    """Dados vivos dos ids pedidos; ids inexistentes simplesmente nao aparecem."""
+    wanted: List[int] = []
+    for i in ids:
+        try:
+            wanted.append(int(i))
+        except (TypeError, ValueError):
+            continue
+    if not wanted:
+        return {}
+
+    rows = snapshot()
+    missing = [i for i in wanted if i not in rows]
+    if missing:
+        extra = _fetch(missing)
+        if extra:
+            _with_conversions(extra, _fetch_conversions(list(extra)))
+            with _lock:
+                _rows.update(extra)
+            rows = _rows
+    return {i: rows[i] for i in wanted if i in rows}
+
+
+def conversions(product_id: Any, nome: Optional[str] = None) -> Dict[str, float]:
+    """
+    Quanto vem em cada unidade do produto, por unidade pedida: {"kg": 50.0, "m": 6.0, ...}.
+    Sem linha na tabela de atributos, calcula a partir do nome.
+    """
+    try:
+        row = get_many([product_id]).get(int(product_id))
+    except Exception as e:
+        print(f"[catalog_cache] conversao sem cache ({product_id}): {str(e)[:120]}")
+        row = None
+    conv = (row or {}).get("conversao")
+    if conv:
+        return conv
+    nome = nome or (row or {}).get("nome")
+    if not nome:
+        return {}
+    return product_attributes.conversion_row(product_attributes.packaging_conversions(nome))
+
+
+def category_ids(hint: str) -> List[int]:
+    """Ids das categorias cujo nome contem o `hint` (sem acento/caixa), como o ILIKE do SQL."""
+    h = norm(hint)
+    if not h:
+        return []
+    snapshot()
+    return sorted(cid for cid, nome in _categories.items() if h in norm(nome))
+
+
+def invalidate(ids: Optional[Iterable[Any]] = None) -> None:
+    """Descarta o cache inteiro (ou so alguns ids, ex.: apos atualizar preco/estoque)."""
+    global _rows, _categories, _loaded_at
+    with _lock:
+        if ids is None:
+            _rows = {}
+            _categories = {}
+            _loaded_at = 0.0
+            return
+        for i in ids:
+            try:
+                _rows.pop(int(i), None)
+            except (TypeError, ValueError):
+                continue
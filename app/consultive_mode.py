@@ -11,7 +11,7 @@ from sqlalchemy.orm import Session
 
 from app.rag_products import search_products_semantic
 from app.text_utils import norm, BASE_PRODUCT_WORDS
-from app.product_search import format_options
+from app.product_search import category_filter_for, format_options
 from database import SessionLocal, Produto
 
 
@@ -95,8 +95,14 @@ def answer_consultive_question(question: str, context_product: str = None) -> Tu
     # Prioriza busca SQL ancorada no produto para evitar "alucinação" do RAG
     products = _sql_find_products_by_keyword(product_keyword, k=6) if product_keyword else []
     if not products:
-        # Busca produtos relevantes no RAG (threshold baixo para perguntas)
-        products = search_products_semantic(query, k=3, min_relevance=0.25)
+        # Busca produtos relevantes no RAG (threshold baixo para perguntas), ja filtrada no indice
+        products = search_products_semantic(
+            query,
+            k=3,
+            min_relevance=0.25,
+            in_stock=True,
+            category=category_filter_for(product_keyword),
+        )
 
     # Filtro leve: se houve palavra-chave, mantém apenas itens que contenham a palavra no nome
     if product_keyword and products:
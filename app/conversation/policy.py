@@ -5,6 +5,9 @@ Pergunta o minimo necessario e escolhe atributo que mais reduz candidatos.
 from __future__ import annotations
 
 from typing import Dict, Any, List, Optional
+
+import numpy as np
+
 from app import catalog_schema
 from app.text_utils import norm
 
@@ -25,26 +28,70 @@ def _attribute_missing(schema_attrs: List[Dict[str, Any]], attributes: Dict[str,
     return missing
 
 
-def _info_gain_attribute(missing: List[Dict[str, Any]], candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    if not candidates or len(candidates) <= 1:
+def attribute_codes(candidates: List[Dict[str, Any]], keys: List[str]) -> np.ndarray:
+    """
+    Matriz (candidatos x atributos) de codigos categoricos int32.
+    0 = atributo ausente no candidato; 1..n = valores distintos da coluna.
+    """
+    n = len(candidates)
+    codes = np.zeros((n, len(keys)), dtype=np.int32)
+    attrs = [c.get("attributes") or {} for c in candidates]
+    for j, key in enumerate(keys):
+        values = [a.get(key) for a in attrs]
+        try:
+            distinct = dict.fromkeys(values)
+        except TypeError:
+            # valor nao hashable (lista vinda do JSON): compara pela representacao
+            values = [v if v is None or isinstance(v, (str, int, float)) else str(v) for v in values]
+            distinct = dict.fromkeys(values)
+        mapping = {v: i for i, v in enumerate(distinct, start=1)}
+        mapping[None] = 0
+        mapping[""] = 0
+        codes[:, j] = np.fromiter(map(mapping.__getitem__, values), dtype=np.int32, count=n)
+    return codes
+
+
+def expected_info_gain(codes: np.ndarray) -> np.ndarray:
+    """
+    Reducao esperada de entropia (bits) do conjunto de candidatos por coluna.
+
+    Resposta v (probabilidade ~ frequencia entre os candidatos com o atributo)
+    deixa os n_v candidatos com esse valor + os que nao tem o atributo (nao da para
+    descarta-los). Ganho = log2(N) - E[log2(n_v + n_ausentes)].
+    """
+    n, k = codes.shape
+    if n <= 1 or k == 0:
+        return np.zeros(k, dtype=np.float64)
+    width = int(codes.max()) + 1
+    # contagem por (coluna, codigo) num unico bincount
+    flat = codes + (np.arange(k, dtype=np.int64) * width)[None, :]
+    counts = np.bincount(flat.ravel(), minlength=k * width).reshape(k, width).astype(np.float64)
+    missing = counts[:, 0]
+    known = counts[:, 1:]
+    n_known = n - missing
+    remaining = known + missing[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = np.where(known > 0, known * np.log2(np.maximum(remaining, 1.0)), 0.0).sum(axis=1) / n_known
+        gain = np.log2(n) - expected
+    return np.where(n_known > 0, np.maximum(gain, 0.0), 0.0)
+
+
+def _info_gain_attribute(
+    missing: List[Dict[str, Any]],
+    candidates: List[Dict[str, Any]],
+    asked_attributes: Optional[Dict[str, int]] = None,
+) -> Optional[Dict[str, Any]]:
+    if not candidates or len(candidates) <= 1 or not missing:
         return None
-    best = None
-    best_score = -1
-    for attr in missing:
-        key = attr.get("key")
-        buckets = {}
-        for c in candidates:
-            val = (c.get("attributes") or {}).get(key)
-            buckets.setdefault(val, 0)
-            buckets[val] += 1
-        if len(buckets) <= 1:
-            continue
-        # score simples: mais particoes => mais ganho
-        score = len(buckets)
-        if score > best_score:
-            best_score = score
-            best = attr
-    return best
+    keys = [attr.get("key") for attr in missing]
+    gain = expected_info_gain(attribute_codes(candidates, keys))
+    if not np.any(gain > 1e-9):
+        return None
+    asked = asked_attributes or {}
+    asked_counts = np.array([asked.get(key, 0) for key in keys], dtype=np.int32)
+    # maior ganho; empate -> atributo menos perguntado; depois ordem do schema
+    order = np.lexsort((np.arange(len(keys)), asked_counts, -np.round(gain, 9)))
+    return missing[int(order[0])]
 
 
 def next_action(
@@ -91,7 +138,7 @@ def next_action(
         return {"action": "confirm", "slot": None, "question": "Certo, vou seguir com seu pedido."}
 
     # escolher atributo a perguntar: informação + required + não saturado
-    attr_choice = _info_gain_attribute(missing_required, candidates) or missing_required[0]
+    attr_choice = _info_gain_attribute(missing_required, candidates, asked_attributes) or missing_required[0]
 
     key = attr_choice.get("key")
     ask_count = asked_attributes.get(key, 0)
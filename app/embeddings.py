@@ -0,0 +1,227 @@
+"""
+Backends de embeddings compartilhados pelos indices vetoriais (produtos e FAQ).
+
+- EMBED_BACKEND=hf (padrao): sentence-transformers via HuggingFaceEmbeddings;
+  um unico modelo carregado por processo, reaproveitado pelos dois indices.
+- EMBED_BACKEND=hashing: `HashingEmbeddings` (n-gramas de caracteres + feature
+  hashing + TF-IDF). Sem download, poucos MB de memoria, deterministico.
+
+Se o modelo HF nao carregar (sem rede, pouca memoria), o hashing entra como
+modo degradado (EMBED_HASHING_FALLBACK=true) em vez de desligar a busca semantica.
+Cada indice tem sua propria instancia de hashing, pois o IDF e ajustado ao corpus
+dele (numa copia, ver `index_build.fit_embedder`) e persistido no manifesto do indice.
+"""
+import hashlib
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app import settings
+from app.text_utils import norm
+
+try:
+    from langchain_huggingface import HuggingFaceEmbeddings
+except ImportError:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+
+# Modelo bom para PT-BR e buscas "parecidas"
+EMBED_MODEL_NAME = os.getenv(
+    "EMBED_MODEL_NAME",
+    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+)
+
+_lock = threading.Lock()
+_hf_model: Optional[HuggingFaceEmbeddings] = None
+_hf_failed: bool = False
+_hashing: Dict[str, "HashingEmbeddings"] = {}
+_degraded_warned: bool = False
+
+
+class HashingEmbeddings:
+    """
+    Embeddings lexicais: n-gramas de caracteres de cada palavra (com bordas),
+    projetados por hashing com sinal num vetor de `dim` posicoes, TF sublinear
+    e IDF por posicao (quando ajustado com `fit`). Vetores normalizados (L2).
+
+    Tolera erros de digitacao e variacoes ("cimeto" ~ "cimento") porque a
+    maior parte dos n-gramas continua igual.
+    """
+
+    def __init__(self, dim: int = 1024, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = int(dim)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.model_name = f"hashing-char{self.ngram_range[0]}-{self.ngram_range[1]}-d{self.dim}"
+        self._idf: Optional[np.ndarray] = None
+
+    def _features(self, text: str) -> Dict[int, float]:
+        """Posicao -> contagem com sinal dos n-gramas do texto."""
+        lo, hi = self.ngram_range
+        counts: Dict[int, float] = {}
+        for tok in norm(text).split():
+            padded = f"<{tok}>"
+            grams = [padded] if len(padded) <= lo else []
+            for n in range(lo, hi + 1):
+                grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+            for g in grams:
+                h = int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little")
+                idx = h % self.dim
+                sign = 1.0 if (h >> 63) & 1 else -1.0
+                counts[idx] = counts.get(idx, 0.0) + sign
+        return counts
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for idx, c in self._features(text).items():
+            if c:
+                # TF sublinear preservando o sinal do hashing
+                vec[idx] = math.copysign(1.0 + math.log(abs(c)), c)
+        if self._idf is not None:
+            vec *= self._idf
+        n = float(np.linalg.norm(vec))
+        return vec / n if n > 0 else vec
+
+    def fit(self, texts: Sequence[str]) -> "HashingEmbeddings":
+        """Ajusta o IDF (suavizado) ao corpus do indice."""
+        df = np.zeros(self.dim, dtype=np.float64)
+        n_docs = 0
+        for t in texts:
+            n_docs += 1
+            for idx in self._features(t):
+                df[idx] += 1.0
+        if n_docs:
+            self._idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+        return self
+
+    def embed_documents(self, texts: Sequence[str]) -> List[List[float]]:
+        return [self._vector(t).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text).tolist()
+
+    def state(self) -> Dict[str, Any]:
+        """Estado serializavel (vai para o manifesto do indice)."""
+        return {
+            "model_name": self.model_name,
+            "idf": None if self._idf is None else [round(float(x), 5) for x in self._idf],
+        }
+
+    def load_state(self, state: Optional[Dict[str, Any]]) -> bool:
+        if not isinstance(state, dict) or state.get("model_name") != self.model_name:
+            return False
+        idf = state.get("idf")
+        if idf is not None and len(idf) != self.dim:
+            return False
+        self._idf = None if idf is None else np.asarray(idf, dtype=np.float32)
+        return True
+
+
+def _load_hf_model() -> Optional[HuggingFaceEmbeddings]:
+    global _hf_model, _hf_failed
+
+    if _hf_failed:
+        return None
+
+    if _hf_model is not None:
+        return _hf_model
+
+    offline_mode = os.getenv("HF_OFFLINE", "0") == "1"
+
+    if offline_mode:
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+    max_retries = 2 if not offline_mode else 1
+    for attempt in range(max_retries):
+        try:
+            if not offline_mode and attempt == 0:
+                os.environ["TRANSFORMERS_OFFLINE"] = "0"
+                os.environ.pop("HF_HUB_OFFLINE", None)
+            else:
+                os.environ["TRANSFORMERS_OFFLINE"] = "1"
+                os.environ["HF_HUB_OFFLINE"] = "1"
+
+            _hf_model = HuggingFaceEmbeddings(
+                model_name=EMBED_MODEL_NAME,
+                model_kwargs={"trust_remote_code": True},
+                encode_kwargs={"normalize_embeddings": True},
+            )
+            print(f"✅ Modelo de embeddings carregado: {EMBED_MODEL_NAME} (offline={os.environ.get('TRANSFORMERS_OFFLINE', '0')})")
+            return _hf_model
+        except Exception as e:
+            attempt_num = attempt + 1
+            error_str = str(e)
+
+            if "huggingface.co" in error_str.lower() or "timeout" in error_str.lower() or "connection" in error_str.lower():
+                print(f"⚠️ Problema de conexão com HuggingFace (tentativa {attempt_num}/{max_retries})")
+                if attempt < max_retries - 1:
+                    print("   Tentando novamente em modo offline...")
+                    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+                    os.environ["HF_HUB_OFFLINE"] = "1"
+                    continue
+            else:
+                print(f"⚠️ Erro ao carregar embeddings: {error_str[:200]}")
+
+            if attempt >= max_retries - 1:
+                print("❌ Falha ao carregar modelo de embeddings.")
+                _hf_failed = True
+                return None
+
+    return None
+
+
+def get_hashing_embeddings(index_name: str) -> HashingEmbeddings:
+    """Instancia de hashing do indice (IDF proprio por indice)."""
+    with _lock:
+        emb = _hashing.get(index_name)
+        if emb is None:
+            emb = HashingEmbeddings(dim=settings.HASHING_EMBED_DIM)
+            _hashing[index_name] = emb
+        return emb
+
+
+def get_embeddings(index_name: str) -> Optional[Any]:
+    """
+    Embeddings para o indice `index_name` ("products", "knowledge"...).
+    None apenas se o modelo HF falhar e o fallback por hashing estiver desligado.
+    """
+    global _degraded_warned
+
+    if settings.EMBED_BACKEND == "hashing":
+        return get_hashing_embeddings(index_name)
+
+    with _lock:
+        model = _load_hf_model()
+    if model is not None:
+        return model
+
+    if not settings.EMBED_HASHING_FALLBACK:
+        return None
+    if not _degraded_warned:
+        _degraded_warned = True
+        print("[WARN] Embeddings HF indisponiveis: usando embeddings por hashing (modo degradado).")
+    return get_hashing_embeddings(index_name)
+
+
+def embedder_name(embeddings: Any) -> str:
+    """Identificador do backend (vai para o manifesto; troca de backend => rebuild)."""
+    return str(getattr(embeddings, "model_name", None) or EMBED_MODEL_NAME)
+
+
+def embedder_state(embeddings: Any) -> Optional[Dict[str, Any]]:
+    state = getattr(embeddings, "state", None)
+    return state() if callable(state) else None
+
+
+def restore_embedder_state(embeddings: Any, state: Optional[Dict[str, Any]]) -> None:
+    load = getattr(embeddings, "load_state", None)
+    if callable(load) and state:
+        load(state)
+
+
+def is_degraded() -> bool:
+    """True quando o modelo HF falhou e as buscas estao no hashing."""
+    return settings.EMBED_BACKEND != "hashing" and _hf_failed
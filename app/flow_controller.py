@@ -20,11 +20,10 @@ from app.product_search import (
     db_find_best_products,
     format_options,
     db_get_product_by_id,
-    db_find_best_products_with_constraints,
+    db_find_products_tiered,
 )
 from app.parsing import (
-    extract_kg_quantity,
-    suggest_units_from_packaging,
+    extract_measure_quantity,
     extract_product_hint,
 )
 from app.preferences import handle_preferences, message_is_preferences_only, maybe_register_address
@@ -35,6 +34,7 @@ from app.checkout_handlers.extractors import extract_email
 from app.consultive_mode import answer_consultive_question
 from app.llm_service import (
     route_intent,
+    route_and_plan,
     plan_consultive_next_step,
     generate_technical_synthesis,
     extract_product_factors,
@@ -44,6 +44,9 @@ from app.flows.technical_recommendations import can_generate_technical_answer
 from app.search_utils import extract_catalog_constraints_from_consultive
 from app.rag_knowledge import format_knowledge_answer
 from app import catalog_schema
+from app import product_attributes
+from app import intent_classifier
+from app import speculation
 from app.nlu import extractor
 from app.conversation import policy as conversation_policy
 from app.nlu.expected_parser import parse_expected_field
@@ -55,7 +58,7 @@ from app.session_state import (
 )
 
 # Importa dos modulos flows/
-from app.flows.quantity import handle_pending_qty
+from app.flows.quantity import handle_pending_qty, suggest_units_for_product
 from app.flows.removal import (
     is_remove_intent,
     start_remove_flow,
@@ -136,8 +139,8 @@ def _matches_expected_kind(message: str, prompt: Dict[str, Any]) -> bool:
             return 1 <= val <= int(limit)
         return True
     if kind == "quantity":
-        from app.parsing import extract_units_quantity, extract_plain_number, extract_kg_quantity
-        return any(v is not None for v in [extract_units_quantity(message), extract_plain_number(message), extract_kg_quantity(message)])
+        from app.parsing import extract_units_quantity, extract_plain_number
+        return any(v is not None for v in [extract_units_quantity(message), extract_plain_number(message), extract_measure_quantity(message)])
     if kind == "free_text":
         return True
     return False
@@ -152,7 +155,7 @@ def _resume_previous_prompt(session_id: str, faq_reply: str, pending: Dict[str,
 def resolve_faq_or_product_query(message: str) -> Optional[str]:
     hint = extract_product_hint(message)
     if hint:
-        options = db_find_best_products(hint, k=3) or []
+        options = db_find_best_products(hint, k=3, category_hint=hint) or []
         if options:
             names = ", ".join([o.get("nome", "") for o in options[:3] if o.get("nome")])
             return f"Temos opcoes relacionadas a {hint}: {names}.\nQuer que eu siga com um orcamento ou uma recomendacao tecnica?"
@@ -244,7 +247,7 @@ def auto_suggest_products(message: str, session_id: str) -> Optional[str]:
             return start_usage_context_flow(session_id, hint, known_ctx)
         return ask_usage_context(session_id, hint)
 
-    options = db_find_best_products(hint, k=6) or []
+    options = db_find_best_products(hint, k=6, category_hint=hint) or []
     if not options:
         return (
             f"Nao encontrei nada no catalogo parecido com **{hint}**.\n\n"
@@ -254,7 +257,7 @@ def auto_suggest_products(message: str, session_id: str) -> Optional[str]:
             "- **trena 5m**"
         )
 
-    requested_kg = extract_kg_quantity(message)
+    requested = extract_measure_quantity(message)
 
     last_suggestions: List[Dict[str, Any]] = []
     for o in options:
@@ -274,14 +277,14 @@ def auto_suggest_products(message: str, session_id: str) -> Optional[str]:
         {
             "last_suggestions": last_suggestions,
             "last_hint": hint,
-            "last_requested_kg": requested_kg,
+            "last_requested_measure": list(requested) if requested else None,
         },
     )
 
     extra = ""
     first_prod = db_get_product_by_id(int(last_suggestions[0]["id"]))
-    if requested_kg is not None and first_prod:
-        conv = suggest_units_from_packaging(first_prod.nome, requested_kg)
+    if requested is not None and first_prod:
+        conv = suggest_units_for_product(first_prod, *requested)
         if conv:
             _, conv_text = conv
             extra = f"\n\nPelo que voce pediu: **{conv_text}**."
@@ -398,16 +401,23 @@ def _set_last_suggestions(session_id: str, options: List[Dict[str, Any]], hint:
         {
             "last_suggestions": last_suggestions,
             "last_hint": hint,
-            "last_requested_kg": None,
+            "last_requested_measure": None,
         },
     )
 
 
-def _catalog_reply_for_query(session_id: str, query: str, clarifying_question: Optional[str], category_hint: Optional[str] = None) -> Optional[str]:
+def _catalog_reply_for_query(
+    session_id: str,
+    query: str,
+    clarifying_question: Optional[str],
+    category_hint: Optional[str] = None,
+    options: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[str]:
     if not query:
         return clarifying_question or "Qual produto voce procura?"
 
-    options = db_find_best_products(query, k=6) or []
+    if options is None:
+        options = db_find_best_products(query, k=6, category_hint=category_hint or query) or []
     if not options:
         return clarifying_question or "Nao encontrei esse produto. Qual voce procura?"
 
@@ -667,9 +677,12 @@ def _reset_conversation_context(session_id: str, message: str) -> None:
 
 def _retrieve_candidates(category: str, attributes: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int]:
     """
-    Placeholder de retrieval hibrido: hoje retorna vazio; plugue RAG/DB aqui.
+    Candidatos da categoria compativeis com os atributos ja informados, com os
+    atributos extraidos do catalogo (tabela produto_atributos). A policy usa esses
+    atributos para perguntar o que realmente divide os candidatos.
     """
-    return [], 0
+    # todos os compativeis: a policy calcula o ganho de informacao sobre o conjunto inteiro
+    return product_attributes.find_candidates(category, attributes, limit=None)
 
 
 def _related_items(category: Optional[str]) -> List[str]:
@@ -723,7 +736,7 @@ def _handle_conversation_engine(session_id: str, message: str) -> Optional[Tuple
             "conversation_attributes": attributes,
             "conversation_constraints": constraints,
             "asked_attributes": asked,
-            "last_candidates": candidates,
+            "last_candidates": candidates[: product_attributes.CANDIDATE_LIMIT],
             "last_action": action.get("action"),
             "last_intent": extraction.get("intent") or st.get("last_intent"),
             "expected_field": action.get("slot"),
@@ -754,14 +767,9 @@ def _search_consultive_catalog(
         constraints = None
 
     if not constraints:
-        items = db_find_best_products_with_constraints(
-            query_base,
-            k=6,
-            category_hint=product_hint or None,
-            strict=False,
-        )
+        items = db_find_products_tiered(query_base, k=6, category_hint=product_hint or None)["items"]
         if not items and query_base:
-            items = db_find_best_products(query_base, k=6) or []
+            items = db_find_best_products(query_base, k=6, category_hint=product_hint or None) or []
         return {
             "items": items,
             "exact_match_found": False,
@@ -770,34 +778,15 @@ def _search_consultive_catalog(
             "constraints": {},
         }
 
-    category_hint = constraints.get("category_hint") or product_hint or None
-    must_terms = constraints.get("must_terms") or []
-    should_terms = constraints.get("should_terms") or []
-
-    phase1 = db_find_best_products_with_constraints(
+    # uma query so: must -> should viram camadas do ranking em vez de buscas em sequencia
+    result = db_find_products_tiered(
         query_base,
         k=6,
-        category_hint=category_hint,
-        must_terms=must_terms,
-        strict=True,
-    )
-    if phase1:
-        return {
-            "items": phase1,
-            "exact_match_found": True,
-            "unavailable_specs": [],
-            "warning_text": None,
-            "constraints": constraints,
-        }
-
-    unavailable_specs = list(must_terms)
-    phase2 = db_find_best_products_with_constraints(
-        query_base or (category_hint or ""),
-        k=6,
-        category_hint=category_hint,
-        should_terms=should_terms,
-        strict=False,
+        category_hint=constraints.get("category_hint") or product_hint or None,
+        must_terms=constraints.get("must_terms") or [],
+        should_terms=constraints.get("should_terms") or [],
     )
+    unavailable_specs = result["unavailable_specs"]
 
     warning_text = None
     if unavailable_specs:
@@ -808,14 +797,62 @@ def _search_consultive_catalog(
         )
 
     return {
-        "items": phase2,
-        "exact_match_found": False,
+        "items": result["items"],
+        "exact_match_found": result["exact_match_found"],
         "unavailable_specs": unavailable_specs,
         "warning_text": warning_text,
         "constraints": constraints,
     }
 
 
+def _route_turn(
+    message: str,
+    state_summary: Dict[str, Any],
+    known_context: Dict[str, Any],
+) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    (rota, veio_do_llm): modelo local confiante evita a ida ao LLM; senao decide o router.
+    A chamada fundida router+planner so vale em turno consultivo (prompt maior e cache por
+    known_context); checkout, carrinho e conversa vao para o router simples.
+    """
+    route = intent_classifier.predict_route(message, state_summary)
+    if route:
+        return route, False
+    consultive = bool(state_summary.get("consultive_pending")) or is_consultive_question(message)
+    if settings.LLM_FUSED_ROUTER_PLANNER and consultive:
+        return route_and_plan(message, state_summary, known_context), True
+    return route_intent(message, state_summary), True
+
+
+def _start_speculation(session_id: str, message: str, st: Dict[str, Any]) -> Optional[speculation.SpeculativeTurn]:
+    """Dispara rota + busca do hint em paralelo aos fluxos deterministicos (ROUTER_SPECULATIVE_ENABLED)."""
+    if not settings.ROUTER_SPECULATIVE_ENABLED:
+        return None
+    # turnos que os fluxos deterministicos sempre respondem nao valem uma chamada ao LLM
+    if (
+        _should_bypass_router(st, message)
+        or is_greeting(message)
+        or is_hours_question(message)
+        or is_cart_show_request(message)
+        or is_cart_reset_request(message)
+    ):
+        return None
+
+    def _speculative_route(cancelled: Any) -> Optional[Tuple[Any, Any]]:
+        state_summary = _build_state_summary(session_id, st)
+        known_context = _build_known_context(st, {})
+        if cancelled.is_set():
+            return None
+        return (state_summary, known_context), _route_turn(message, state_summary, known_context)
+
+    turn = speculation.SpeculativeTurn()
+    turn.start_route(_speculative_route)
+    hint = extract_product_hint(message)
+    if hint:
+        turn.start_catalog(hint, lambda: db_find_best_products(hint, k=6, category_hint=hint) or [])
+    return turn
+
+
 def _handle_consultive_planner(
     session_id: str,
     message: str,
@@ -824,10 +861,13 @@ def _handle_consultive_planner(
     constraints: Dict[str, Any],
     fallback_to_usage: bool,
     fallback_to_consultive: bool,
+    plan: Optional[Dict[str, Any]] = None,
 ) -> Optional[Tuple[str, bool]]:
-    state_summary = _build_state_summary(session_id, st)
     known_context = _build_known_context(st, constraints)
-    plan = plan_consultive_next_step(message, state_summary, product_hint, known_context)
+    # plano ja veio na chamada fundida do router (route_and_plan): sem segundo hop de LLM
+    if plan is None:
+        state_summary = _build_state_summary(session_id, st)
+        plan = plan_consultive_next_step(message, state_summary, product_hint, known_context)
     if plan:
         plan_conf = float(plan.get("confidence", 0.0) or 0.0)
         if plan_conf < settings.LLM_HARD_BLOCK_THRESHOLD or plan_conf < settings.PLANNER_CONFIDENCE_THRESHOLD:
@@ -921,6 +961,7 @@ def _handle_consultive_planner(
 
 def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
     needs_human = False
+    speculative: Optional[speculation.SpeculativeTurn] = None
     try:
         # Pending prompt handling with interruption support
         st_initial = get_state(session_id)
@@ -945,6 +986,9 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
                     save_chat_db(session_id, message, reply, needs_human)
                     return reply, needs_human
 
+        # Router + busca do hint ja comecam aqui; descartados se um fluxo deterministico responder
+        speculative = _start_speculation(session_id, message, st_initial)
+
         # Se havia pergunta consultiva em aberto, captura a resposta no estado
         _capture_consultive_answer(session_id, message)
 
@@ -1085,7 +1129,7 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
                             "awaiting_qty": False,
                             "last_suggestions": [],
                             "last_hint": None,
-                            "last_requested_kg": None,
+                            "last_requested_measure": None,
                         },
                     )
                     known_ctx = extract_known_usage_context(message)
@@ -1109,7 +1153,21 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
         st_router = get_state(session_id)
         if not _should_bypass_router(st_router, message):
             state_summary = _build_state_summary(session_id, st_router)
-            route = route_intent(message, state_summary)
+            known_context = _build_known_context(st_router, {})
+            # rota especulada so vale se o estado nao mudou desde o inicio do turno
+            decided = speculative.route_for((state_summary, known_context)) if speculative else None
+            route, from_llm = decided if decided is not None else _route_turn(message, state_summary, known_context)
+            if route and not from_llm:
+                logger.info(
+                    "router_local intent=%s action=%s confidence=%.2f session=%s",
+                    route.get("intent"),
+                    route.get("action"),
+                    route.get("confidence", 0.0),
+                    session_id,
+                )
+            elif route and route.get("source") != "cache":
+                # decisao nova do router vira exemplo de treino do modelo local (cache ja foi anotado)
+                intent_classifier.record_decision(message, state_summary, route)
             if route:
                 route_conf = float(route.get("confidence", 0.0) or 0.0)
                 if route_conf < settings.LLM_HARD_BLOCK_THRESHOLD or route_conf < settings.ROUTER_CONFIDENCE_THRESHOLD:
@@ -1145,7 +1203,13 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
                     if gated:
                         router_reply, needs_human = gated
                     else:
-                        router_reply = _catalog_reply_for_query(session_id, search_query, clarifying_question, category_hint)
+                        router_reply = _catalog_reply_for_query(
+                            session_id,
+                            search_query,
+                            clarifying_question,
+                            category_hint,
+                            options=speculative.catalog_for(search_query) if speculative else None,
+                        )
                     if router_reply:
                         router_reply = sanitize_reply(router_reply)
                         save_chat_db(session_id, message, router_reply, needs_human)
@@ -1156,7 +1220,13 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
                     if gated:
                         router_reply, needs_human = gated
                     else:
-                        router_reply = _catalog_reply_for_query(session_id, search_query, clarifying_question, category_hint)
+                        router_reply = _catalog_reply_for_query(
+                            session_id,
+                            search_query,
+                            clarifying_question,
+                            category_hint,
+                            options=speculative.catalog_for(search_query) if speculative else None,
+                        )
                     if router_reply:
                         router_reply = sanitize_reply(router_reply)
                         save_chat_db(session_id, message, router_reply, needs_human)
@@ -1173,6 +1243,7 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
                             constraints=constraints,
                             fallback_to_usage=True,
                             fallback_to_consultive=False,
+                            plan=route.get("plan"),
                         )
                         if planned:
                             router_reply, needs_human = planned
@@ -1201,6 +1272,7 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
                         constraints=constraints,
                         fallback_to_usage=not _has_consultive_context(st_router, constraints),
                         fallback_to_consultive=True,
+                        plan=route.get("plan"),
                     )
                     if planned:
                         router_reply, needs_human = planned
@@ -1383,3 +1455,6 @@ def handle_message(message: str, session_id: str) -> Tuple[str, bool]:
         reply = sanitize_reply(reply)
         save_chat_db(session_id, message, reply, needs_human)
         return reply, needs_human
+    finally:
+        if speculative is not None:
+            speculative.cancel()
@@ -19,7 +19,7 @@ from typing import Optional, Dict, List, Any
 from app.session_state import get_state, patch_state
 from app.text_utils import norm
 from app.search_utils import extract_catalog_constraints_from_consultive
-from app.product_search import db_find_best_products_with_constraints
+from app.product_search import db_find_products_tiered
 
 
 # Fluxos de investigação por produto genérico
@@ -241,34 +241,16 @@ def continue_investigation(session_id: str, message: str) -> Optional[str]:
         "consultive_catalog_constraints": constraints,
     })
 
-    products = db_find_best_products_with_constraints(
+    # uma query so: must -> should -> hint do produto viram camadas do ranking
+    result = db_find_products_tiered(
         enriched_query,
         k=6,
         category_hint=category_hint,
         must_terms=must_terms,
-        strict=True,
+        should_terms=should_terms,
+        fallback_query=product_hint,
     )
-
-    strict_failed = False
-    if not products:
-        strict_failed = True
-
-    if not products:
-        products = db_find_best_products_with_constraints(
-            enriched_query or product_hint,
-            k=6,
-            category_hint=category_hint,
-            should_terms=should_terms,
-            strict=False,
-        )
-
-    if not products:
-        products = db_find_best_products_with_constraints(
-            product_hint,
-            k=6,
-            category_hint=category_hint,
-            strict=False,
-        )
+    products = result["items"]
 
     if not products:
         # Nao encontrou produtos
@@ -282,15 +264,7 @@ def continue_investigation(session_id: str, message: str) -> Optional[str]:
         )
 
     # Se relaxou constraint, avisa apenas se termos obrigatorios continuam ausentes
-    unavailable_specs = []
-    if strict_failed and must_terms:
-        def _product_has_term(prod: Any, term: str) -> bool:
-            text = norm(f"{getattr(prod, 'nome', '')} {getattr(prod, 'descricao', '')} {prod.get('nome','') if isinstance(prod, dict) else ''} {prod.get('descricao','') if isinstance(prod, dict) else ''}")
-            return norm(term) in text
-
-        for term in must_terms:
-            if not any(_product_has_term(p, term) for p in products):
-                unavailable_specs.append(term)
+    unavailable_specs = result["unavailable_specs"]
 
     # Armazena sugestoes para permitir escolha numerica/falada
     last_suggestions: List[Dict[str, Any]] = []
@@ -306,7 +280,7 @@ def continue_investigation(session_id: str, message: str) -> Optional[str]:
             {
                 "last_suggestions": last_suggestions,
                 "last_hint": product_hint,
-                "last_requested_kg": None,
+                "last_requested_measure": None,
                 "consultive_investigation": False,  # encerra investigacao para permitir escolha numerica
             },
         )
@@ -32,12 +32,12 @@ def handle_suggestions_choice(session_id: str, message: str) -> Optional[str]:
         return None
 
     chosen_id = suggestions[idx0]["id"]
-    requested_kg = st.get("last_requested_kg")
+    requested = st.get("last_requested_measure")
 
-    patch_state(session_id, {"last_suggestions": [], "last_hint": None, "last_requested_kg": None})
+    patch_state(session_id, {"last_suggestions": [], "last_hint": None, "last_requested_measure": None})
 
     produto = db_get_product_by_id(int(chosen_id))
     if not produto:
         return "Não consegui localizar essa opção agora. Pode tentar de novo?"
 
-    return set_pending_for_qty(session_id, produto, requested_kg=requested_kg)
+    return set_pending_for_qty(session_id, produto, requested=requested)
@@ -1,17 +1,33 @@
-from typing import Optional
+from typing import Optional, Sequence, Tuple
 
 from app.session_state import get_state, patch_state
 from app.cart_service import add_item_to_orcamento, format_orcamento
 from app.product_search import db_get_product_by_id
+from app import catalog_cache
 from app.parsing import (
-    extract_kg_quantity,
+    MEASURE_LABELS,
+    format_qty,
+    measure_as_units,
+    extract_measure_quantity,
     extract_units_quantity,
     extract_plain_number,
-    suggest_units_from_packaging,
+    units_from_conversion,
 )
 
 
-def set_pending_for_qty(session_id: str, produto, requested_kg: Optional[float]) -> str:
+def suggest_units_for_product(produto, qty: float, unit: str) -> Optional[Tuple[float, str]]:
+    """
+    Medida pedida (200kg, 60m2, 30m...) -> unidades do produto: 1:1 se o produto e vendido
+    nessa medida, senao pela tabela de conversao do cache.
+    """
+    same_unit = measure_as_units(qty, unit, produto.unidade)
+    if same_unit:
+        return same_unit
+    conv = catalog_cache.conversions(produto.id, nome=produto.nome)
+    return units_from_conversion(conv, qty, unit, product_unit=produto.unidade)
+
+
+def set_pending_for_qty(session_id: str, produto, requested: Optional[Sequence] = None) -> str:
     patch_state(
         session_id,
         {
@@ -23,15 +39,15 @@ def set_pending_for_qty(session_id: str, produto, requested_kg: Optional[float])
 
     ask = "\n\nQuantas unidades voce quer? (ex.: 1, 4 sacos ou 200kg)"
 
-    if requested_kg is not None:
-        conv = suggest_units_from_packaging(produto.nome, requested_kg)
+    if requested:
+        conv = suggest_units_for_product(produto, float(requested[0]), str(requested[1]))
         if conv:
             suggested_units, conv_text = conv
             patch_state(session_id, {"pending_suggested_units": suggested_units})
             ask = (
                 "\n\nPelo que voce pediu: "
                 f"**{conv_text}**.\n"
-                f"Quer que eu adicione **{int(suggested_units)}** no orcamento? "
+                f"Quer que eu adicione **{format_qty(suggested_units)}** no orcamento? "
                 "(responda sim ou diga outra quantidade)"
             )
 
@@ -69,19 +85,24 @@ def handle_pending_qty(session_id: str, message: str) -> Optional[str]:
     if t in {"sim", "isso", "ok", "certo"} and st.get("pending_suggested_units") is not None:
         qty_un = float(st["pending_suggested_units"])
     else:
-        kg_qty = extract_kg_quantity(message)
+        measure = extract_measure_quantity(message)
         unit_qty = extract_units_quantity(message)
         plain = extract_plain_number(message)
 
-        if kg_qty is not None:
-            conv = suggest_units_from_packaging(produto.nome, kg_qty)
+        if measure is not None:
+            conv = suggest_units_for_product(produto, *measure)
             if conv:
                 qty_un, _ = conv
-            else:
+            elif measure[1] == "kg":
                 return (
                     "Entendi os kg, mas este item nao indica o peso por saco/unidade. "
                     "Me diga quantas unidades voce quer (ex.: 4)."
                 )
+            else:
+                return (
+                    f"Entendi a medida ({MEASURE_LABELS.get(measure[1], measure[1]).strip()}), mas este item nao indica "
+                    "quanto vem por unidade. Me diga quantas unidades voce quer (ex.: 4)."
+                )
 
         if unit_qty is not None:
             qty_un = unit_qty
@@ -93,7 +114,7 @@ def handle_pending_qty(session_id: str, message: str) -> Optional[str]:
             suggested = st.get("pending_suggested_units")
             if suggested is not None:
                 return (
-                    f"Quer que eu adicione **{int(suggested)}** unidades no orcamento? "
+                    f"Quer que eu adicione **{format_qty(suggested)}** unidades no orcamento? "
                     "(responda sim ou diga outra quantidade)"
                 )
             return "Entendi. Quantas unidades voce quer? (ex.: 1, 4 sacos ou 200kg)"
@@ -12,7 +12,7 @@ Exemplo:
 from typing import Optional, Tuple, List, Any, Dict
 from app.session_state import get_state, patch_state, reset_consultive_context
 from app.text_utils import norm
-from app.product_search import db_find_best_products, format_options
+from app.product_search import db_find_best_products_batch, format_options
 from app.rag_products import search_products_semantic
 from app.parsing import extract_product_hint
 
@@ -278,9 +278,13 @@ def start_usage_context_flow(session_id: str, product_hint: str, usage_context:
 
     patch_state(session_id, {"consultive_recommendation_shown": True})
 
-    products = db_find_best_products(f"{canonical_hint} {usage_context}", k=6) or []
-    if not products:
-        products = db_find_best_products(canonical_hint, k=6) or []
+    # produto+contexto e, na falta, so o produto: as duas buscas numa passada so
+    with_context, product_only = db_find_best_products_batch(
+        [f"{canonical_hint} {usage_context}", canonical_hint],
+        k=6,
+        category_hint=canonical_hint,
+    )
+    products = with_context or product_only
 
     if not products:
         reply = (
@@ -311,7 +315,7 @@ def start_usage_context_flow(session_id: str, product_hint: str, usage_context:
             {
                 "last_suggestions": suggestions,
                 "last_hint": canonical_hint,
-                "last_requested_kg": None,
+                "last_requested_measure": None,
                 "consultive_investigation": False,
             },
         )
@@ -0,0 +1,183 @@
+"""
+Pipeline de build dos indices vetoriais (produtos e FAQ).
+
+Os documentos sao embedados e gravados em lotes (INDEX_BATCH_SIZE) numa
+collection nova; o chamador so troca o indice ativo depois que o build termina.
+Embedder com estado ajustado ao corpus (IDF do hashing) e ajustado numa copia
+(`fit_embedder`): o embedder em uso segue servindo o indice atual e so recebe o
+estado novo junto com a troca do manifesto.
+Se qualquer lote falhar (ou o processo for interrompido), a collection parcial
+e removida e o indice anterior continua valendo.
+
+Ao final registra docs/s e o pico de memoria (RSS) do processo.
+"""
+import copy
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from app import settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+_stats_lock = threading.Lock()
+_last_stats: Dict[str, Dict[str, Any]] = {}
+_threads_configured = False
+
+
+def configure_embedding_threads(num_threads: Optional[int] = None) -> int:
+    """
+    Usa todos os cores no encode do sentence-transformers (threads intra-op do torch).
+    Retorna o numero de threads aplicado (0 se o torch nao estiver disponivel).
+    """
+    global _threads_configured
+    n = num_threads if num_threads is not None else settings.EMBED_NUM_THREADS
+    if n <= 0:
+        n = os.cpu_count() or 1
+    try:
+        import torch
+    except ImportError:
+        return 0
+    if not _threads_configured or torch.get_num_threads() != n:
+        torch.set_num_threads(n)
+        _threads_configured = True
+    return n
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente do processo em MB (None se indisponivel)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def last_build_stats(label: Optional[str] = None) -> Dict[str, Any]:
+    """Metricas do ultimo build por indice (`label`), ou de todos."""
+    with _stats_lock:
+        if label is not None:
+            return dict(_last_stats.get(label, {}))
+        return {k: dict(v) for k, v in _last_stats.items()}
+
+
+def _record_stats(label: str, stats: Dict[str, Any]) -> None:
+    with _stats_lock:
+        _last_stats[label] = stats
+
+
+def _drop_partial(store: Any, label: str) -> None:
+    try:
+        store.delete_collection()
+    except Exception as e:
+        print(f"[index] {label}: nao consegui remover a collection parcial: {e}")
+
+
+def fit_embedder(embeddings: Any, docs: Sequence[Document]) -> Any:
+    """
+    Embedder do build: copia ajustada aos `docs` quando ha estado por corpus
+    (HashingEmbeddings: IDF); sem estado (HF), o proprio `embeddings`.
+    """
+    if not callable(getattr(embeddings, "fit", None)):
+        return embeddings
+    fitted = copy.copy(embeddings)
+    fitted.fit([d.page_content for d in docs])
+    return fitted
+
+
+def build_collection(
+    store: Any,
+    docs: Sequence[Document],
+    ids: Sequence[str],
+    embeddings: Any,
+    label: str,
+    batch_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Embeda `docs` em lotes e grava (upsert) na collection vazia de `store`.
+    Em caso de erro remove a collection parcial e relanca a excecao.
+    Retorna as metricas do build.
+    """
+    if len(docs) != len(ids):
+        raise ValueError("docs e ids precisam ter o mesmo tamanho")
+
+    batch_size = max(1, int(batch_size or settings.INDEX_BATCH_SIZE))
+    threads = configure_embedding_threads()
+
+    total = len(docs)
+    done = 0
+    batches = 0
+    embed_s = 0.0
+    started = time.perf_counter()
+
+    try:
+        for start in range(0, total, batch_size):
+            batch = docs[start:start + batch_size]
+            texts: List[str] = [d.page_content for d in batch]
+
+            t0 = time.perf_counter()
+            vectors = embeddings.embed_documents(texts)
+            embed_s += time.perf_counter() - t0
+
+            store._collection.upsert(  # type: ignore[attr-defined]
+                ids=list(ids[start:start + batch_size]),
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[d.metadata or {} for d in batch],
+            )
+            done += len(batch)
+            batches += 1
+            if total > batch_size:
+                elapsed = time.perf_counter() - started
+                print(f"[index] {label}: {done}/{total} docs ({done / max(elapsed, 1e-9):.1f} docs/s)")
+    except BaseException as e:
+        # inclui KeyboardInterrupt: nunca deixa collection pela metade
+        print(f"[index] {label}: build abortado em {done}/{total} docs: {e!r}")
+        _drop_partial(store, label)
+        raise
+
+    elapsed = time.perf_counter() - started
+    stats: Dict[str, Any] = {
+        "docs": total,
+        "batches": batches,
+        "batch_size": batch_size,
+        "threads": threads,
+        "elapsed_s": round(elapsed, 3),
+        "embed_s": round(embed_s, 3),
+        "docs_per_s": round(total / elapsed, 1) if elapsed > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "built_at": time.time(),
+    }
+    _record_stats(label, stats)
+    print(
+        f"[index] {label}: {total} docs em {stats['elapsed_s']}s "
+        f"({stats['docs_per_s']} docs/s, pico RSS {stats['peak_rss_mb']} MB)"
+    )
+    return stats
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def write_manifest(path: str, data: Dict[str, Any]) -> None:
+    """Grava o manifesto de forma atomica (tmp + os.replace)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
@@ -0,0 +1,56 @@
+"""
+Registro de status dos componentes aquecidos no startup (banco e indices).
+
+Estados possiveis por componente:
+- "idle": warmup nunca foi iniciado (scripts/testes) -> indices sobem sob demanda
+- "pending" / "building": warmup em andamento -> buscas semanticas degradam
+- "ready": pronto para uso
+- "failed": falhou no warmup (detalhe em "error")
+"""
+import threading
+import time
+from typing import Any, Dict
+
+COMPONENTS = ("db", "products", "knowledge")
+
+_PENDING_STATES = {"pending", "building"}
+
+_lock = threading.Lock()
+_status: Dict[str, Dict[str, Any]] = {name: {"status": "idle"} for name in COMPONENTS}
+
+
+def set_status(name: str, status: str, **extra: Any) -> None:
+    with _lock:
+        entry: Dict[str, Any] = {"status": status, "updated_at": time.time()}
+        entry.update(extra)
+        _status[name] = entry
+
+
+def get_status(name: str) -> str:
+    with _lock:
+        return str((_status.get(name) or {}).get("status", "idle"))
+
+
+def is_ready(name: str) -> bool:
+    return get_status(name) == "ready"
+
+
+def is_pending(name: str) -> bool:
+    """True enquanto o warmup ainda nao terminou para o componente."""
+    return get_status(name) in _PENDING_STATES
+
+
+def all_ready() -> bool:
+    return all(is_ready(name) for name in COMPONENTS)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _lock:
+        return {name: dict(entry) for name, entry in _status.items()}
+
+
+def reset() -> None:
+    """Volta todos os componentes para 'idle' (uso em testes)."""
+    with _lock:
+        for name in COMPONENTS:
+            _status[name] = {"status": "idle"}
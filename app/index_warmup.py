@@ -0,0 +1,79 @@
+"""
+Warmup em background do banco e dos indices vetoriais.
+
+O lifespan do FastAPI apenas agenda este warmup e libera o servidor na hora.
+Enquanto os indices nao ficam prontos, `search_products` / `search_knowledge`
+retornam pelo caminho lexical (ver `app.index_status.is_pending`).
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict
+
+from database import init_db
+from app import index_status
+from app.index_build import last_build_stats
+from app.product_attributes import sync_product_attributes
+from app.rag_products import rebuild_product_index
+from app.rag_knowledge import rebuild_knowledge_index
+
+
+def _run_step(name: str, fn: Callable[[], Any], empty_is_failure: bool = False) -> None:
+    index_status.set_status(name, "building")
+    started = time.perf_counter()
+    try:
+        result = fn()
+    except Exception as e:
+        # não derruba o servidor se banco/embeddings/chroma falharem
+        print(f"[WARN] warmup {name} falhou:", e)
+        index_status.set_status(
+            name,
+            "failed",
+            error=str(e)[:200],
+            elapsed_s=round(time.perf_counter() - started, 3),
+        )
+        return
+
+    extra: Dict[str, Any] = {"elapsed_s": round(time.perf_counter() - started, 3)}
+    build = last_build_stats(name)
+    if build:
+        # throughput do ultimo build (ausente quando o indice persistido foi so reaberto)
+        extra["build"] = {k: build.get(k) for k in ("docs", "docs_per_s", "peak_rss_mb", "threads")}
+    if isinstance(result, int):
+        extra["count"] = result
+        if empty_is_failure and result <= 0:
+            index_status.set_status(name, "failed", error="indice vazio ou embeddings indisponiveis", **extra)
+            return
+    index_status.set_status(name, "ready", **extra)
+
+
+def _sync_attributes() -> None:
+    # nao e componente de readiness: sem atributos a policy so nao estreita candidatos
+    if not index_status.is_ready("db"):
+        return
+    try:
+        sync_product_attributes()
+    except Exception as e:
+        print("[WARN] warmup atributos falhou:", e)
+
+
+def run_index_warmup() -> Dict[str, Dict[str, Any]]:
+    """Executa init_db + indices em sequencia (bloqueante). Retorna o snapshot final."""
+    for name in index_status.COMPONENTS:
+        if not index_status.is_pending(name):
+            index_status.set_status(name, "pending")
+
+    _run_step("db", init_db)
+    _sync_attributes()
+    _run_step("products", rebuild_product_index, empty_is_failure=True)
+    _run_step("knowledge", rebuild_knowledge_index, empty_is_failure=True)
+    return index_status.snapshot()
+
+
+def start_index_warmup() -> "asyncio.Task[Dict[str, Dict[str, Any]]]":
+    """
+    Agenda o warmup numa thread (via asyncio.to_thread) e retorna a task.
+    Os componentes ficam "pending" desde ja, para o readiness probe responder 503.
+    """
+    for name in index_status.COMPONENTS:
+        index_status.set_status(name, "pending")
+    return asyncio.create_task(asyncio.to_thread(run_index_warmup), name="index-warmup")
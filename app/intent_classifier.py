@@ -0,0 +1,398 @@
+"""
+Classificador local de intencao para pular o LLM router quando a decisao e obvia.
+
+Features: embeddings por hashing da mensagem (n-gramas de caracteres, IDF ajustado no
+treino, ver `app.embeddings.HashingEmbeddings`) + flags do `state_summary`. A mensagem passa
+pela mesma mascara do dataset (`_redact_text`) no treino e na predicao. Regressao
+logistica multinomial do scikit-learn (classes balanceadas) sobre o par "intent|action";
+o modelo e gravado como pesos em JSON e a predicao e um softmax em numpy (sklearn so no treino).
+
+Dados de treino: com INTENT_DATASET_LOGGING (desligado por padrao), cada decisao confiavel
+do LLM router e anotada em INTENT_DATASET_PATH (JSONL com mensagem mascarada, state_summary e
+rota; rotacao por tamanho). O CLI tambem destila mensagens antigas do chat_history pelo
+router (estado neutro) para comecar com mais exemplos.
+
+No `handle_message`, `predict_route` devolve uma rota completa quando o modelo passa de
+INTENT_CLASSIFIER_THRESHOLD e a acao nao depende de texto gerado pelo LLM
+(ASK_CLARIFYING_QUESTION sempre vai para o router).
+
+Uso:
+    python -m app.intent_classifier train [--from-history 500] [--holdout 0.2]
+"""
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import random
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app import settings
+from app.embeddings import HashingEmbeddings
+from app.llm_service import _redact_text
+
+MODEL_FORMAT_VERSION = 1
+
+# Acoes que o fluxo executa so com intent/action + hint extraido da mensagem
+LOCAL_ACTIONS = {"SHOW_CATALOG", "SEARCH_PRODUCTS", "ASK_USAGE_CONTEXT", "ANSWER_WITH_RAG", "HANDOFF_CHECKOUT", "NOOP"}
+
+STATE_FLAGS = ("in_checkout", "awaiting_choice", "awaiting_quantity", "consultive_pending", "cart_has_items")
+
+# state_summary de uma sessao nova (destilacao do chat_history, que nao guarda estado)
+EMPTY_STATE_SUMMARY: Dict[str, Any] = {
+    "in_checkout": False,
+    "awaiting_choice": False,
+    "awaiting_quantity": False,
+    "consultive_pending": False,
+    "cart_has_items": False,
+    "last_known_product": None,
+    "last_known_category": None,
+    "consultive_context_missing": [],
+    "asked_context_fields": [],
+}
+
+_lock = threading.Lock()
+_model: Optional["IntentModel"] = None
+_loaded_mtime: Optional[float] = None
+
+_dataset_lock = threading.Lock()
+_dataset_logger = logging.getLogger("intent_classifier.dataset")
+_dataset_logger.propagate = False
+_dataset_handler: Optional[logging.Handler] = None
+_dataset_handler_path: Optional[str] = None
+
+
+def _state_features(state_summary: Dict[str, Any]) -> np.ndarray:
+    st = state_summary or {}
+    flags = [float(bool(st.get(k))) for k in STATE_FLAGS]
+    flags.append(float(bool(st.get("last_known_product"))))
+    flags.append(float(bool(st.get("consultive_context_missing"))))
+    flags.append(float(bool(st.get("asked_context_fields"))))
+    return np.asarray(flags, dtype=np.float32)
+
+
+class IntentModel:
+    def __init__(self, embedder: HashingEmbeddings, labels: List[str], weights: np.ndarray, bias: np.ndarray):
+        self.embedder = embedder
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+
+    def features(self, message: str, state_summary: Dict[str, Any]) -> np.ndarray:
+        # mesmo texto que o dataset grava: PII mascarada e corte em 120 caracteres
+        return np.concatenate([self.embedder._vector(_redact_text(message)), _state_features(state_summary)])
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        return _softmax(x @ self.weights + self.bias)
+
+    def predict(self, message: str, state_summary: Dict[str, Any]) -> Tuple[str, str, float]:
+        """(intent, action, probabilidade)."""
+        probs = self.predict_proba(self.features(message, state_summary)[None, :])[0]
+        best = int(np.argmax(probs))
+        intent, action = self.labels[best].split("|", 1)
+        return intent, action, float(probs[best])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format_version": MODEL_FORMAT_VERSION,
+            "embedder": self.embedder.state(),
+            "dim": self.embedder.dim,
+            "labels": self.labels,
+            "weights": np.round(self.weights, 6).tolist(),
+            "bias": np.round(self.bias, 6).tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional["IntentModel"]:
+        if not isinstance(data, dict) or data.get("format_version") != MODEL_FORMAT_VERSION:
+            return None
+        embedder = HashingEmbeddings(dim=int(data["dim"]))
+        if not embedder.load_state(data.get("embedder")):
+            return None
+        return cls(
+            embedder,
+            list(data["labels"]),
+            np.asarray(data["weights"], dtype=np.float32),
+            np.asarray(data["bias"], dtype=np.float32),
+        )
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _label(route: Dict[str, Any]) -> str:
+    return f"{route.get('intent')}|{route.get('action')}"
+
+
+def train(
+    samples: Sequence[Dict[str, Any]],
+    dim: int = 512,
+    c: float = 10.0,
+    max_iter: int = 1000,
+) -> IntentModel:
+    """
+    Regressao logistica multinomial (sklearn, lbfgs ate convergir, classes balanceadas)
+    sobre amostras {message, state_summary, route}.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    if not samples:
+        raise ValueError("sem amostras para treinar")
+    embedder = HashingEmbeddings(dim=dim).fit([_redact_text(s["message"]) for s in samples])
+    labels = sorted({_label(s["route"]) for s in samples})
+
+    model = IntentModel(embedder, labels, np.zeros((0, 0), np.float32), np.zeros(len(labels), np.float32))
+    x = np.stack([model.features(s["message"], s.get("state_summary") or {}) for s in samples])
+    if len(labels) == 1:
+        # uma classe so: probabilidade 1 para ela
+        model.weights = np.zeros((x.shape[1], 1), dtype=np.float32)
+        return model
+
+    clf = LogisticRegression(C=c, max_iter=max_iter, class_weight="balanced")
+    clf.fit(x, [_label(s["route"]) for s in samples])
+    coef = np.asarray(clf.coef_, dtype=np.float32)
+    intercept = np.asarray(clf.intercept_, dtype=np.float32)
+    if len(labels) == 2:
+        # binario: sigmoid(z) == softmax([-z/2, z/2])
+        coef = np.vstack([-coef / 2, coef / 2])
+        intercept = np.concatenate([-intercept / 2, intercept / 2])
+    index = [list(clf.classes_).index(lab) for lab in labels]
+    model.weights, model.bias = coef[index].T.copy(), intercept[index].copy()
+    return model
+
+
+def evaluate(model: IntentModel, samples: Sequence[Dict[str, Any]], threshold: float) -> Dict[str, Any]:
+    """Acuracia geral e, acima do limiar, cobertura (turnos que pulariam o LLM) e acuracia."""
+    if not samples:
+        return {"samples": 0}
+    hits = covered = covered_hits = 0
+    for s in samples:
+        intent, action, p = model.predict(s["message"], s.get("state_summary") or {})
+        ok = f"{intent}|{action}" == _label(s["route"])
+        hits += ok
+        if p >= threshold and action in LOCAL_ACTIONS:
+            covered += 1
+            covered_hits += ok
+    return {
+        "samples": len(samples),
+        "accuracy": round(hits / len(samples), 4),
+        "coverage": round(covered / len(samples), 4),
+        "accuracy_when_confident": round(covered_hits / covered, 4) if covered else None,
+    }
+
+
+# ---------- modelo em uso ----------
+
+def save_model(model: IntentModel, path: Optional[str] = None) -> None:
+    path = path or settings.INTENT_CLASSIFIER_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(model.to_dict(), f)
+    os.replace(tmp, path)
+
+
+def get_model() -> Optional[IntentModel]:
+    """Modelo treinado (recarrega se o arquivo mudar); None se nao houver."""
+    global _model, _loaded_mtime
+    path = settings.INTENT_CLASSIFIER_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    if mtime != _loaded_mtime:
+        with _lock:
+            if mtime != _loaded_mtime:
+                model = None
+                if mtime is not None:
+                    try:
+                        with open(path, "r", encoding="utf-8") as f:
+                            model = IntentModel.from_dict(json.load(f))
+                    except Exception as e:
+                        print(f"[intent] modelo invalido em {path}: {e}")
+                _model, _loaded_mtime = model, mtime
+    return _model
+
+
+def reset() -> None:
+    global _model, _loaded_mtime
+    with _lock:
+        _model, _loaded_mtime = None, None
+
+
+def predict_route(message: str, state_summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Rota no formato do `route_intent` se o modelo local estiver confiante; senao None."""
+    if not settings.INTENT_CLASSIFIER_ENABLED or not message:
+        return None
+    model = get_model()
+    if model is None:
+        return None
+    intent, action, p = model.predict(message, state_summary)
+    if p < settings.INTENT_CLASSIFIER_THRESHOLD or action not in LOCAL_ACTIONS:
+        return None
+    from app.parsing import extract_product_hint
+
+    hint = extract_product_hint(message) or None
+    return {
+        "intent": intent,
+        "product_query": hint,
+        "category_hint": hint,
+        "constraints": {},
+        "action": action,
+        "clarifying_question": None,
+        "confidence": p,
+        "source": "local",
+    }
+
+
+# ---------- dataset ----------
+
+def _dataset_file_logger() -> logging.Logger:
+    """Logger do dataset (RotatingFileHandler); recria o handler se INTENT_DATASET_PATH mudar."""
+    global _dataset_handler, _dataset_handler_path
+    path = settings.INTENT_DATASET_PATH
+    with _dataset_lock:
+        if _dataset_handler_path != path:
+            if _dataset_handler is not None:
+                _dataset_logger.removeHandler(_dataset_handler)
+                _dataset_handler.close()
+                _dataset_handler = None
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path,
+                maxBytes=settings.INTENT_DATASET_MAX_BYTES,
+                backupCount=settings.INTENT_DATASET_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _dataset_logger.addHandler(handler)
+            _dataset_logger.setLevel(logging.INFO)
+            _dataset_handler, _dataset_handler_path = handler, path
+    return _dataset_logger
+
+
+def _dataset_row(message: str, state_summary: Dict[str, Any], route: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Linha JSONL do exemplo (mensagem mascarada); None se a rota nao for um rotulo confiavel."""
+    if not message or not route:
+        return None
+    if float(route.get("confidence", 0.0) or 0.0) < settings.ROUTER_CONFIDENCE_THRESHOLD:
+        return None  # virou pergunta de esclarecimento: nao e um rotulo confiavel
+    row = {
+        "message": _redact_text(message),
+        "state_summary": state_summary,
+        "route": {"intent": route.get("intent"), "action": route.get("action")},
+    }
+    return json.dumps(row, ensure_ascii=False, default=str)
+
+
+def record_decision(message: str, state_summary: Dict[str, Any], route: Dict[str, Any]) -> None:
+    """Anota uma decisao confiavel do LLM router como exemplo de treino (best effort, PII mascarada)."""
+    if not settings.INTENT_DATASET_LOGGING:
+        return
+    line = _dataset_row(message, state_summary, route)
+    if line is None:
+        return
+    try:
+        _dataset_file_logger().info(line)
+    except Exception as e:
+        print(f"[intent] nao consegui anotar decisao: {e}")
+
+
+def load_dataset(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Exemplos do dataset, incluindo os arquivos rotacionados (path.N ... path.1, path)."""
+    path = path or settings.INTENT_DATASET_PATH
+    out: List[Dict[str, Any]] = []
+    rotated = [f"{path}.{i}" for i in range(settings.INTENT_DATASET_BACKUPS, 0, -1)]
+    for p in rotated + [path]:
+        if not os.path.exists(p):
+            continue
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("message") and isinstance(row.get("route"), dict):
+                    out.append(row)
+    return out
+
+
+def distill_history(limit: int, path: Optional[str] = None) -> int:
+    """
+    Rotula mensagens distintas do chat_history com o LLM router (estado neutro) e grava em
+    `path` (padrao: INTENT_DATASET_PATH). Pedido explicito do CLI: nao depende de
+    INTENT_DATASET_LOGGING. Retorna quantos exemplos foram gravados.
+    """
+    from database import ChatHistory, SessionLocal
+    from app.llm_service import route_intent
+
+    db = SessionLocal()
+    try:
+        rows = db.query(ChatHistory.message).order_by(ChatHistory.id.desc()).limit(limit * 3).all()
+    finally:
+        db.close()
+
+    path = path or settings.INTENT_DATASET_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    seen, added = set(), 0
+    with open(path, "a", encoding="utf-8") as f:
+        for (message,) in rows:
+            key = (message or "").strip().lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            line = _dataset_row(message, dict(EMPTY_STATE_SUMMARY), route_intent(message, dict(EMPTY_STATE_SUMMARY)))
+            if line is not None:
+                f.write(line + "\n")
+                added += 1
+            if len(seen) >= limit:
+                break
+    return added
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Classificador local de intencao (atalho do LLM router).")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train", help="treina e grava o modelo")
+    tr.add_argument("--dataset", default=None, help=f"padrao: {settings.INTENT_DATASET_PATH}")
+    tr.add_argument("--out", default=None, help=f"padrao: {settings.INTENT_CLASSIFIER_PATH}")
+    tr.add_argument("--from-history", type=int, default=0, help="destila N mensagens do chat_history antes de treinar")
+    tr.add_argument("--holdout", type=float, default=0.2, help="fracao para avaliacao")
+    tr.add_argument("--dim", type=int, default=512)
+    tr.add_argument("--C", dest="c", type=float, default=10.0, help="inverso da regularizacao L2")
+    tr.add_argument("--max-iter", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.from_history:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        added = distill_history(args.from_history, args.dataset)
+        print(f"[intent] {added} exemplos destilados do chat_history")
+
+    samples = load_dataset(args.dataset)
+    if len(samples) < 10:
+        print(f"[intent] poucos exemplos ({len(samples)}); treine depois de acumular decisoes do router")
+        return 1
+
+    random.Random(0).shuffle(samples)
+    n_eval = int(len(samples) * args.holdout)
+    eval_set, train_set = samples[:n_eval], samples[n_eval:]
+    model = train(train_set, dim=args.dim, c=args.c, max_iter=args.max_iter)
+    report = evaluate(model, eval_set, settings.INTENT_CLASSIFIER_THRESHOLD)
+    print(f"[intent] treino={len(train_set)} classes={len(model.labels)} holdout={json.dumps(report)}")
+
+    # modelo final com todos os exemplos
+    save_model(train(samples, dim=args.dim, c=args.c, max_iter=args.max_iter), args.out)
+    print(f"[intent] modelo gravado em {args.out or settings.INTENT_CLASSIFIER_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
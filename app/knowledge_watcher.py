@@ -0,0 +1,93 @@
+"""
+Hot reload opcional do FAQ tecnico (KNOWLEDGE_HOT_RELOAD=true).
+
+Um observer do watchdog monitora o diretorio do FAQ; alteracoes no arquivo
+(agrupadas por debounce) disparam `reload_knowledge_index`, que re-embeda
+apenas as entradas novas/alteradas sem travar `search_knowledge`.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app import settings
+from app.rag_knowledge import FAQ_PATH, reload_knowledge_index
+
+_WATCHED_EVENTS = {"created", "modified", "moved", "closed"}
+
+
+class _FaqEventHandler:
+    """Handler compativel com o watchdog (o Observer so chama `dispatch`)."""
+
+    def __init__(self, path: str, debounce_s: float, on_change: Callable[[], Dict[str, Any]]):
+        self._path = os.path.abspath(path)
+        self._debounce_s = max(0.0, float(debounce_s))
+        self._on_change = on_change
+        self._timer: Optional[threading.Timer] = None
+        self._timer_lock = threading.Lock()
+
+    def _is_target(self, event: Any) -> bool:
+        if getattr(event, "is_directory", False):
+            return False
+        # editores costumam salvar via arquivo temporario + rename (dest_path)
+        for attr in ("src_path", "dest_path"):
+            p = getattr(event, attr, None)
+            if p and os.path.abspath(os.fsdecode(p)) == self._path:
+                return True
+        return False
+
+    def dispatch(self, event: Any) -> None:
+        if getattr(event, "event_type", None) not in _WATCHED_EVENTS:
+            return
+        if not self._is_target(event):
+            return
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self._debounce_s, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self) -> None:
+        try:
+            result = self._on_change()
+            print(f"[knowledge] FAQ recarregado: {result}")
+        except Exception as e:
+            print(f"[knowledge] Falha no hot reload do FAQ: {e}")
+
+    def cancel(self) -> None:
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+def start_faq_watcher(path: Optional[str] = None, debounce_s: Optional[float] = None) -> Optional[Any]:
+    """Inicia o observer do watchdog. Retorna None se o watchdog nao estiver instalado."""
+    try:
+        from watchdog.observers import Observer
+    except ImportError:
+        print("[knowledge] watchdog nao instalado; hot reload do FAQ desativado.")
+        return None
+
+    path = path or FAQ_PATH
+    if debounce_s is None:
+        debounce_s = settings.KNOWLEDGE_RELOAD_DEBOUNCE_S
+
+    handler = _FaqEventHandler(path, debounce_s, reload_knowledge_index)
+    observer = Observer()
+    observer.schedule(handler, os.path.dirname(os.path.abspath(path)), recursive=False)
+    observer.daemon = True
+    observer.start()
+    observer.faq_handler = handler
+    return observer
+
+
+def stop_faq_watcher(observer: Any) -> None:
+    handler = getattr(observer, "faq_handler", None)
+    if handler is not None:
+        handler.cancel()
+    try:
+        observer.stop()
+        observer.join(timeout=2)
+    except Exception as e:
+        print(f"[knowledge] Falha ao parar o watcher do FAQ: {e}")
@@ -0,0 +1,184 @@
+"""
+Circuit breaker por componente LLM (router, route_plan, planner, choice, synthesis, render).
+
+Janela deslizante (LLM_BREAKER_WINDOW_S) com o resultado e a latencia de cada chamada,
+alimentada por `llm_telemetry.track`. Com pelo menos LLM_BREAKER_MIN_CALLS amostras, o
+circuito abre se:
+- a taxa de falha (timeout/erro de transporte ou rate limit) passar de LLM_BREAKER_ERROR_RATE, ou
+- o p95 da latencia passar de LLM_BREAKER_P95_RATIO x prazo do componente.
+
+Aberto, `allow()` devolve False e o `llm_service` nem chama o LLM: o fluxo segue so com
+regras (router), `parse_choice_indices` (escolhas), `TECHNICAL_RULES` (sinteses) e texto
+deterministico (render). Depois de LLM_BREAKER_OPEN_S vira meio-aberto: deixa passar uma
+chamada de teste; sucesso fecha o circuito, falha reabre.
+
+Transicoes e chamadas puladas viram metricas (`render_prometheus`, GET /metrics).
+"""
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app import settings
+from app.llm_client import _percentile, deadline_for
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+
+class CircuitBreaker:
+    def __init__(self, component: str):
+        self.component = component
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+        self.samples: Deque[Tuple[float, bool, float]] = deque()  # (ts, falhou, latencia)
+        self.transitions: Counter = Counter()
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    # ---------- janela ----------
+
+    def _trim(self, now: float) -> None:
+        horizon = now - settings.LLM_BREAKER_WINDOW_S
+        while self.samples and self.samples[0][0] < horizon:
+            self.samples.popleft()
+
+    def _p95(self) -> float:
+        return _percentile((s[2] for s in self.samples), 95) or 0.0
+
+    def _trip_reason(self) -> Optional[str]:
+        if len(self.samples) < settings.LLM_BREAKER_MIN_CALLS:
+            return None
+        error_rate = sum(1 for s in self.samples if s[1]) / len(self.samples)
+        if error_rate >= settings.LLM_BREAKER_ERROR_RATE:
+            return f"error_rate={error_rate:.2f}"
+        p95 = self._p95()
+        if p95 >= settings.LLM_BREAKER_P95_RATIO * deadline_for(self.component):
+            return f"p95={p95:.2f}s"
+        return None
+
+    def _move(self, new_state: str, now: float, reason: str = "") -> None:
+        old, self.state = self.state, new_state
+        self.transitions[(old, new_state)] += 1
+        if new_state == OPEN:
+            self.opened_at = now
+        if new_state != HALF_OPEN:
+            self.probe_started_at = None
+        if new_state == CLOSED:
+            self.samples.clear()
+        logger.info("llm_breaker component=%s %s->%s %s", self.component, old, new_state, reason)
+
+    # ---------- API ----------
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= settings.LLM_BREAKER_OPEN_S:
+                self._move(HALF_OPEN, now)
+            if self.state == HALF_OPEN:
+                # uma chamada de teste por vez; teste que nunca reportou (excecao antes da chamada) expira
+                lease = deadline_for(self.component) + 1.0
+                if self.probe_started_at is None or now - self.probe_started_at >= lease:
+                    self.probe_started_at = now
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self.skipped += 1
+            return False
+
+    def record(self, failed: bool, latency_s: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._move(OPEN, now, "probe_failed")
+                else:
+                    self._move(CLOSED, now, "probe_ok")
+                return
+            if self.state == OPEN:
+                return  # resposta atrasada de antes da abertura
+            self.samples.append((now, failed, latency_s))
+            self._trim(now)
+            reason = self._trip_reason()
+            if reason:
+                self._move(OPEN, now, reason)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            n = len(self.samples)
+            return {
+                "state": self.state,
+                "window_calls": n,
+                "error_rate": round(sum(1 for s in self.samples if s[1]) / n, 4) if n else 0.0,
+                "p95_ms": round(self._p95() * 1000, 1),
+                "skipped": self.skipped,
+                "transitions": {f"{a}->{b}": c for (a, b), c in self.transitions.items()},
+            }
+
+
+_lock = threading.Lock()
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get(component: str) -> CircuitBreaker:
+    with _lock:
+        breaker = _breakers.get(component)
+        if breaker is None:
+            breaker = _breakers[component] = CircuitBreaker(component)
+        return breaker
+
+
+def allow(component: str) -> bool:
+    """False = circuito aberto: pule a chamada e use o caminho sem LLM."""
+    if not settings.LLM_BREAKER_ENABLED:
+        return True
+    return get(component).allow()
+
+
+def record(component: str, failed: bool, latency_s: float) -> None:
+    if settings.LLM_BREAKER_ENABLED:
+        get(component).record(failed, latency_s)
+
+
+def reset() -> None:
+    with _lock:
+        _breakers.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        breakers = sorted(_breakers.items())
+    return {component: b.snapshot() for component, b in breakers}
+
+
+def render_prometheus() -> str:
+    snap = snapshot()
+    lines: List[str] = [
+        "# HELP llm_breaker_state Estado do circuit breaker (1 no estado atual).",
+        "# TYPE llm_breaker_state gauge",
+    ]
+    for component, s in snap.items():
+        for state in STATES:
+            lines.append(f'llm_breaker_state{{component="{component}",state="{state}"}} {int(s["state"] == state)}')
+    lines += [
+        "# HELP llm_breaker_transitions_total Transicoes de estado do circuit breaker.",
+        "# TYPE llm_breaker_transitions_total counter",
+    ]
+    for component, s in snap.items():
+        for transition, count in sorted(s["transitions"].items()):
+            old, new = transition.split("->")
+            lines.append(f'llm_breaker_transitions_total{{component="{component}",from="{old}",to="{new}"}} {count}')
+    lines += [
+        "# HELP llm_breaker_skipped_total Chamadas puladas com o circuito aberto.",
+        "# TYPE llm_breaker_skipped_total counter",
+    ]
+    for component, s in snap.items():
+        lines.append(f'llm_breaker_skipped_total{{component="{component}"}} {s["skipped"]}')
+    return "\n".join(lines) + "\n"
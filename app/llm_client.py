@@ -0,0 +1,287 @@
+"""
+Cliente LLM (Groq) assincrono com prazo por chamada, limite de requisicoes em voo e hedging.
+
+O fluxo do bot e sincrono, entao o `AsyncGroq` roda num event loop proprio (thread
+de fundo) e as chamadas chegam por duas portas:
+- `client.chat.completions.create(component=..., **kwargs)`: fachada sincrona com o mesmo
+  formato do SDK (o que `llm_service` ja usava);
+- `await client.acomplete(component, **kwargs)`: para codigo assincrono.
+
+Cada chamada tem prazo (`deadline_for(component)`) que cobre a espera no semaforo global
+(LLM_MAX_IN_FLIGHT) e todas as tentativas; estourou, levanta `LLMTimeout`. O SDK roda com
+max_retries=0: quem decide repetir e o hedging.
+
+Hedging (LLM_HEDGE_ENABLED): se a tentativa passar do p95 recente do componente (ou falhar
+antes do prazo), dispara uma segunda e fica com a primeira que responder. Nao faz hedge com
+o semaforo cheio, para nao dobrar carga justamente quando o provedor esta lento, nem sem
+orcamento no llm_scheduler (a tentativa extra paga RPM/TPM como qualquer chamada).
+
+`base_url` aponta para qualquer servidor compativel (ex.: um fake local nos testes).
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import Counter, deque
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app import llm_scheduler, settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 200
+
+
+class LLMTimeout(TimeoutError):
+    pass
+
+
+def deadline_for(component: str) -> float:
+    return {
+        "router": settings.LLM_ROUTER_DEADLINE_S,
+        "planner": settings.LLM_PLANNER_DEADLINE_S,
+        "route_plan": settings.LLM_ROUTE_PLAN_DEADLINE_S,
+        "render": settings.LLM_RENDER_DEADLINE_S,
+        "choice": settings.LLM_CHOICE_DEADLINE_S,
+        "synthesis": settings.LLM_SYNTHESIS_DEADLINE_S,
+    }.get(component, settings.LLM_DEFAULT_DEADLINE_S)
+
+
+def _percentile(values: Any, pct: float) -> Optional[float]:
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    idx = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[idx]
+
+
+def _usage_tokens(task: Optional["asyncio.Future[Any]"]) -> Optional[int]:
+    """Tokens da tentativa: 0 se nao respondeu (cancelada/falhou), None se respondeu sem usage."""
+    if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+        return 0
+    usage = getattr(task.result(), "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return int(total) if isinstance(total, (int, float)) else None
+
+
+class _Completions:
+    def __init__(self, client: "LLMClient"):
+        self._client = client
+
+    def create(
+        self,
+        *,
+        component: str = "default",
+        deadline_s: Optional[float] = None,
+        trace: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        return self._client.complete(component, deadline_s=deadline_s, trace=trace, **kwargs)
+
+
+class LLMClient:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        self._api_key = api_key
+        self._base_url = base_url
+        self._max_in_flight = int(max_in_flight or settings.LLM_MAX_IN_FLIGHT)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._async_client: Any = None
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._stats: Counter = Counter()
+
+    # ---------- event loop de fundo ----------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            from groq import AsyncGroq
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="llm-client", daemon=True)
+            thread.start()
+
+            async def _init() -> None:
+                self._sem = asyncio.Semaphore(self._max_in_flight)
+                self._async_client = AsyncGroq(api_key=self._api_key, base_url=self._base_url, max_retries=0)
+
+            asyncio.run_coroutine_threadsafe(_init(), loop).result()
+            self._loop, self._thread = loop, thread
+            return loop
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._async_client is not None:
+            asyncio.run_coroutine_threadsafe(self._async_client.close(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    # ---------- latencia / hedging ----------
+
+    def _record_latency(self, component: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(component, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def hedge_delay(self, component: str) -> Optional[float]:
+        """p95 recente do componente (None enquanto houver poucas amostras)."""
+        with self._lock:
+            samples = list(self._latencies.get(component, ()))
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return max(settings.LLM_HEDGE_MIN_DELAY_S, _percentile(samples, 95) or 0.0)
+
+    def _can_hedge(self) -> bool:
+        return settings.LLM_HEDGE_ENABLED and self._sem is not None and not self._sem.locked()
+
+    def _hedge_budget(
+        self, component: str, kwargs: Dict[str, Any], trace: Dict[str, Any]
+    ) -> Tuple[bool, Optional["llm_scheduler.Ticket"]]:
+        tokens = llm_scheduler.estimate_tokens(kwargs.get("messages") or [], int(kwargs.get("max_tokens") or 0))
+        allowed, ticket = llm_scheduler.acquire_hedge(component, tokens)
+        if not allowed:
+            self._stats["hedges_denied"] += 1
+            trace["hedge_denied"] = "budget"
+            logger.info("llm_hedge_denied component=%s reason=budget", component)
+        return allowed, ticket
+
+    # ---------- chamadas ----------
+
+    async def _attempt(self, component: str, kwargs: Dict[str, Any], timeout: float) -> Any:
+        assert self._sem is not None
+        async with self._sem:
+            started = time.perf_counter()
+            response = await self._async_client.chat.completions.create(timeout=timeout, **kwargs)
+        self._record_latency(component, time.perf_counter() - started)
+        return response
+
+    async def _run(self, component: str, deadline_s: float, kwargs: Dict[str, Any], trace: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        end = started + deadline_s
+        delay = self.hedge_delay(component) if settings.LLM_HEDGE_ENABLED else None
+        hedge_at = started + delay if delay is not None else None
+
+        primary = asyncio.ensure_future(self._attempt(component, kwargs, deadline_s))
+        trace["attempts"] = 1
+        pending = {primary}
+        hedged = False
+        hedge: Optional["asyncio.Future[Any]"] = None
+        hedge_ticket: Optional[llm_scheduler.Ticket] = None
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                now = loop.time()
+                if now >= end:
+                    break
+                wait_s = end - now
+                if not hedged and hedge_at is not None:
+                    wait_s = min(wait_s, max(0.0, hedge_at - now))
+                done, pending = await asyncio.wait(pending, timeout=wait_s, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    last_error = task.exception()
+
+                now = loop.time()
+                slow = hedge_at is not None and now >= hedge_at
+                if not hedged and (slow or last_error is not None) and now < end:
+                    # uma chance so: sem vaga no semaforo ou sem orcamento, segue so com a original
+                    hedged = True
+                    allowed = False
+                    if self._can_hedge():
+                        allowed, hedge_ticket = self._hedge_budget(component, kwargs, trace)
+                    if allowed:
+                        self._stats["hedges"] += 1
+                        trace["attempts"] += 1
+                        trace["hedged"] = True
+                        logger.info(
+                            "llm_hedge component=%s after_ms=%.0f error=%s",
+                            component, (now - started) * 1000, bool(last_error),
+                        )
+                        hedge = asyncio.ensure_future(self._attempt(component, kwargs, end - now))
+                        pending.add(hedge)
+
+            if not pending and last_error is not None:
+                self._stats["errors"] += 1
+                raise last_error
+            self._stats["timeouts"] += 1
+            raise LLMTimeout(f"{component}: sem resposta em {deadline_s:.1f}s")
+        finally:
+            for task in pending:
+                task.cancel()
+            if hedge_ticket is not None:
+                # acerta o orcamento do hedge: uso real se respondeu, devolve tudo se foi cancelado/falhou
+                llm_scheduler.settle(hedge_ticket, _usage_tokens(hedge))
+
+    def _submit(
+        self,
+        component: str,
+        deadline_s: Optional[float],
+        kwargs: Dict[str, Any],
+        trace: Optional[Dict[str, Any]] = None,
+    ):
+        loop = self._ensure_loop()
+        deadline = float(deadline_s if deadline_s is not None else deadline_for(component))
+        with self._lock:
+            self._stats["calls"] += 1
+        trace = trace if trace is not None else {}
+        return asyncio.run_coroutine_threadsafe(self._run(component, deadline, kwargs, trace), loop), deadline
+
+    def complete(
+        self,
+        component: str,
+        deadline_s: Optional[float] = None,
+        trace: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Chamada sincrona (bloqueia so a thread chamadora, no maximo ate o prazo).
+        `trace` (opcional) recebe as tentativas feitas, para a telemetria.
+        """
+        future, deadline = self._submit(component, deadline_s, kwargs, trace)
+        try:
+            # folga para o loop entregar o LLMTimeout ele mesmo
+            return future.result(timeout=deadline + 1.0)
+        except TimeoutError as e:
+            future.cancel()
+            if isinstance(e, LLMTimeout):
+                raise
+            raise LLMTimeout(f"{component}: sem resposta em {deadline:.1f}s") from e
+
+    async def acomplete(
+        self,
+        component: str,
+        deadline_s: Optional[float] = None,
+        trace: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        future, _ = self._submit(component, deadline_s, kwargs, trace)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            p95 = {c: round((_percentile(v, 95) or 0.0) * 1000, 1) for c, v in self._latencies.items() if v}
+        return {
+            "max_in_flight": self._max_in_flight,
+            "in_flight": (self._max_in_flight - self._sem._value) if self._sem is not None else 0,  # type: ignore[attr-defined]
+            "p95_ms": p95,
+            **{k: self._stats[k] for k in ("calls", "timeouts", "errors", "hedges", "hedges_denied", "hedge_wins")},
+        }
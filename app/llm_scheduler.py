@@ -0,0 +1,254 @@
+"""
+Scheduler das chamadas LLM: orcamento de requisicoes/tokens por minuto e classes de prioridade.
+
+O Groq limita RPM e TPM por conta; sem coordenacao, o polimento opcional (render) e as
+sinteses competem com o router e a escolha de produto, que seguram o checkout. Aqui cada
+chamada passa por `acquire(component, tokens)` antes de ir ao provedor:
+
+- dois token buckets (LLM_RPM_LIMIT, LLM_TPM_LIMIT) recarregando continuamente;
+- prioridade: router/route_plan/choice (0) > planner (1) > synthesis (2) > render (3). Quem espera
+  e atendido em ordem de prioridade (e de chegada dentro da mesma classe);
+- cada classe so consome se sobrar pelo menos RESERVE_FRACTION do orcamento depois dela:
+  o resto fica para as classes acima. Classes opcionais (synthesis, render) nao esperam:
+  abaixo da reserva sao descartadas na hora (`LLMShed`) e o fluxo segue sem LLM;
+- a espera na fila conta no prazo do componente e e reportada (telemetria + metricas). Prazo
+  estourado na fila levanta `LLMBudgetTimeout`, que nao e TimeoutError: falta de orcamento local
+  nao conta como falha do provedor no circuit breaker;
+- a segunda tentativa do hedging (llm_client) tambem paga orcamento: `try_acquire` nao espera
+  e recusa abaixo da reserva da classe ou com alguem na fila, e o hedge nao sai. O ticket do
+  hedge e acertado como o da chamada principal (uso real, ou zero se foi cancelado).
+
+Depois da resposta, `settle(ticket, tokens_reais)` acerta a estimativa no bucket de tokens.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import settings
+
+logger = logging.getLogger(__name__)
+
+PRIORITY: Dict[str, int] = {"router": 0, "route_plan": 0, "choice": 0, "planner": 1, "synthesis": 2, "render": 3}
+DEFAULT_PRIORITY = 1
+# fracao minima do orcamento que precisa sobrar depois da chamada, por prioridade
+RESERVE_FRACTION: Dict[int, float] = {0: 0.0, 1: 0.1, 2: 0.25, 3: 0.5}
+SHEDDABLE = {2, 3}
+
+
+class LLMShed(RuntimeError):
+    """Chamada opcional descartada por falta de orcamento."""
+
+
+class LLMBudgetTimeout(RuntimeError):
+    """Prazo do componente estourou esperando orcamento (o provedor nem foi chamado)."""
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+    """Estimativa previa para o orcamento de TPM (~4 caracteres por token + teto da resposta)."""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + max_tokens
+
+
+class _Bucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        missing = amount - self.level
+        return missing / self.rate if missing > 0 and self.rate > 0 else 0.0
+
+
+@dataclass
+class Ticket:
+    component: str
+    priority: int
+    tokens: float
+    wait_s: float
+
+
+class Scheduler:
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []  # heap (prioridade, chegada)
+        self._seq = itertools.count()
+        self.stats: Counter = Counter()
+        self.wait_sum: Counter = Counter()
+
+    def _level_after(self, tokens: float) -> float:
+        return min(
+            (self.requests.level - 1) / self.requests.capacity,
+            (self.tokens.level - tokens) / self.tokens.capacity,
+        )
+
+    def _seconds_until_fits(self, tokens: float, reserve: float) -> float:
+        return max(
+            self.requests.seconds_until(1 + reserve * self.requests.capacity),
+            self.tokens.seconds_until(tokens + reserve * self.tokens.capacity),
+        )
+
+    def acquire(self, component: str, tokens: float, timeout_s: float) -> Ticket:
+        priority = PRIORITY.get(component, DEFAULT_PRIORITY)
+        reserve = RESERVE_FRACTION.get(priority, 0.0)
+        tokens = min(float(tokens), self.tokens.capacity)
+        started = time.monotonic()
+        end = started + timeout_s
+        me = (priority, next(self._seq))
+
+        with self._cond:
+            self.requests.refill(started)
+            self.tokens.refill(started)
+            if priority in SHEDDABLE and self._level_after(tokens) < reserve:
+                self.stats[f"shed:{component}"] += 1
+                logger.info("llm_scheduler shed component=%s", component)
+                raise LLMShed(f"{component}: orcamento de LLM baixo")
+
+            heapq.heappush(self._waiting, me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    if self._waiting[0] == me and self._level_after(tokens) >= reserve:
+                        self.requests.level -= 1
+                        self.tokens.level -= tokens
+                        break
+                    if now >= end:
+                        self.stats[f"timeout:{component}"] += 1
+                        raise LLMBudgetTimeout(f"{component}: sem orcamento de LLM em {timeout_s:.1f}s")
+                    wait = min(end - now, max(0.01, self._seconds_until_fits(tokens, reserve)))
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiting.remove(me)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+        wait_s = time.monotonic() - started
+        self.stats[f"granted:{component}"] += 1
+        self.wait_sum[component] += wait_s
+        return Ticket(component=component, priority=priority, tokens=tokens, wait_s=wait_s)
+
+    def try_acquire(self, component: str, tokens: float) -> Optional[Ticket]:
+        """Ticket sem esperar (hedge); None abaixo da reserva da classe ou com chamadas na fila."""
+        priority = PRIORITY.get(component, DEFAULT_PRIORITY)
+        reserve = RESERVE_FRACTION.get(priority, 0.0)
+        tokens = min(float(tokens), self.tokens.capacity)
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            if self._waiting or self._level_after(tokens) < reserve:
+                self.stats[f"hedge_denied:{component}"] += 1
+                return None
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            self.stats[f"hedge:{component}"] += 1
+        return Ticket(component=component, priority=priority, tokens=tokens, wait_s=0.0)
+
+    def settle(self, ticket: Ticket, actual_tokens: Optional[int]) -> None:
+        """Acerta a estimativa com o uso real (devolve ou cobra a diferenca)."""
+        if actual_tokens is None:
+            return
+        with self._cond:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + ticket.tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            components = sorted({k.split(":", 1)[1] for k in self.stats})
+            return {
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level, 1),
+                "waiting": len(self._waiting),
+                "components": {
+                    c: {
+                        "granted": self.stats[f"granted:{c}"],
+                        "shed": self.stats[f"shed:{c}"],
+                        "timeouts": self.stats[f"timeout:{c}"],
+                        "hedges": self.stats[f"hedge:{c}"],
+                        "hedges_denied": self.stats[f"hedge_denied:{c}"],
+                        "queue_wait_avg_ms": round(
+                            self.wait_sum[c] / self.stats[f"granted:{c}"] * 1000, 2
+                        ) if self.stats[f"granted:{c}"] else 0.0,
+                    }
+                    for c in components
+                },
+            }
+
+
+_lock = threading.Lock()
+_scheduler: Optional[Scheduler] = None
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(settings.LLM_RPM_LIMIT, settings.LLM_TPM_LIMIT)
+        return _scheduler
+
+
+def reset() -> None:
+    global _scheduler
+    with _lock:
+        _scheduler = None
+
+
+def acquire(component: str, tokens: float, timeout_s: float) -> Optional[Ticket]:
+    """Ticket para chamar o LLM; None com o scheduler desligado. Levanta LLMShed ou LLMBudgetTimeout."""
+    if not settings.LLM_SCHEDULER_ENABLED:
+        return None
+    return get_scheduler().acquire(component, tokens, timeout_s)
+
+
+def acquire_hedge(component: str, tokens: float) -> Tuple[bool, Optional[Ticket]]:
+    """
+    Cobra a tentativa extra do hedging no orcamento: (pode fazer hedge, ticket para `settle`).
+    Sem folga: (False, None). Scheduler desligado: (True, None).
+    """
+    if not settings.LLM_SCHEDULER_ENABLED:
+        return True, None
+    ticket = get_scheduler().try_acquire(component, tokens)
+    return ticket is not None, ticket
+
+
+def settle(ticket: Optional[Ticket], actual_tokens: Optional[int]) -> None:
+    if ticket is not None:
+        get_scheduler().settle(ticket, actual_tokens)
+
+
+def render_prometheus() -> str:
+    if not settings.LLM_SCHEDULER_ENABLED:
+        return ""
+    snap = get_scheduler().snapshot()
+    lines = [
+        "# HELP llm_budget_available Orcamento restante nos token buckets do scheduler.",
+        "# TYPE llm_budget_available gauge",
+        f'llm_budget_available{{kind="requests"}} {snap["requests_available"]}',
+        f'llm_budget_available{{kind="tokens"}} {snap["tokens_available"]}',
+        "# HELP llm_scheduler_waiting Chamadas esperando orcamento.",
+        "# TYPE llm_scheduler_waiting gauge",
+        f'llm_scheduler_waiting {snap["waiting"]}',
+        "# HELP llm_scheduler_requests_total Decisoes do scheduler por componente.",
+        "# TYPE llm_scheduler_requests_total counter",
+    ]
+    for component, s in snap["components"].items():  # type: ignore[union-attr]
+        for result in ("granted", "shed", "timeouts", "hedges", "hedges_denied"):
+            lines.append(f'llm_scheduler_requests_total{{component="{component}",result="{result}"}} {s[result]}')
+    return "\n".join(lines) + "\n"
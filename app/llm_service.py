@@ -9,13 +9,16 @@ import os
 import json
 import logging
 from typing import Optional, Dict, List, Any
-from groq import Groq
-from app import settings
+from app import llm_breaker, llm_scheduler, llm_telemetry, llm_transport, router_cache, settings, synthesis_table
+from app.llm_client import LLMClient, deadline_for
 
 
 # Cliente Groq (singleton)
 _groq_client = None
 
+LLM_MODEL = "llama-3.3-70b-versatile"
+SYNTHESIS_MODEL = LLM_MODEL
+
 _ROUTER_INTENTS = {
     "BROWSE_CATALOG",
     "FIND_PRODUCT",
@@ -53,17 +56,105 @@ _RENDER_STYLES = {
 }
 
 
-def _get_groq_client() -> Groq:
-    """Retorna cliente Groq (singleton)."""
+# Blocos de prompt compartilhados entre router, planner e o modo fundido (route_and_plan)
+_ROUTER_RULES = """REGRAS ABSOLUTAS:
+- NUNCA responda ao usuario, somente JSON valido
+- NAO invente produtos
+- NUNCA liste catalogo aqui
+
+REGRA CRITICA PARA PRODUTOS GENERICOS:
+- Se o usuario pedir cimento/tinta/areia/brita/argamassa SEM especificar uso/aplicacao:
+  - Use action=ASK_USAGE_CONTEXT (SEMPRE)
+  - Inclua clarifying_question perguntando o uso
+- So use ANSWER_WITH_RAG se state_summary.consultive_context_missing estiver VAZIO
+
+ROTEAMENTO:
+- "que tipos tem / quais opcoes / tem X?" -> BROWSE_CATALOG + SHOW_CATALOG
+- "quero X para Y" (com aplicacao) -> ASK_USAGE_CONTEXT (para coletar mais contexto)
+- "quero X" (generico, sem aplicacao) -> ASK_USAGE_CONTEXT
+- checkout/pagamento/orcamento -> HANDOFF_CHECKOUT
+- incerto -> ASK_CLARIFYING_QUESTION ou NOOP
+
+"""
+
+_ROUTER_SCHEMA = """{
+  "intent": "BROWSE_CATALOG|FIND_PRODUCT|TECHNICAL_QUESTION|ADD_TO_CART|REMOVE_ITEM|CHECKOUT|PAYMENT|ORDER_STATUS|SMALLTALK|UNKNOWN",
+  "product_query": "string ou null",
+  "category_hint": "string ou null",
+  "constraints": {},
+  "action": "SHOW_CATALOG|SEARCH_PRODUCTS|ASK_CLARIFYING_QUESTION|ASK_USAGE_CONTEXT|ANSWER_WITH_RAG|HANDOFF_CHECKOUT|NOOP",
+  "clarifying_question": "string ou null",
+  "confidence": 0.0
+}
+"""
+
+_PLANNER_RULES = """REGRAS ABSOLUTAS:
+- NUNCA liste produtos, catalogo, preco ou estoque
+- NUNCA invente dados
+- Responda SOMENTE com JSON valido
+- Pergunte UMA pergunta curta por vez
+
+REGRA CRITICA PARA READY_TO_ANSWER:
+- CIMENTO/ARGAMASSA: so use READY_TO_ANSWER se known_context tiver application E environment
+- TINTA: so use READY_TO_ANSWER se known_context tiver surface E environment
+- Se known_context estiver vazio ou incompleto, use ASK_CONTEXT com missing_fields
+
+CAMPOS OBRIGATORIOS POR PRODUTO:
+- cimento: application, environment (minimo)
+- tinta: surface, environment (minimo)
+- areia/brita: application (minimo)
+
+"""
+
+_PLANNER_SCHEMA = """{
+  "missing_fields": ["..."],
+  "next_action": "ASK_CONTEXT|READY_TO_ANSWER|ASK_CLARIFYING_QUESTION",
+  "next_question": "string ou null",
+  "assumptions": ["..."],
+  "confidence": 0.0
+}
+"""
+
+
+def _new_live_client() -> LLMClient:
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY não encontrada no .env")
+    return LLMClient(api_key=api_key, base_url=os.getenv("GROQ_BASE_URL") or None)
+
+
+def _get_groq_client() -> Any:
+    """
+    Retorna cliente Groq (singleton): async por baixo, com prazo, limite em voo e hedging.
+    LLM_TRANSPORT=record|replay|synthetic troca por gravacao/replay/gerador local (llm_transport).
+    """
     global _groq_client
     if _groq_client is None:
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY não encontrada no .env")
-        _groq_client = Groq(api_key=api_key)
+        _groq_client = llm_transport.build_client(settings.LLM_TRANSPORT, _new_live_client)
     return _groq_client
 
 
+def _complete(client: Any, call: "llm_telemetry.LLMCall", component: str, **kwargs: Any) -> Any:
+    """
+    Chamada ao LLM passando pelo scheduler (prioridade + orcamento RPM/TPM, llm_scheduler).
+    Levanta LLMShed se a chamada opcional for descartada (LLMBudgetTimeout se o prazo acabar na
+    fila); a espera na fila sai do prazo do componente.
+    """
+    ticket = llm_scheduler.acquire(
+        component,
+        llm_scheduler.estimate_tokens(kwargs.get("messages") or [], int(kwargs.get("max_tokens") or 0)),
+        deadline_for(component),
+    )
+    if ticket is not None:
+        call.queue_wait_s = ticket.wait_s
+        kwargs["deadline_s"] = max(0.1, deadline_for(component) - ticket.wait_s)
+    response = client.chat.completions.create(component=component, trace=call.trace, **kwargs)
+    call.observe(response)
+    if call.prompt_tokens is not None or call.completion_tokens is not None:
+        llm_scheduler.settle(ticket, (call.prompt_tokens or 0) + (call.completion_tokens or 0))
+    return response
+
+
 def _redact_text(text: str) -> str:
     """Reduz risco de PII em logs."""
     if not text:
@@ -189,48 +280,32 @@ def route_intent(message: str, state_summary: Dict[str, Any]) -> Optional[Dict[s
     """
     LLM Router: classifica a intencao e retorna decisao estruturada em JSON.
 
-    Retorna dict validado ou None em erro (para fallback do fluxo atual).
+    Retorna dict validado ou None em erro (para fallback do fluxo atual); vindo do
+    router_cache, leva source="cache".
     """
     if not message or not isinstance(state_summary, dict):
         return None
 
-    prompt = f"""Voce e um roteador LLM para um chatbot de materiais de construcao.
-
-REGRAS ABSOLUTAS:
-- NUNCA responda ao usuario, somente JSON valido
-- NAO invente produtos
-- NUNCA liste catalogo aqui
-
-REGRA CRITICA PARA PRODUTOS GENERICOS:
-- Se o usuario pedir cimento/tinta/areia/brita/argamassa SEM especificar uso/aplicacao:
-  - Use action=ASK_USAGE_CONTEXT (SEMPRE)
-  - Inclua clarifying_question perguntando o uso
-- So use ANSWER_WITH_RAG se state_summary.consultive_context_missing estiver VAZIO
-
-ROTEAMENTO:
-- "que tipos tem / quais opcoes / tem X?" -> BROWSE_CATALOG + SHOW_CATALOG
-- "quero X para Y" (com aplicacao) -> ASK_USAGE_CONTEXT (para coletar mais contexto)
-- "quero X" (generico, sem aplicacao) -> ASK_USAGE_CONTEXT
-- checkout/pagamento/orcamento -> HANDOFF_CHECKOUT
-- incerto -> ASK_CLARIFYING_QUESTION ou NOOP
-
-RETORNE SOMENTE ESTE JSON:
-{{
-  "intent": "BROWSE_CATALOG|FIND_PRODUCT|TECHNICAL_QUESTION|ADD_TO_CART|REMOVE_ITEM|CHECKOUT|PAYMENT|ORDER_STATUS|SMALLTALK|UNKNOWN",
-  "product_query": "string ou null",
-  "category_hint": "string ou null",
-  "constraints": {{}},
-  "action": "SHOW_CATALOG|SEARCH_PRODUCTS|ASK_CLARIFYING_QUESTION|ASK_USAGE_CONTEXT|ANSWER_WITH_RAG|HANDOFF_CHECKOUT|NOOP",
-  "clarifying_question": "string ou null",
-  "confidence": 0.0
-}}
+    cached = router_cache.get(message, state_summary)
+    if cached is not None:
+        logging.info(
+            "llm_router cache_hit intent=%s action=%s msg=%s",
+            cached.get("intent"),
+            cached.get("action"),
+            _redact_text(message),
+        )
+        return dict(cached, source="cache")  # nao e decisao nova do LLM
 
-MENSAGEM DO USUARIO:
-{message}
+    prompt = (
+        "Voce e um roteador LLM para um chatbot de materiais de construcao.\n\n"
+        f"{_ROUTER_RULES}RETORNE SOMENTE ESTE JSON:\n{_ROUTER_SCHEMA}\n"
+        f"MENSAGEM DO USUARIO:\n{message}\n\n"
+        f"STATE_SUMMARY (json):\n{json.dumps(state_summary, ensure_ascii=False)}\n"
+    )
 
-STATE_SUMMARY (json):
-{json.dumps(state_summary, ensure_ascii=False)}
-"""
+    if not llm_breaker.allow("router"):
+        logging.info("llm_router skipped breaker=open")
+        return None
 
     try:
         client = _get_groq_client()
@@ -241,28 +316,34 @@ STATE_SUMMARY (json):
             _redact_text(message),
         )
 
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=200,
-        )
-
-        raw = response.choices[0].message.content if response.choices else ""
-        payload = _parse_json_text(raw)
-        validated = _validate_route_payload(payload or {})
-        if not validated:
-            logging.info("llm_router invalid_json output=%s", _redact_text(str(raw)))
-            return None
-
-        logging.info(
-            "llm_router output intent=%s action=%s confidence=%.2f product_query=%s",
-            validated.get("intent"),
-            validated.get("action"),
-            float(validated.get("confidence", 0.0)),
-            _redact_text(validated.get("product_query") or ""),
-        )
-        return validated
+        with llm_telemetry.track("router", LLM_MODEL) as call:
+            response = _complete(
+                client,
+                call,
+                component="router",
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,
+                max_tokens=200,
+            )
+
+            raw = response.choices[0].message.content if response.choices else ""
+            payload = _parse_json_text(raw)
+            validated = _validate_route_payload(payload or {})
+            if not validated:
+                call.outcome = "parse_error" if payload is None else "invalid"
+                logging.info("llm_router invalid_json output=%s", _redact_text(str(raw)))
+                return None
+
+            logging.info(
+                "llm_router output intent=%s action=%s confidence=%.2f product_query=%s",
+                validated.get("intent"),
+                validated.get("action"),
+                float(validated.get("confidence", 0.0)),
+                _redact_text(validated.get("product_query") or ""),
+            )
+            router_cache.put(message, state_summary, validated)
+            return validated
     except Exception as e:
         logging.info("llm_router error=%s", str(e)[:200])
         return None
@@ -282,79 +363,156 @@ def plan_consultive_next_step(
     if not message or not isinstance(state_summary, dict) or not isinstance(known_context, dict):
         return None
 
-    prompt = f"""Voce e um planner consultivo para materiais de construcao.
-Seu trabalho e decidir o proximo passo com base na pergunta e contexto.
+    prompt = (
+        "Voce e um planner consultivo para materiais de construcao.\n"
+        "Seu trabalho e decidir o proximo passo com base na pergunta e contexto.\n\n"
+        f"{_PLANNER_RULES}SCHEMA DE SAIDA:\n{_PLANNER_SCHEMA}\n"
+        f"MENSAGEM DO USUARIO:\n{message}\n\n"
+        f"PRODUCT_HINT:\n{product_hint or ''}\n\n"
+        f"KNOWN_CONTEXT (json):\n{json.dumps(known_context, ensure_ascii=False)}\n\n"
+        f"STATE_SUMMARY (json):\n{json.dumps(state_summary, ensure_ascii=False)}\n"
+    )
+
+    if not llm_breaker.allow("planner"):
+        logging.info("llm_planner skipped breaker=open")
+        return None
 
-REGRAS ABSOLUTAS:
-- NUNCA liste produtos, catalogo, preco ou estoque
-- NUNCA invente dados
-- Responda SOMENTE com JSON valido
-- Pergunte UMA pergunta curta por vez
+    try:
+        client = _get_groq_client()
+        logging.info(
+            "llm_planner input_len=%s product_hint=%s msg=%s",
+            len(message),
+            _redact_text(product_hint or ""),
+            _redact_text(message),
+        )
 
-REGRA CRITICA PARA READY_TO_ANSWER:
-- CIMENTO/ARGAMASSA: so use READY_TO_ANSWER se known_context tiver application E environment
-- TINTA: so use READY_TO_ANSWER se known_context tiver surface E environment
-- Se known_context estiver vazio ou incompleto, use ASK_CONTEXT com missing_fields
+        with llm_telemetry.track("planner", LLM_MODEL) as call:
+            response = _complete(
+                client,
+                call,
+                component="planner",
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,
+                max_tokens=200,
+            )
+
+            raw = response.choices[0].message.content if response.choices else ""
+            payload = _parse_json_text(raw)
+            validated = _validate_consultive_plan(payload or {})
+            if not validated:
+                call.outcome = "parse_error" if payload is None else "invalid"
+                logging.info("llm_planner invalid_json output=%s", _redact_text(str(raw)))
+                return None
+
+            logging.info(
+                "llm_planner output action=%s confidence=%.2f missing=%s",
+                validated.get("next_action"),
+                float(validated.get("confidence", 0.0)),
+                validated.get("missing_fields"),
+            )
+            return validated
+    except Exception as e:
+        logging.info("llm_planner error=%s", str(e)[:200])
+        return None
 
-CAMPOS OBRIGATORIOS POR PRODUTO:
-- cimento: application, environment (minimo)
-- tinta: surface, environment (minimo)
-- areia/brita: application (minimo)
 
-SCHEMA DE SAIDA:
-{{
-  "missing_fields": ["..."],
-  "next_action": "ASK_CONTEXT|READY_TO_ANSWER|ASK_CLARIFYING_QUESTION",
-  "next_question": "string ou null",
-  "assumptions": ["..."],
-  "confidence": 0.0
-}}
+# Acoes do router que levam ao planner consultivo no mesmo turno
+_PLANNED_ACTIONS = {"ASK_USAGE_CONTEXT", "ANSWER_WITH_RAG"}
 
-MENSAGEM DO USUARIO:
-{message}
 
-PRODUCT_HINT:
-{product_hint or ""}
+def route_and_plan(
+    message: str,
+    state_summary: Dict[str, Any],
+    known_context: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """
+    Router + planner numa chamada so (turnos consultivos: um hop serial de LLM em vez de dois).
 
-KNOWN_CONTEXT (json):
-{json.dumps(known_context, ensure_ascii=False)}
+    Retorna a rota validada (como `route_intent`) com a chave extra "plan": o plano
+    validado quando a acao leva ao planner, ou None (o fluxo chama o planner a parte).
+    """
+    if not message or not isinstance(state_summary, dict) or not isinstance(known_context, dict):
+        return None
 
-STATE_SUMMARY (json):
-{json.dumps(state_summary, ensure_ascii=False)}
-"""
+    cache_key = {"mode": "route_and_plan", "state": state_summary, "known_context": known_context}
+    cached = router_cache.get(message, cache_key)
+    if cached is not None:
+        logging.info(
+            "llm_route_plan cache_hit intent=%s action=%s msg=%s",
+            cached.get("intent"),
+            cached.get("action"),
+            _redact_text(message),
+        )
+        return dict(cached, source="cache")  # nao e decisao nova do LLM
+
+    schema = f'{{\n"route": {_ROUTER_SCHEMA.strip()},\n"plan": {_PLANNER_SCHEMA.strip()} ou null\n}}\n'
+    prompt = (
+        "Voce e o roteador e o planner consultivo de um chatbot de materiais de construcao.\n"
+        "Faca as DUAS tarefas e devolva um JSON so.\n\n"
+        f"TAREFA 1 - ROTEAMENTO (campo \"route\")\n{_ROUTER_RULES}"
+        "TAREFA 2 - PLANO CONSULTIVO (campo \"plan\")\n"
+        "- Preencha SOMENTE se route.action for ASK_USAGE_CONTEXT ou ANSWER_WITH_RAG; senao plan = null\n"
+        "- O produto do plano e o category_hint/product_query da rota\n"
+        "- Junte ao KNOWN_CONTEXT o que a mensagem informar (route.constraints)\n\n"
+        f"{_PLANNER_RULES}RETORNE SOMENTE ESTE JSON:\n{schema}\n"
+        f"MENSAGEM DO USUARIO:\n{message}\n\n"
+        f"KNOWN_CONTEXT (json):\n{json.dumps(known_context, ensure_ascii=False)}\n\n"
+        f"STATE_SUMMARY (json):\n{json.dumps(state_summary, ensure_ascii=False)}\n"
+    )
+
+    if not llm_breaker.allow("route_plan"):
+        logging.info("llm_route_plan skipped breaker=open")
+        return None
 
     try:
         client = _get_groq_client()
         logging.info(
-            "llm_planner input_len=%s product_hint=%s msg=%s",
+            "llm_route_plan input_len=%s state_keys=%s msg=%s",
             len(message),
-            _redact_text(product_hint or ""),
+            list(state_summary.keys()),
             _redact_text(message),
         )
 
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=200,
-        )
-
-        raw = response.choices[0].message.content if response.choices else ""
-        payload = _parse_json_text(raw)
-        validated = _validate_consultive_plan(payload or {})
-        if not validated:
-            logging.info("llm_planner invalid_json output=%s", _redact_text(str(raw)))
-            return None
-
-        logging.info(
-            "llm_planner output action=%s confidence=%.2f missing=%s",
-            validated.get("next_action"),
-            float(validated.get("confidence", 0.0)),
-            validated.get("missing_fields"),
-        )
-        return validated
+        with llm_telemetry.track("route_plan", LLM_MODEL) as call:
+            response = _complete(
+                client,
+                call,
+                component="route_plan",
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,
+                max_tokens=400,
+            )
+
+            raw = response.choices[0].message.content if response.choices else ""
+            payload = _parse_json_text(raw)
+            route_payload = (payload or {}).get("route")
+            route = _validate_route_payload(route_payload if isinstance(route_payload, dict) else {})
+            if not route:
+                call.outcome = "parse_error" if payload is None else "invalid"
+                logging.info("llm_route_plan invalid_json output=%s", _redact_text(str(raw)))
+                return None
+
+            plan = None
+            if route["action"] in _PLANNED_ACTIONS and isinstance(payload.get("plan"), dict):
+                plan = _validate_consultive_plan(payload["plan"])
+                if not plan:
+                    call.outcome = "invalid_plan"
+                    logging.info("llm_route_plan invalid_plan output=%s", _redact_text(str(payload.get("plan"))))
+            route["plan"] = plan
+
+            logging.info(
+                "llm_route_plan output intent=%s action=%s confidence=%.2f plan=%s",
+                route.get("intent"),
+                route.get("action"),
+                float(route.get("confidence", 0.0)),
+                plan.get("next_action") if plan else None,
+            )
+            router_cache.put(message, cache_key, route)
+            return route
     except Exception as e:
-        logging.info("llm_planner error=%s", str(e)[:200])
+        logging.info("llm_route_plan error=%s", str(e)[:200])
         return None
 
 
@@ -441,6 +599,10 @@ FACTS (json):
 Retorne apenas o texto da mensagem (sem JSON, sem markdown extra).
 """
 
+    if not llm_breaker.allow("render"):
+        logging.info("llm_render skipped breaker=open")
+        return None
+
     try:
         client = _get_groq_client()
         logging.info(
@@ -448,20 +610,26 @@ Retorne apenas o texto da mensagem (sem JSON, sem markdown extra).
             _redact_text(str(facts.get("type", ""))),
             style,
         )
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            max_tokens=250,
-        )
-        raw = response.choices[0].message.content if response.choices else ""
-        text = (raw or "").strip().strip("`").strip()
-        if text.startswith("{") and text.endswith("}"):
-            return None
-        if not _render_output_is_safe(text, facts):
-            logging.info("llm_render unsafe_output=%s", _redact_text(text))
-            return None
-        return text
+        with llm_telemetry.track("render", LLM_MODEL) as call:
+            response = _complete(
+                client,
+                call,
+                component="render",
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2,
+                max_tokens=250,
+            )
+            raw = response.choices[0].message.content if response.choices else ""
+            text = (raw or "").strip().strip("`").strip()
+            if text.startswith("{") and text.endswith("}"):
+                call.outcome = "invalid"
+                return None
+            if not _render_output_is_safe(text, facts):
+                call.outcome = "unsafe"
+                logging.info("llm_render unsafe_output=%s", _redact_text(text))
+                return None
+            return text
     except Exception as e:
         logging.info("llm_render error=%s", str(e)[:200])
         return None
@@ -538,33 +706,42 @@ Exemplos:
 - "não sei" → NENHUM
 """
 
+    # circuito aberto: fica so o parse_choice_indices de quem chamou
+    if not llm_breaker.allow("choice"):
+        return None
+
     try:
         client = _get_groq_client()
 
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,  # Baixa temperatura para escolha precisa
-            max_tokens=10,
-        )
-
-        result = response.choices[0].message.content.strip()
-
-        # Tenta extrair número
-        if result.upper() == "NENHUM":
+        with llm_telemetry.track("choice", LLM_MODEL) as call:
+            response = _complete(
+                client,
+                call,
+                component="choice",
+                model=LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,  # Baixa temperatura para escolha precisa
+                max_tokens=10,
+            )
+
+            result = response.choices[0].message.content.strip()
+
+            # Tenta extrair número
+            if result.upper() == "NENHUM":
+                return None
+
+            # Extrai número da resposta
+            import re
+            nums = re.findall(r"\d+", result)
+            if nums:
+                choice_num = int(nums[0])
+                # Valida range
+                if 1 <= choice_num <= len(options):
+                    return choice_num
+
+            call.outcome = "invalid"
             return None
 
-        # Extrai número da resposta
-        import re
-        nums = re.findall(r"\d+", result)
-        if nums:
-            choice_num = int(nums[0])
-            # Valida range
-            if 1 <= choice_num <= len(options):
-                return choice_num
-
-        return None
-
     except Exception as e:
         print(f"[WARN] LLM interpret_choice falhou: {e}")
         return None
@@ -618,6 +795,38 @@ def generate_technical_synthesis(
             print(f"[WARN] generate_technical_synthesis chamada sem 'application' no contexto. Produto: {product_category}")
             return ""
 
+    # Tabela pre-computada (python -m app.synthesis_table): contexto ja visto nao chama LLM
+    cached = synthesis_table.lookup(product_category, context, technical_factors)
+    if cached:
+        return cached
+
+    if llm_breaker.allow("synthesis"):
+        try:
+            return llm_technical_synthesis(product_category, context, technical_factors)
+        except Exception as e:
+            print(f"[WARN] LLM generate_technical_synthesis falhou: {e}")
+    return _rules_synthesis(product_category, context)
+
+
+def _rules_synthesis(product_category: str, context: Dict[str, Any]) -> str:
+    """Sintese sem LLM: reasoning da TECHNICAL_RULES que bate com o contexto, senao texto generico."""
+    from app.flows.technical_recommendations import get_technical_recommendation
+
+    rec = get_technical_recommendation({**context, "product": product_category})
+    if rec and rec.get("reasoning"):
+        return rec["reasoning"]
+    # Fallback genérico
+    if context.get("application"):
+        return f"Para {context['application']}, considere os fatores técnicos relevantes para garantir a melhor escolha."
+    return "Considere os fatores técnicos relevantes para sua aplicação."
+
+
+def build_synthesis_prompt(
+    product_category: str,
+    context: Dict[str, Any],
+    technical_factors: List[str]
+) -> str:
+    """Prompt da síntese técnica (o hash dele versiona as entradas da tabela pre-computada)."""
     # Monta contexto legível
     context_items = []
     if context.get("application"):
@@ -638,7 +847,7 @@ def generate_technical_synthesis(
     context_text = "\n".join(context_items) if context_items else "Contexto não especificado"
     factors_text = ", ".join(technical_factors) if technical_factors else "fatores padrão"
 
-    prompt = f"""Voce e um vendedor tecnico de materiais de construcao. Seja direto e tecnico.
+    return f"""Voce e um vendedor tecnico de materiais de construcao. Seja direto e tecnico.
 
 REGRA ABSOLUTA - ANTI-ALUCINACAO:
 - Use APENAS as informacoes do CONTEXTO COLETADO abaixo
@@ -662,11 +871,22 @@ FORMATO:
 
 Gere a explicacao (2-3 frases, sem inventar dados):"""
 
-    try:
-        client = _get_groq_client()
 
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+def llm_technical_synthesis(
+    product_category: str,
+    context: Dict[str, Any],
+    technical_factors: List[str]
+) -> str:
+    """Chama o LLM para a síntese (sem gate nem fallback: levanta excecao em erro)."""
+    prompt = build_synthesis_prompt(product_category, context, technical_factors)
+    client = _get_groq_client()
+
+    with llm_telemetry.track("synthesis", SYNTHESIS_MODEL) as call:
+        response = _complete(
+            client,
+            call,
+            component="synthesis",
+            model=SYNTHESIS_MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3,  # Baixa temperatura para consistência técnica
             max_tokens=200,
@@ -675,16 +895,7 @@ Gere a explicacao (2-3 frases, sem inventar dados):"""
         synthesis = response.choices[0].message.content.strip()
 
         # Remove aspas se houver
-        synthesis = synthesis.strip('"').strip("'")
-
-        return synthesis
-
-    except Exception as e:
-        print(f"[WARN] LLM generate_technical_synthesis falhou: {e}")
-        # Fallback genérico
-        if context.get("application"):
-            return f"Para {context['application']}, considere os fatores técnicos relevantes para garantir a melhor escolha."
-        return "Considere os fatores técnicos relevantes para sua aplicação."
+        return synthesis.strip('"').strip("'")
 
 
 def extract_product_factors(product_category: str) -> List[str]:
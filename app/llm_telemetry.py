@@ -0,0 +1,293 @@
+"""
+Telemetria das chamadas ao LLM (Groq): latencia, tokens, tentativas, resultado da validacao e custo.
+
+Cada chamada em `llm_service` roda dentro de `track(component, model)`:
+
+    with llm_telemetry.track("router", model) as call:
+        response = _complete(client, call, component="router", ...)  # scheduler + create + observe
+        ...
+        if not payload:
+            call.outcome = "parse_error"
+
+Resultados: ok | parse_error (JSON ilegivel) | invalid (validador recusou) | invalid_plan
+(route_and_plan: rota ok, plano recusado) | unsafe (render com dado fora dos FACTS) |
+shed (descartada pelo llm_scheduler) | budget_timeout (prazo acabou na fila do scheduler) |
+timeout | error. As tentativas (hedging) vem do
+`LLMClient` via `call.trace`; a espera na fila do scheduler, de `call.queue_wait_s`.
+
+Saidas:
+- contadores e histograma de latencia em memoria, por componente: `snapshot()` e
+  `render_prometheus()` (endpoint GET /metrics);
+- uma linha JSON por chamada em LLM_TELEMETRY_LOG_PATH (rotacao por tamanho) para analise offline.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app import llm_breaker, llm_scheduler, settings
+
+logger = logging.getLogger(__name__)
+
+# Limites (s) do histograma de latencia
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+# Limites (s) do histograma de espera na fila do llm_scheduler
+QUEUE_WAIT_BUCKETS: Tuple[float, ...] = (0.005, 0.05, 0.25, 0.5, 1.0, 2.0, 4.0)
+
+# USD por milhao de tokens (entrada, saida); modelo fora da tabela nao entra no custo
+MODEL_PRICES_USD_PER_MTOK: Dict[str, Tuple[float, float]] = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+OUTCOMES = ("ok", "parse_error", "invalid", "invalid_plan", "unsafe", "shed", "budget_timeout", "timeout", "error")
+# decididos pelo llm_scheduler sem chamar o provedor: fora do circuit breaker
+LOCAL_OUTCOMES = ("shed", "budget_timeout")
+
+
+class LLMCall:
+    def __init__(self, component: str, model: str):
+        self.component = component
+        self.model = model
+        self.outcome = "ok"
+        self.error: Optional[str] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.queue_wait_s = 0.0
+        # preenchido pelo LLMClient (tentativas, hedge)
+        self.trace: Dict[str, Any] = {}
+
+    def observe(self, response: Any) -> None:
+        """Le o uso de tokens da resposta (formato OpenAI/Groq), se houver."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        self.prompt_tokens = _as_int(getattr(usage, "prompt_tokens", None))
+        self.completion_tokens = _as_int(getattr(usage, "completion_tokens", None))
+
+
+def _as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_cost_usd(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    prices = MODEL_PRICES_USD_PER_MTOK.get(model)
+    if prices is None or (prompt_tokens is None and completion_tokens is None):
+        return None
+    return ((prompt_tokens or 0) * prices[0] + (completion_tokens or 0) * prices[1]) / 1_000_000
+
+
+class _ComponentStats:
+    def __init__(self) -> None:
+        self.outcomes: Counter = Counter()
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)  # ultimo = +Inf
+        self.latency_sum = 0.0
+        self.queue_buckets: List[int] = [0] * (len(QUEUE_WAIT_BUCKETS) + 1)
+        self.queue_wait_sum = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.attempts = 0
+        self.cost_usd = 0.0
+
+
+_lock = threading.Lock()
+_components: Dict[str, _ComponentStats] = defaultdict(_ComponentStats)
+
+_log_lock = threading.Lock()
+_call_logger = logging.getLogger("llm_telemetry.calls")
+_call_logger.propagate = False
+_log_handler: Optional[logging.Handler] = None
+_log_handler_path: Optional[str] = None
+
+
+def _file_logger() -> Optional[logging.Logger]:
+    """Logger da trilha JSONL; recria o handler se LLM_TELEMETRY_LOG_PATH mudar."""
+    global _log_handler, _log_handler_path
+    path = settings.LLM_TELEMETRY_LOG_PATH
+    with _log_lock:
+        if _log_handler_path != path:
+            if _log_handler is not None:
+                _call_logger.removeHandler(_log_handler)
+                _log_handler.close()
+                _log_handler = None
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    path,
+                    maxBytes=settings.LLM_TELEMETRY_LOG_MAX_BYTES,
+                    backupCount=settings.LLM_TELEMETRY_LOG_BACKUPS,
+                    encoding="utf-8",
+                )
+            except OSError as e:
+                print(f"[llm_telemetry] nao consegui abrir {path}: {e}")
+                return None
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _call_logger.addHandler(handler)
+            _call_logger.setLevel(logging.INFO)
+            _log_handler, _log_handler_path = handler, path
+    return _call_logger
+
+
+def record(call: LLMCall, latency_s: float) -> Dict[str, Any]:
+    attempts = int(call.trace.get("attempts") or 1)
+    cost = estimate_cost_usd(call.model, call.prompt_tokens, call.completion_tokens)
+    row = {
+        "ts": round(time.time(), 3),
+        "component": call.component,
+        "model": call.model,
+        "latency_ms": round(latency_s * 1000, 1),
+        "queue_wait_ms": round(call.queue_wait_s * 1000, 1),
+        "prompt_tokens": call.prompt_tokens,
+        "completion_tokens": call.completion_tokens,
+        "attempts": attempts,
+        "hedged": bool(call.trace.get("hedged")),
+        "outcome": call.outcome,
+        "error": call.error,
+        "cost_usd": round(cost, 8) if cost is not None else None,
+    }
+
+    with _lock:
+        stats = _components[call.component]
+        stats.outcomes[call.outcome] += 1
+        idx = next((i for i, b in enumerate(LATENCY_BUCKETS) if latency_s <= b), len(LATENCY_BUCKETS))
+        stats.buckets[idx] += 1
+        stats.latency_sum += latency_s
+        if call.outcome != "shed":
+            q_idx = next((i for i, b in enumerate(QUEUE_WAIT_BUCKETS) if call.queue_wait_s <= b), len(QUEUE_WAIT_BUCKETS))
+            stats.queue_buckets[q_idx] += 1
+            stats.queue_wait_sum += call.queue_wait_s
+        stats.prompt_tokens += call.prompt_tokens or 0
+        stats.completion_tokens += call.completion_tokens or 0
+        stats.attempts += attempts
+        stats.cost_usd += cost or 0.0
+
+    if settings.LLM_TELEMETRY_LOG_ENABLED:
+        file_logger = _file_logger()
+        if file_logger is not None:
+            file_logger.info(json.dumps(row, ensure_ascii=False))
+    return row
+
+
+@contextmanager
+def track(component: str, model: str, breaker: Optional[str] = None) -> Iterator[LLMCall]:
+    """
+    Mede a chamada; excecao vira outcome timeout/error e e relancada.
+    O resultado alimenta o circuit breaker `breaker` (padrao: o proprio componente);
+    chamada descartada ou vencida na fila do scheduler nao conta como falha do provedor.
+    """
+    call = LLMCall(component, model)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        if isinstance(e, llm_scheduler.LLMShed):
+            call.outcome = "shed"
+        elif isinstance(e, llm_scheduler.LLMBudgetTimeout):
+            call.outcome = "budget_timeout"
+        else:
+            call.outcome = "timeout" if isinstance(e, TimeoutError) else "error"
+        call.error = f"{type(e).__name__}: {str(e)[:200]}"
+        raise
+    finally:
+        latency = time.perf_counter() - started
+        if call.outcome == "budget_timeout":
+            call.queue_wait_s = latency  # o prazo inteiro foi de fila
+        try:
+            record(call, latency)
+            if call.outcome not in LOCAL_OUTCOMES:
+                llm_breaker.record(breaker or component, call.outcome in ("timeout", "error"), latency)
+        except Exception as e:  # telemetria nunca derruba a chamada
+            logger.info("llm_telemetry record_error=%s", str(e)[:200])
+
+
+def reset() -> None:
+    with _lock:
+        _components.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        out: Dict[str, Any] = {}
+        for component, s in sorted(_components.items()):
+            calls = sum(s.outcomes.values())
+            out[component] = {
+                "calls": calls,
+                "outcomes": {o: s.outcomes[o] for o in OUTCOMES if s.outcomes[o]},
+                "attempts": s.attempts,
+                "latency_avg_ms": round(s.latency_sum / calls * 1000, 1) if calls else 0.0,
+                "latency_buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], s.buckets)),
+                "queue_wait_avg_ms": round(s.queue_wait_sum / max(1, sum(s.queue_buckets)) * 1000, 2),
+                "prompt_tokens": s.prompt_tokens,
+                "completion_tokens": s.completion_tokens,
+                "cost_usd": round(s.cost_usd, 6),
+            }
+        return out
+
+
+def render_prometheus() -> str:
+    """Formato texto do Prometheus (sem depender de prometheus_client)."""
+    with _lock:
+        items = sorted(_components.items())
+        lines = [
+            "# HELP llm_calls_total Chamadas ao LLM por componente e resultado.",
+            "# TYPE llm_calls_total counter",
+        ]
+        for component, s in items:
+            for outcome in OUTCOMES:
+                if s.outcomes[outcome]:
+                    lines.append(f'llm_calls_total{{component="{component}",outcome="{outcome}"}} {s.outcomes[outcome]}')
+
+        lines += [
+            "# HELP llm_call_latency_seconds Latencia das chamadas ao LLM (inclui hedging).",
+            "# TYPE llm_call_latency_seconds histogram",
+        ]
+        for component, s in items:
+            cumulative = 0
+            for bound, count in zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], s.buckets):
+                cumulative += count
+                lines.append(f'llm_call_latency_seconds_bucket{{component="{component}",le="{bound}"}} {cumulative}')
+            lines.append(f'llm_call_latency_seconds_sum{{component="{component}"}} {s.latency_sum:.6f}')
+            lines.append(f'llm_call_latency_seconds_count{{component="{component}"}} {cumulative}')
+
+        lines += [
+            "# HELP llm_queue_wait_seconds Espera na fila do llm_scheduler antes da chamada.",
+            "# TYPE llm_queue_wait_seconds histogram",
+        ]
+        for component, s in items:
+            cumulative = 0
+            for bound, count in zip([str(b) for b in QUEUE_WAIT_BUCKETS] + ["+Inf"], s.queue_buckets):
+                cumulative += count
+                lines.append(f'llm_queue_wait_seconds_bucket{{component="{component}",le="{bound}"}} {cumulative}')
+            lines.append(f'llm_queue_wait_seconds_sum{{component="{component}"}} {s.queue_wait_sum:.6f}')
+            lines.append(f'llm_queue_wait_seconds_count{{component="{component}"}} {cumulative}')
+
+        lines += [
+            "# HELP llm_tokens_total Tokens consumidos por componente.",
+            "# TYPE llm_tokens_total counter",
+        ]
+        for component, s in items:
+            lines.append(f'llm_tokens_total{{component="{component}",kind="prompt"}} {s.prompt_tokens}')
+            lines.append(f'llm_tokens_total{{component="{component}",kind="completion"}} {s.completion_tokens}')
+
+        lines += [
+            "# HELP llm_attempts_total Tentativas enviadas ao provedor (hedging conta em dobro).",
+            "# TYPE llm_attempts_total counter",
+        ]
+        for component, s in items:
+            lines.append(f'llm_attempts_total{{component="{component}"}} {s.attempts}')
+
+        lines += [
+            "# HELP llm_cost_usd_total Custo estimado (MODEL_PRICES_USD_PER_MTOK).",
+            "# TYPE llm_cost_usd_total counter",
+        ]
+        for component, s in items:
+            lines.append(f'llm_cost_usd_total{{component="{component}"}} {s.cost_usd:.8f}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,344 @@
+"""
+Transportes do LLM para rodar o pipeline inteiro (`handle_message`) sem chamar o Groq.
+
+LLM_TRANSPORT escolhe o cliente devolvido por `llm_service._get_groq_client()`:
+- groq       (padrao) LLMClient de verdade;
+- record     LLMClient de verdade + grava hash do pedido -> resposta/uso/latencia em
+             LLM_TRANSPORT_PATH (JSONL; o prompt em si nao e gravado);
+- replay     responde com o que foi gravado, sem rede. Latencia (LLM_REPLAY_LATENCY):
+             recorded (a da gravacao), synthetic (distribuicao sintetica) ou none.
+             Pedido que nao esta na gravacao: LLM_REPLAY_ON_MISS = synthetic | error;
+- synthetic  gera JSON valido de router/planner (e respostas simples para os demais
+             componentes) por regras, com latencia log-normal (LLM_SYNTHETIC_LATENCY_*).
+
+Todos expoem `chat.completions.create(component=..., trace=..., **kwargs)` como o LLMClient,
+e respeitam o prazo do componente: latencia simulada acima dele vira `LLMTimeout`.
+Com a mesma gravacao/semente, a carga e reproduzivel.
+"""
+import abc
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import settings
+from app.llm_client import LLMTimeout, deadline_for
+from app.text_utils import norm
+
+MODES = ("groq", "record", "replay", "synthetic")
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    """Hash do pedido (modelo, mensagens e parametros de amostragem)."""
+    relevant = {k: kwargs.get(k) for k in ("model", "messages", "temperature", "max_tokens")}
+    raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def make_response(content: str, model: str, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None) -> Any:
+    """Objeto com o mesmo formato que o SDK devolve (choices[0].message.content, usage)."""
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=0, finish_reason="stop", message=SimpleNamespace(role="assistant", content=content))],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=(prompt_tokens or 0) + (completion_tokens or 0),
+        ),
+    )
+
+
+def _prompt_text(kwargs: Dict[str, Any]) -> str:
+    return "\n".join(str(m.get("content") or "") for m in kwargs.get("messages") or [] if isinstance(m, dict))
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text or "") // 4)
+
+
+class _Completions:
+    def __init__(self, transport: "_OfflineTransport"):
+        self._transport = transport
+
+    def create(
+        self,
+        *,
+        component: str = "default",
+        deadline_s: Optional[float] = None,
+        trace: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        return self._transport.complete(component, deadline_s=deadline_s, trace=trace, **kwargs)
+
+
+class _OfflineTransport(abc.ABC):
+    """Base de replay/synthetic: resposta + latencia simulada dentro do prazo."""
+
+    def __init__(self, seed: Optional[int] = None):
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self._rng = random.Random(settings.LLM_TRANSPORT_SEED if seed is None else seed)
+        self._rng_lock = threading.Lock()
+
+    def synthetic_latency(self) -> float:
+        median = settings.LLM_SYNTHETIC_LATENCY_MS / 1000.0
+        if median <= 0:
+            return 0.0
+        with self._rng_lock:
+            return self._rng.lognormvariate(math.log(median), settings.LLM_SYNTHETIC_LATENCY_SIGMA)
+
+    @abc.abstractmethod
+    def _respond(self, component: str, kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+        """(resposta, latencia simulada em s) para a chamada."""
+
+    def complete(
+        self,
+        component: str,
+        deadline_s: Optional[float] = None,
+        trace: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        if trace is not None:
+            trace["attempts"] = 1
+        response, latency = self._respond(component, kwargs)
+        deadline = float(deadline_s if deadline_s is not None else deadline_for(component))
+        if latency > deadline:
+            time.sleep(deadline)
+            raise LLMTimeout(f"{component}: sem resposta em {deadline:.1f}s")
+        if latency > 0:
+            time.sleep(latency)
+        return response
+
+
+class SyntheticTransport(_OfflineTransport):
+    def _respond(self, component: str, kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+        prompt = _prompt_text(kwargs)
+        content = synthetic_content(component, prompt)
+        response = make_response(content, str(kwargs.get("model") or ""), _estimate_tokens(prompt), _estimate_tokens(content))
+        return response, self.synthetic_latency()
+
+
+class ReplayTransport(_OfflineTransport):
+    def __init__(self, path: Optional[str] = None, seed: Optional[int] = None):
+        super().__init__(seed)
+        self.path = path or settings.LLM_TRANSPORT_PATH
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                self._entries[row["key"]].append(row)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._entries.values())
+
+    def _respond(self, component: str, kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+        key = request_key(kwargs)
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows:
+                # mesma pergunta gravada mais de uma vez: serve em rodizio
+                row = rows[self._cursor[key] % len(rows)]
+                self._cursor[key] += 1
+                self.hits += 1
+            else:
+                row = None
+                self.misses += 1
+
+        if row is None:
+            if settings.LLM_REPLAY_ON_MISS != "synthetic":
+                raise LookupError(f"{component}: pedido {key[:12]} fora da gravacao {self.path}")
+            prompt = _prompt_text(kwargs)
+            content = synthetic_content(component, prompt)
+            response = make_response(content, str(kwargs.get("model") or ""), _estimate_tokens(prompt), _estimate_tokens(content))
+            return response, self.synthetic_latency()
+
+        usage = row.get("usage") or {}
+        response = make_response(row.get("content") or "", row.get("model") or "", usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        mode = settings.LLM_REPLAY_LATENCY
+        if mode == "recorded":
+            latency = float(row.get("latency_s") or 0.0)
+        elif mode == "synthetic":
+            latency = self.synthetic_latency()
+        else:
+            latency = 0.0
+        return response, latency
+
+
+class RecordingTransport:
+    """Envolve o cliente de verdade e grava cada resposta (sem o prompt) para replay."""
+
+    def __init__(self, inner: Any, path: Optional[str] = None):
+        self.inner = inner
+        self.path = path or settings.LLM_TRANSPORT_PATH
+        self.chat = SimpleNamespace(completions=self)
+        self._lock = threading.Lock()
+
+    def create(self, *, component: str = "default", **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        response = self.inner.chat.completions.create(component=component, **kwargs)
+        latency = time.perf_counter() - started
+        usage = getattr(response, "usage", None)
+        row = {
+            "key": request_key(kwargs),
+            "component": component,
+            "model": getattr(response, "model", None) or kwargs.get("model"),
+            "content": response.choices[0].message.content if response.choices else "",
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+            },
+            "latency_s": round(latency, 4),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[llm_transport] nao consegui gravar em {self.path}: {e}")
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        # stats/close etc. do cliente de verdade
+        return getattr(self.inner, name)
+
+
+def build_client(mode: str, live_factory: Callable[[], Any]) -> Any:
+    """Cliente para o modo LLM_TRANSPORT; `live_factory` cria o LLMClient de verdade."""
+    if mode == "synthetic":
+        return SyntheticTransport()
+    if mode == "replay":
+        return ReplayTransport()
+    if mode == "record":
+        return RecordingTransport(live_factory())
+    if mode != "groq":
+        raise ValueError(f"LLM_TRANSPORT invalido: {mode!r} (use {', '.join(MODES)})")
+    return live_factory()
+
+
+# ---------- respostas sinteticas ----------
+
+_TECHNICAL_CUES = ("qual melhor", "qual o melhor", "qual e melhor", "serve pra", "serve para", "indicado", "recomenda", " pra ", " para ")
+_CHECKOUT_CUES = ("finalizar", "fechar pedido", "fechar o pedido", "pagar", "pagamento", "checkout")
+_REMOVE_CUES = ("remover", "tirar", "tira ", "excluir")
+_ORDINALS = {"primeir": 1, "segund": 2, "terceir": 3, "quart": 4, "quint": 5}
+
+
+def _section(prompt: str, title: str) -> str:
+    m = re.search(re.escape(title) + r"[ \t]*\n(.*?)(?:\n\n|\Z)", prompt, flags=re.DOTALL)
+    return m.group(1).strip() if m else ""
+
+
+def _json_section(prompt: str, title: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(_section(prompt, title) or "{}")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def synthetic_route(message: str) -> Dict[str, Any]:
+    from app.parsing import extract_product_hint
+
+    t = f" {norm(message)} "
+    route: Dict[str, Any] = {
+        "intent": "SMALLTALK",
+        "product_query": None,
+        "category_hint": None,
+        "constraints": {},
+        "action": "NOOP",
+        "clarifying_question": None,
+        "confidence": 0.9,
+    }
+    if any(c in t for c in _CHECKOUT_CUES):
+        route.update(intent="CHECKOUT", action="HANDOFF_CHECKOUT")
+        return route
+    if any(c in t for c in _REMOVE_CUES):
+        route.update(intent="REMOVE_ITEM", action="NOOP")
+        return route
+
+    hint = extract_product_hint(message)
+    if not hint:
+        return route
+    words = norm(hint).split()
+    category = words[-1] if words else hint
+    route.update(product_query=hint, category_hint=category)
+    if any(c in t for c in _TECHNICAL_CUES):
+        route.update(intent="TECHNICAL_QUESTION", action="ASK_USAGE_CONTEXT")
+    else:
+        route.update(intent="FIND_PRODUCT", action="SEARCH_PRODUCTS")
+    return route
+
+
+def synthetic_plan(product_hint: str, known_context: Dict[str, Any]) -> Dict[str, Any]:
+    missing = [f for f in ("application", "environment") if not known_context.get(f)]
+    if missing:
+        question = {
+            "application": f"Onde voce vai usar {product_hint or 'o produto'}?",
+            "environment": "Vai ser em area interna ou externa?",
+        }[missing[0]]
+        return {
+            "missing_fields": missing,
+            "next_action": "ASK_CONTEXT",
+            "next_question": question,
+            "assumptions": [],
+            "confidence": 0.85,
+        }
+    return {"missing_fields": [], "next_action": "READY_TO_ANSWER", "next_question": None, "assumptions": [], "confidence": 0.85}
+
+
+def _synthetic_choice(prompt: str) -> str:
+    m = re.search(r'MENSAGEM DO USU[AÁ]RIO:\s*\n"(.*?)"', prompt, flags=re.DOTALL)
+    t = norm(m.group(1) if m else "")
+    nums = re.findall(r"\d+", t)
+    if nums:
+        return nums[0]
+    for prefix, n in _ORDINALS.items():
+        if prefix in t:
+            return str(n)
+    return "NENHUM"
+
+
+def _synthetic_synthesis(prompt: str) -> str:
+    m = re.search(r"PRODUTO: (.+)", prompt)
+    product = m.group(1).strip() if m else "o produto"
+    m = re.search(r"Aplica[cç][aã]o: (.+)", prompt)
+    application = m.group(1).strip() if m else "essa aplicacao"
+    return (
+        f"Para {application}, o ideal e {product} com especificacao adequada ao contexto informado. "
+        "Assim voce garante desempenho e durabilidade na obra."
+    )
+
+
+def synthetic_content(component: str, prompt: str) -> str:
+    """Resposta valida (pelos validadores do llm_service) gerada por regras."""
+    if component in ("router", "route_plan", "planner"):
+        message = _section(prompt, "MENSAGEM DO USUARIO:")
+        known = _json_section(prompt, "KNOWN_CONTEXT (json):")
+        if component == "route_plan":
+            route = synthetic_route(message)
+            plan = None
+            if route["action"] in ("ASK_USAGE_CONTEXT", "ANSWER_WITH_RAG"):
+                plan = synthetic_plan(route.get("category_hint") or "", known)
+            return json.dumps({"route": route, "plan": plan}, ensure_ascii=False)
+        if component == "router":
+            return json.dumps(synthetic_route(message), ensure_ascii=False)
+        return json.dumps(synthetic_plan(_section(prompt, "PRODUCT_HINT:"), known), ensure_ascii=False)
+    if component == "choice":
+        return _synthetic_choice(prompt)
+    if component == "synthesis":
+        return _synthetic_synthesis(prompt)
+    # render: JSON faz o llm_service cair no texto deterministico
+    return "{}"
@@ -1,8 +1,10 @@
+import math
 import re
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
-from app.text_utils import norm, is_greeting, is_hours_question, is_cart_show_request, is_cart_reset_request
+from app.text_utils import norm, strip_accents, is_greeting, is_hours_question, is_cart_show_request, is_cart_reset_request
 from app.preferences import CEP_REGEX
+from app import spell
 
 CHECKOUT_WORDS = ("finalizar", "fechar", "concluir", "confirmar", "encaminhar")
 
@@ -38,10 +40,51 @@ STOPWORDS = {
 }
 
 
+# Medida pedida -> unidade canonica da tabela de conversao (catalog_cache.conversions)
+MEASURE_RE = re.compile(
+    r"(?<![\w.,])(\d+(?:[.,]\d+)?)\s*"
+    r"(kg|quilos?|gramas?|g|ml|litros?|l|m2|metros? quadrados?|metros?|m|pecas|pcs|pc)\b"
+)
+MEASURE_UNITS = {
+    "kg": "kg", "quilo": "kg", "quilos": "kg", "g": "g", "grama": "g", "gramas": "g",
+    "l": "l", "litro": "l", "litros": "l", "ml": "ml",
+    "m2": "m2", "metro quadrado": "m2", "metros quadrados": "m2",
+    "m": "m", "metro": "m", "metros": "m",
+    "pecas": "pc", "pcs": "pc", "pc": "pc",
+}
+MEASURE_LABELS = {"kg": "kg", "l": "L", "m": "m", "m2": "m²", "pc": " peça(s)"}
+
+# Como chamar a unidade vendida na conversao (pela unidade do produto)
+PACKAGE_LABELS = {
+    "SC": "saco(s)", "CX": "caixa(s)", "BR": "barra(s)", "RL": "rolo(s)", "LT": "lata(s)",
+    "GL": "galão(ões)", "BD": "balde(s)", "PC": "peça(s)", "PCT": "pacote(s)",
+}
+DEFAULT_PACKAGE_LABELS = {"kg": "saco(s)", "l": "lata(s)", "m2": "lata(s)", "pc": "caixa(s)"}
+# Produto vendido pela propria medida (unidade do cadastro -> medida): converte 1:1, sem tabela
+SOLD_BY_MEASURE = {"KG": "kg", "M": "m", "MT": "m", "L": "l", "M2": "m2"}
+
+
+def extract_measure_quantity(message: str) -> Optional[Tuple[float, str]]:
+    """
+    Quantidade com medida na mensagem: "200kg" -> (200.0, "kg"), "2,5 litros" -> (2.5, "l"),
+    "60m²" -> (60.0, "m2"), "500g" -> (0.5, "kg"). Unidades: kg, l, m, m2, pc.
+    """
+    t = re.sub(r"\s+", " ", strip_accents((message or "").lower()))
+    m = MEASURE_RE.search(t)
+    if not m:
+        return None
+    qty = float(m.group(1).replace(",", "."))
+    unit = MEASURE_UNITS[m.group(2)]
+    if unit == "g":
+        return qty / 1000.0, "kg"
+    if unit == "ml":
+        return qty / 1000.0, "l"
+    return qty, unit
+
+
 def extract_kg_quantity(message: str) -> Optional[float]:
-    t = norm(message)
-    m = re.search(r"(\d+[,.]?\d*)\s*kg\b", t)
-    return float(m.group(1).replace(",", ".")) if m else None
+    measure = extract_measure_quantity(message)
+    return measure[0] if measure and measure[1] == "kg" else None
 
 
 def extract_units_quantity(message: str) -> Optional[float]:
@@ -57,21 +100,50 @@ def extract_plain_number(message: str) -> Optional[float]:
     return None
 
 
-def packaging_kg_in_name(prod_name: str) -> Optional[int]:
-    n = norm(prod_name)
-    m = re.search(r"\b(20|25|50)\s*kg\b", n) or re.search(r"\b(20|25|50)kg\b", n)
-    return int(m.group(1)) if m else None
+def format_qty(value: float) -> str:
+    return f"{value:g}".replace(".", ",")
+
+
+def measure_as_units(qty: float, unit: str, product_unit: Optional[str]) -> Optional[Tuple[float, str]]:
+    """Medida pedida na unidade em que o produto e vendido (30 m de cabo por metro): 1:1, fracao vale."""
+    if qty <= 0 or SOLD_BY_MEASURE.get((product_unit or "").strip().upper()) != unit:
+        return None
+    label = MEASURE_LABELS.get(unit, unit)
+    return qty, f"{format_qty(qty)}{label} (vendido por {label.strip()})"
+
+
+def units_from_conversion(
+    conversions: Dict[str, float],
+    qty: float,
+    unit: str,
+    product_unit: Optional[str] = None,
+) -> Optional[Tuple[float, str]]:
+    """
+    Converte a medida pedida em unidades do produto usando a tabela de conversao.
+    Embalagem nao se fraciona: arredonda para cima. Retorna (unidades, texto) ou None.
+    """
+    per_unit = (conversions or {}).get(unit)
+    if not per_unit or qty <= 0:
+        return None
+    units = float(max(1, math.ceil(qty / per_unit - 1e-9)))
+    label = MEASURE_LABELS.get(unit, unit)
+    package = PACKAGE_LABELS.get((product_unit or "").strip().upper()) or DEFAULT_PACKAGE_LABELS.get(unit, "unidade(s)")
+    if unit == "m2":
+        return units, f"{format_qty(qty)}{label} ≈ {units:.0f} {package} (rende ~{format_qty(per_unit)}{label} cada)"
+    return units, f"{format_qty(qty)}{label} ≈ {units:.0f} {package} de {format_qty(per_unit)}{label}"
+
+
+def packaging_kg_in_name(prod_name: str) -> Optional[float]:
+    from app.product_attributes import parse_kg
+
+    return parse_kg(prod_name)
 
 
 def suggest_units_from_packaging(prod_name: str, kg_qty: float) -> Optional[Tuple[float, str]]:
     pkg = packaging_kg_in_name(prod_name)
     if not pkg:
         return None
-    units = kg_qty / float(pkg)
-    units_rounded = round(units)
-    if abs(units - units_rounded) < 1e-6:
-        units = float(units_rounded)
-    return units, f"{kg_qty:.0f}kg ≈ {units:.0f} saco(s) de {pkg}kg"
+    return units_from_conversion({"kg": pkg}, kg_qty, "kg")
 
 
 def extract_product_hint(message: str) -> Optional[str]:
@@ -109,6 +181,9 @@ def extract_product_hint(message: str) -> Optional[str]:
     if txt in NON_HINT_WORDS or all(tok in NON_HINT_WORDS for tok in txt.split()):
         return None
 
+    # corrige erros de digitação antes de extrair o hint ("cimeto" -> "cimento")
+    txt = spell.correct_text(txt)
+
     # pega o que vem depois de “quero/preciso…”, senão usa a frase inteira
     m = re.search(rf"\b({'|'.join(INTENT_WORDS)})\b\s+(.*)$", txt)
     rest = m.group(2).strip() if m else txt
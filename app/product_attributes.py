@@ -0,0 +1,446 @@
+"""
+Atributos estruturados extraidos do nome/descricao dos produtos.
+
+Pipeline offline: `sync_product_attributes` le o catalogo, extrai atributos tipados
+(classe do cimento, kg por embalagem, diametro em mm, volume em L, material,
+acabamento) + os atributos do CATEGORY_SCHEMA da categoria do produto e grava em
+`produto_atributos` (colunas indexadas + JSON). So reprocessa produtos cujo
+nome/descricao mudou (hash), entao pode rodar a cada warmup.
+
+A mesma tabela guarda a conversao de embalagem por unidade vendida (kg, L, m,
+m2 e pecas por caixa), que o catalog_cache carrega para converter "200kg",
+"60m2" ou "30m" em unidades sem reparsear o nome a cada mensagem.
+
+`find_candidates` serve esses dados ao conversation engine: a politica
+(`conversation.policy`) precisa dos atributos reais dos candidatos para escolher
+a pergunta que de fato divide o conjunto.
+
+Uso:
+    python -m app.product_attributes          # sincroniza (incremental)
+    python -m app.product_attributes --full   # reextrai tudo
+"""
+import argparse
+import hashlib
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_
+
+from database import SessionLocal, Produto, ProdutoAtributo
+from app import catalog_schema
+from app.text_utils import norm, strip_accents
+
+# Mudou a extracao? Incrementar para forcar reprocessamento no proximo sync
+EXTRACTOR_VERSION = 2
+CANDIDATE_LIMIT = 30
+
+# Rendimento medio de tinta por demao quando a descricao nao informa ("rende 380m2")
+TINTA_M2_POR_LITRO = 10.0
+
+# Bitolas comerciais de tubos (polegada -> mm)
+INCH_TO_MM = {"1/2": 20.0, "3/4": 25.0, "1": 32.0, "1 1/4": 40.0, "1 1/2": 50.0, "2": 60.0}
+
+MATERIALS = {
+    "cpvc": "cpvc", "ppr": "ppr", "pvc": "pvc", "cobre": "cobre", "galvanizado": "galvanizado",
+    "aco": "aco", "inox": "inox", "ceramico": "ceramico", "ceramica": "ceramico",
+    "concreto": "concreto", "polietileno": "polietileno", "madeira": "madeira",
+    "aluminio": "aluminio", "metal": "metal", "metalico": "metal",
+}
+
+FINISHES = {
+    "fosco": "fosco", "fosca": "fosco", "acetinado": "acetinado", "acetinada": "acetinado",
+    "semibrilho": "semibrilho", "brilhante": "brilhante", "brilho": "brilhante",
+}
+
+# Sinonimos das opcoes do CATEGORY_SCHEMA como aparecem em nomes/descricoes
+OPTION_SYNONYMS: Dict[str, Dict[str, List[str]]] = {
+    "item": {"tubo": ["cano"], "te": ["tee"]},
+    "base": {
+        "agua": ["acrilica", "acrilico", "pva", "latex"],
+        "solvente": ["esmalte", "sintetico", "oleo"],
+    },
+    "ambiente": {
+        "interna": ["internas", "interno", "internos"],
+        "externa": ["externas", "externo", "externos", "fachada", "fachadas"],
+    },
+    "acabamento": {"fosco": ["fosca"], "acetinado": ["acetinada"], "brilhante": ["brilho"]},
+    "tipo_conexao": {"ponta_ponta": ["ponta ponta"]},
+}
+
+# Atributos numericos do schema -> coluna tipada (pela unidade declarada no schema)
+_UNIT_COLUMNS = {"mm": "diametro_mm", "l": "volume_l"}
+
+_NUM = r"(?<![\w.,])(\d+(?:[.,]\d+)?)"
+_CP_RE = re.compile(r"\bcp (v|iv|iii|ii|i)\b(?: (e|z|f)\b)?(?: (ari)\b)?(?: (25|32|40)\b)?(?: (rs)\b)?")
+_KG_RE = re.compile(_NUM + r"\s*(kg|g)\b")
+_MM_RE = re.compile(_NUM + r"\s*mm\b")
+_VOL_RE = re.compile(_NUM + r"\s*(ml|l|litros?)\b")
+_INCH_RE = re.compile(r"\b(1 1/4|1 1/2|1/2|3/4|1|2)\s*(?:\"|pol\b|polegadas?\b)")
+_BARE_INCH_RE = re.compile(r"(?<![\d/])(1/2|3/4)(?![\d/])")
+_MEASURE_RE = re.compile(_NUM + r"\s*(mm|cm|m|ml|l|litros?|pol|\")?")
+_LEN_RE = re.compile(_NUM + r"\s*m\b")
+_AREA_RE = re.compile(_NUM + r"\s*m2\b")
+_DIM_AREA_RE = re.compile(_NUM + r"\s*x\s*(\d+(?:[.,]\d+)?)\s*m\b")
+_PIECES_RE = re.compile(
+    r"\b(?:cx|caixa|pacote|pct)\s*(?:com|c/)?\s*(\d+)(?![\d.,])(?!\s*(?:m2|m|kg|g|l|ml)\b)|"
+    + _NUM + r"\s*(?:pcs?|pecas|unid|unidades)\b"
+)
+_YIELD_RE = re.compile(r"\b(?:rende|rendimento)\b\D{0,20}?" + _NUM + r"\s*m2\b")
+
+
+def _to_float(s: str) -> float:
+    return float(s.replace(",", "."))
+
+
+def _lower(text: str) -> str:
+    """Minusculo sem acento, mas preservando virgula/barra/aspas (medidas)."""
+    return strip_accents((text or "").lower())
+
+
+def _has_phrase(text: str, phrase: str) -> bool:
+    return bool(re.search(rf"\b{re.escape(phrase)}\b", text))
+
+
+def product_category(nome: str) -> Optional[str]:
+    """
+    Categoria do CATEGORY_SCHEMA pelo tipo do produto (primeira palavra do nome):
+    "Rolo de La para Pintura" nao e tinta so por citar pintura.
+    """
+    tokens = norm(nome).split()
+    return catalog_schema.find_category(tokens[0]) if tokens else None
+
+
+def parse_cp_class(text: str) -> Optional[str]:
+    m = _CP_RE.search(norm(text))
+    if not m:
+        return None
+    roman, letter, ari, cls, rs = m.groups()
+    out = f"CP {roman.upper()}"
+    if letter:
+        out += f"-{letter.upper()}"
+    if ari:
+        out += "-ARI"
+    if cls:
+        out += f"-{cls}"
+    if rs:
+        out += " RS"
+    return out
+
+
+def parse_kg(text: str) -> Optional[float]:
+    m = _KG_RE.search(_lower(text))
+    if not m:
+        return None
+    value = _to_float(m.group(1))
+    return value / 1000.0 if m.group(2) == "g" else value
+
+
+def parse_diameter_mm(text: str, inches: bool = False) -> Optional[float]:
+    """Diametro em mm; polegadas so quando `inches` (bitola de tubo, nao largura de trincha)."""
+    t = _lower(text)
+    m = _MM_RE.search(t)
+    if m:
+        return _to_float(m.group(1))
+    if inches:
+        m = _INCH_RE.search(t) or _BARE_INCH_RE.search(t)
+        if m:
+            return INCH_TO_MM.get(m.group(1))
+    return None
+
+
+def parse_volume_l(text: str) -> Optional[float]:
+    m = _VOL_RE.search(_lower(text))
+    if not m:
+        return None
+    value = _to_float(m.group(1))
+    return value / 1000.0 if m.group(2) == "ml" else value
+
+
+def parse_length_m(text: str) -> Optional[float]:
+    """Comprimento por unidade ("barra 12m", "rolo 100m"); "2x3m" e area, nao comprimento."""
+    m = _LEN_RE.search(_lower(text))
+    return _to_float(m.group(1)) if m else None
+
+
+def parse_area_m2(text: str) -> Optional[float]:
+    t = _lower(text)
+    m = _AREA_RE.search(t)
+    if m:
+        return _to_float(m.group(1))
+    m = _DIM_AREA_RE.search(t)
+    if m:
+        return round(_to_float(m.group(1)) * _to_float(m.group(2)), 3)
+    return None
+
+
+def parse_pieces(text: str) -> Optional[int]:
+    m = _PIECES_RE.search(_lower(text))
+    if not m:
+        return None
+    return int(_to_float(m.group(1) or m.group(2)))
+
+
+def packaging_conversions(nome: str, descricao: Optional[str] = None) -> Dict[str, Optional[float]]:
+    """
+    Quanto vem em cada unidade vendida: kg/L/m/m2 por unidade e pecas por caixa.
+    m2 de tinta = rendimento da lata (da descricao, ou estimado por litro).
+    """
+    category = product_category(nome)
+    volume = parse_volume_l(nome)
+    area = parse_area_m2(nome)
+    if category == "tintas":
+        m = _YIELD_RE.search(_lower(descricao or ""))
+        if m:
+            area = _to_float(m.group(1))
+        elif volume:
+            area = round(volume * TINTA_M2_POR_LITRO, 1)
+    return {
+        "kg_embalagem": parse_kg(nome),
+        "volume_l": volume,
+        "m_por_unidade": parse_length_m(nome),
+        "m2_por_unidade": area,
+        "pecas_por_caixa": parse_pieces(nome),
+    }
+
+
+def conversion_row(row: Any) -> Dict[str, float]:
+    """Conversoes de uma linha de produto_atributos, por unidade pedida (kg, l, m, m2, pc)."""
+    out: Dict[str, float] = {}
+    for unit, col in (("kg", "kg_embalagem"), ("l", "volume_l"), ("m", "m_por_unidade"),
+                      ("m2", "m2_por_unidade"), ("pc", "pecas_por_caixa")):
+        value = getattr(row, col, None) if not isinstance(row, dict) else row.get(col)
+        if value:
+            out[unit] = float(value)
+    return out
+
+
+def _first_vocab(texts: Sequence[str], vocab: Dict[str, str]) -> Optional[str]:
+    # nome primeiro; descricao so se o nome nao disser nada
+    for t in texts:
+        for tok in t.split():
+            if tok in vocab:
+                return vocab[tok]
+    return None
+
+
+def _enum_value(attr: Dict[str, Any], texts: Sequence[str]) -> Optional[str]:
+    key = attr.get("key")
+    synonyms = OPTION_SYNONYMS.get(key, {})
+    for t in texts:
+        found = set()
+        for opt in attr.get("options") or []:
+            aliases = [opt.replace("_", " ")] + synonyms.get(opt, [])
+            if any(_has_phrase(t, a) for a in aliases):
+                found.add(opt)
+        if len(found) == 1:
+            return found.pop()
+        if found:
+            # "paredes internas e externas": serve para ambos, nao restringe
+            return None
+    return None
+
+
+def extract_attributes(nome: str, descricao: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Atributos de um produto. Retorna as colunas tipadas + `categoria_schema`
+    + `atributos` (chaves do CATEGORY_SCHEMA, usadas pela politica de conversa).
+    """
+    category = product_category(nome)
+    name_n, desc_n = norm(nome), norm(descricao or "")
+
+    typed: Dict[str, Any] = {
+        "cp_classe": parse_cp_class(nome),
+        **packaging_conversions(nome, descricao),
+        "diametro_mm": parse_diameter_mm(nome, inches=category == "tubos_conexoes"),
+        # material so pelo nome: a descricao cita o material da aplicacao ("prego para madeira")
+        "material": _first_vocab([name_n], MATERIALS),
+        "acabamento": _first_vocab([name_n, desc_n], FINISHES),
+    }
+
+    attrs: Dict[str, Any] = {}
+    if category:
+        for attr in catalog_schema.get_category_schema(category).get("attributes", []):
+            key = attr.get("key")
+            value: Any = None
+            if attr.get("type") == "enum":
+                value = _enum_value(attr, [name_n, desc_n])
+            elif attr.get("type") == "number":
+                for unit in attr.get("units") or []:
+                    col = _UNIT_COLUMNS.get(unit)
+                    if col and typed.get(col) is not None:
+                        value = typed[col]
+                        break
+            if value is not None:
+                attrs[key] = value
+
+    return {"categoria_schema": category, **typed, "atributos": attrs}
+
+
+def _source_hash(nome: str, descricao: Optional[str]) -> str:
+    raw = f"{EXTRACTOR_VERSION}\x00{nome or ''}\x00{descricao or ''}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def sync_product_attributes(db=None, full: bool = False) -> Dict[str, int]:
+    """
+    Extrai e grava os atributos de todos os produtos (incremental por hash).
+    Remove linhas de produtos que sairam do catalogo.
+    """
+    owns = db is None
+    db = db or SessionLocal()
+    try:
+        produtos = db.query(Produto.id, Produto.nome, Produto.descricao).all()
+        existing = {row.id_produto: row for row in db.query(ProdutoAtributo).all()}
+
+        updated = 0
+        for pid, nome, descricao in produtos:
+            h = _source_hash(nome, descricao)
+            row = existing.pop(pid, None)
+            if row is not None and row.fonte_hash == h and not full:
+                continue
+            data = extract_attributes(nome, descricao)
+            if row is None:
+                row = ProdutoAtributo(id_produto=pid)
+                db.add(row)
+            for col, value in data.items():
+                setattr(row, col, value)
+            row.fonte_hash = h
+            row.updated_at = datetime.now()
+            updated += 1
+
+        for row in existing.values():
+            db.delete(row)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns:
+            db.close()
+
+    stats = {"scanned": len(produtos), "updated": updated, "removed": len(existing)}
+    print(f"[attributes] {stats['scanned']} produtos, {stats['updated']} atualizados, {stats['removed']} removidos")
+    return stats
+
+
+def _measure(value: Any, unit: str) -> Optional[float]:
+    """Valor informado pelo cliente ("25mm", '3/4"', "900ml", 18) na unidade da coluna."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    t = _lower(str(value)).strip()
+    if unit == "mm":
+        inch = re.fullmatch(r"(1 1/4|1 1/2|1/2|3/4|1|2)\s*(?:\"|pol|polegadas?)?", t)
+        if inch and (inch.group(1) in ("1/2", "3/4", "1 1/4", "1 1/2") or '"' in t or "pol" in t):
+            return INCH_TO_MM[inch.group(1)]
+    m = _MEASURE_RE.search(t)
+    if not m:
+        return None
+    num, u = _to_float(m.group(1)), (m.group(2) or "")
+    if unit == "mm":
+        if u == "cm":
+            return num * 10.0
+        if u == "m":
+            return num * 1000.0
+        return num
+    if unit == "l":
+        return num / 1000.0 if u == "ml" else num
+    return num
+
+
+def _value_matches(attr: Optional[Dict[str, Any]], wanted: Any, got: Any) -> bool:
+    if got is None or wanted in (None, ""):
+        # produto sem o atributo extraido nao e descartado
+        return True
+    if attr and attr.get("type") == "number":
+        for unit in attr.get("units") or []:
+            if unit in _UNIT_COLUMNS:
+                w = _measure(wanted, unit)
+                return w is None or abs(w - float(got)) < 1e-3
+        return True
+    return norm(str(wanted)) == norm(str(got))
+
+
+def _sql_filters(category: str, attributes: Dict[str, Any]) -> List[Any]:
+    """Filtros nas colunas indexadas (atributo ausente no produto nao filtra)."""
+    filters: List[Any] = []
+    for key, wanted in (attributes or {}).items():
+        attr = catalog_schema.attribute_meta(category, key)
+        if not attr or wanted in (None, ""):
+            continue
+        if attr.get("type") == "number":
+            for unit in attr.get("units") or []:
+                col_name = _UNIT_COLUMNS.get(unit)
+                value = _measure(wanted, unit) if col_name else None
+                if value is not None:
+                    col = getattr(ProdutoAtributo, col_name)
+                    filters.append(or_(col.is_(None), col.between(value - 1e-3, value + 1e-3)))
+                    break
+        elif key in ("material", "acabamento"):
+            col = getattr(ProdutoAtributo, key)
+            filters.append(or_(col.is_(None), col == norm(str(wanted))))
+    return filters
+
+
+def find_candidates(
+    category: str,
+    attributes: Dict[str, Any],
+    limit: Optional[int] = CANDIDATE_LIMIT,
+    db=None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Produtos ativos da categoria compativeis com os atributos ja informados.
+    Retorna (ate `limit` candidatos com `attributes` (None = todos), total compativel).
+    Sem tabela/banco retorna ([], 0), como antes do pipeline existir.
+    """
+    if not category:
+        return [], 0
+    owns = db is None
+    try:
+        db = db or SessionLocal()
+        q = (
+            db.query(Produto, ProdutoAtributo)
+            .join(ProdutoAtributo, ProdutoAtributo.id_produto == Produto.id)
+            .filter(ProdutoAtributo.categoria_schema == category)
+            .filter(Produto.ativo.isnot(False))
+        )
+        for f in _sql_filters(category, attributes):
+            q = q.filter(f)
+        rows = q.order_by(Produto.id).all()
+    except Exception as e:
+        print(f"[attributes] candidatos indisponiveis ({category}): {str(e)[:120]}")
+        return [], 0
+    finally:
+        if owns and db is not None:
+            db.close()
+
+    meta = {a.get("key"): a for a in catalog_schema.get_category_schema(category).get("attributes", [])}
+    matched: List[Dict[str, Any]] = []
+    for produto, attr_row in rows:
+        cand_attrs = dict(attr_row.atributos or {})
+        if all(_value_matches(meta.get(k), v, cand_attrs.get(k)) for k, v in (attributes or {}).items()):
+            matched.append({
+                "id": int(produto.id),
+                "nome": produto.nome,
+                "preco": float(produto.preco or 0),
+                "unidade": produto.unidade or "UN",
+                "estoque": float(produto.estoque_atual or 0),
+                "attributes": cand_attrs,
+            })
+    return (matched if limit is None else matched[:limit]), len(matched)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extrai atributos estruturados dos produtos para produto_atributos.")
+    parser.add_argument("--full", action="store_true", help="reextrai todos os produtos (ignora o hash)")
+    args = parser.parse_args(argv)
+
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine, tables=[ProdutoAtributo.__table__])
+    sync_product_attributes(full=args.full)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,13 @@
 import re
 from typing import Any, Dict, List, Optional
 
+from sqlalchemy import and_, case, literal, or_, true
 from sqlalchemy.orm import Session
 
 from database import SessionLocal, Produto, CategoriaProduto
-from app.rag_products import search_products_semantic
+from app.rag_products import search_products_batch, search_products_semantic
 from app.text_utils import norm
+from app import catalog_cache, spell
 
 
 _GREETINGS = {
@@ -24,8 +26,11 @@ def _looks_like_greeting(text: str) -> bool:
     return False
 
 
-def _sql_fallback_find_products(query: str, k: int = 6) -> List[Produto]:
-    db: Session = SessionLocal()
+def _sql_fallback_find_products(query: str, k: int = 6, db: Optional[Session] = None) -> List[Produto]:
+    """ILIKE no nome. `db` permite reaproveitar a sessão de quem chama (buscas em lote)."""
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
     try:
         q = (query or "").strip()
         if len(q) < 2:
@@ -41,7 +46,8 @@ def _sql_fallback_find_products(query: str, k: int = 6) -> List[Produto]:
             .all()
         )
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
 def db_get_product_by_id(product_id: int) -> Optional[Produto]:
@@ -66,6 +72,8 @@ def _normalize_candidate(obj: Any, default_score: float = 0.40) -> Optional[Dict
         pid = obj.get("id", None)
         if pid is None:
             pid = obj.get("product_id", None)
+        if pid is None:
+            pid = obj.get("id_produto", None)  # formato do RAG (search_products)
         if pid is None:
             return None
 
@@ -142,10 +150,28 @@ def _normalize_candidate(obj: Any, default_score: float = 0.40) -> Optional[Dict
     }
 
 
-def db_find_best_products(query: str, k: int = 6) -> List[Dict[str, Any]]:
+def category_filter_for(hint: Optional[str]) -> Optional[str]:
+    """
+    Termo do hint (o primeiro) que nomeia uma categoria do catalogo, para filtrar a busca
+    vetorial por categoria; None se nao bater com nenhuma (filtro vazio zeraria a busca).
+    """
+    tokens = [t for t in norm(hint or "").split() if len(t) >= 3]
+    if not tokens:
+        return None
+    try:
+        return tokens[0] if catalog_cache.category_ids(tokens[0]) else None
+    except Exception:
+        return None
+
+
+def db_find_best_products(query: str, k: int = 6, category_hint: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Retorna SEMPRE uma lista de dict no formato:
       {"id","nome","preco","unidade","estoque","score"}
+
+    A busca semantica ja filtra no indice (so com estoque e, se `category_hint` nomear
+    uma categoria, so dela), entao o top-k vem utilizavel e o SQL fica para quando o
+    indice nao tem nada.
     """
     if _looks_like_greeting(query):
         return []
@@ -156,7 +182,10 @@ def db_find_best_products(query: str, k: int = 6) -> List[Dict[str, Any]]:
 
     # 1) tenta semantic search (RAG)
     try:
-        sem = search_products_semantic(q, k=k, min_relevance=0.28)
+        category = category_filter_for(category_hint)
+        sem = search_products_semantic(q, k=k, min_relevance=0.28, in_stock=True, category=category)
+        if not sem and category:
+            sem = search_products_semantic(q, k=k, min_relevance=0.28, in_stock=True)
         if sem:
             out: List[Dict[str, Any]] = []
             for item in sem:
@@ -169,28 +198,113 @@ def db_find_best_products(query: str, k: int = 6) -> List[Dict[str, Any]]:
         pass
 
     # 2) fallback SQL ILIKE
-    produtos = _sql_fallback_find_products(q, k=k)
-    out2: List[Dict[str, Any]] = []
-    seen_ids = set()
-    for p in produtos:
-        normed = _normalize_candidate(p, default_score=0.40)
-        if normed and normed["id"] not in seen_ids:
-            seen_ids.add(normed["id"])
-            out2.append(normed)
-
-    if not out2:
-        tokens = [t for t in re.split(r"\s+", q) if len(t) >= 2]
-        for tok in tokens:
-            extras = _sql_fallback_find_products(tok, k=k)
-            for p in extras:
-                normed = _normalize_candidate(p, default_score=0.40)
-                if normed and normed["id"] not in seen_ids:
-                    seen_ids.add(normed["id"])
-                    out2.append(normed)
-            if len(out2) >= k:
-                break
+    return _sql_find_best_products(q, k=k)
+
+
+def _spell_corrected_tokens(q: str) -> List[str]:
+    """Tokens da query; os que tinham erro de digitação vêm corrigidos (sem acento)."""
+    out: List[str] = []
+    for tok in re.split(r"\s+", q):
+        n = norm(tok)
+        fixed = spell.correct_text(n) if n else n
+        out.append(fixed if fixed != n else tok)
+    return [t for t in out if t]
+
+
+def _sql_find_best_products(q: str, k: int = 6, db: Optional[Session] = None) -> List[Dict[str, Any]]:
+    """ILIKE da frase inteira e, se nada vier, token a token (todas as queries na mesma sessão)."""
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        produtos = _sql_fallback_find_products(q, k=k, db=db)
+        out2: List[Dict[str, Any]] = []
+        seen_ids = set()
+        for p in produtos:
+            normed = _normalize_candidate(p, default_score=0.40)
+            if normed and normed["id"] not in seen_ids:
+                seen_ids.add(normed["id"])
+                out2.append(normed)
+
+        if not out2:
+            # tokens com erro de digitação trocados pela correção ("cimeto" -> "cimento")
+            tokens = [t for t in _spell_corrected_tokens(q) if len(t) >= 2]
+            corrected = " ".join(tokens)
+            if corrected != q:
+                for p in _sql_fallback_find_products(corrected, k=k, db=db):
+                    normed = _normalize_candidate(p, default_score=0.40)
+                    if normed and normed["id"] not in seen_ids:
+                        seen_ids.add(normed["id"])
+                        out2.append(normed)
+
+        if not out2:
+            for tok in tokens:
+                extras = _sql_fallback_find_products(tok, k=k, db=db)
+                for p in extras:
+                    normed = _normalize_candidate(p, default_score=0.40)
+                    if normed and normed["id"] not in seen_ids:
+                        seen_ids.add(normed["id"])
+                        out2.append(normed)
+                if len(out2) >= k:
+                    break
+
+        return out2[:k]
+    finally:
+        if own_session:
+            db.close()
 
-    return out2[:k]
+
+def db_find_best_products_batch(
+    queries: List[str],
+    k: int = 6,
+    category_hint: Optional[str] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    `db_find_best_products` para várias queries de uma vez (ex.: produto+contexto e só o
+    produto no fluxo de uso). Semântica em lote (uma passada do modelo, mesmos filtros de
+    estoque/categoria); as que ficarem sem resultado caem no SQL compartilhando uma única
+    sessão. Retorna uma lista por query, na mesma ordem.
+    """
+    results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    valid = [
+        i for i, q in enumerate(queries)
+        if not _looks_like_greeting(q) and len((q or "").strip()) >= 2
+    ]
+    if not valid:
+        return results
+
+    texts = [queries[i].strip() for i in valid]
+    category = category_filter_for(category_hint)
+    try:
+        sem = search_products_batch(texts, k=k, min_score=0.28, in_stock=True, category=category)
+        retry = [j for j, items in enumerate(sem) if not items]
+        if category and retry:
+            again = search_products_batch([texts[j] for j in retry], k=k, min_score=0.28, in_stock=True)
+            for j, items in zip(retry, again):
+                sem[j] = items
+    except Exception:
+        sem = [[] for _ in valid]
+
+    pending: List[int] = []
+    for i, items in zip(valid, sem):
+        out: List[Dict[str, Any]] = []
+        for item in items:
+            normed = _normalize_candidate(item, default_score=float(item.get("score", 0.65)))
+            if normed:
+                out.append(normed)
+        if out:
+            results[i] = out[:k]
+        else:
+            pending.append(i)
+
+    if pending:
+        db: Session = SessionLocal()
+        try:
+            for i in pending:
+                results[i] = _sql_find_best_products(queries[i].strip(), k=k, db=db)
+        finally:
+            db.close()
+    return results
 
 
 def _score_candidate_by_terms(text: str, terms: List[str]) -> int:
@@ -211,10 +325,12 @@ def db_find_best_products_with_constraints(
     must_terms: Optional[List[str]] = None,
     should_terms: Optional[List[str]] = None,
     strict: bool = False,
+    db: Optional[Session] = None,
 ) -> List[Dict[str, Any]]:
     """
     Busca produtos com filtros de categoria e termos obrigatorios.
     Retorna sempre lista de dicts normalizados.
+    `db` permite encadear varias buscas (fases de fallback) na mesma sessao.
     """
     q = (query or "").strip()
     if not q and not category_hint and not must_terms and not should_terms:
@@ -224,7 +340,9 @@ def db_find_best_products_with_constraints(
     should_terms = [t for t in (should_terms or []) if t]
     category_hint = (category_hint or "").strip()
 
-    db: Session = SessionLocal()
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
     try:
         qry = db.query(Produto)
 
@@ -271,7 +389,102 @@ def db_find_best_products_with_constraints(
         out.sort(key=lambda x: x.get("score", 0.0), reverse=True)
         return out[:k]
     finally:
-        db.close()
+        if own_session:
+            db.close()
+
+
+CONSULTIVE_TIERS = ("must", "should", "fallback")
+
+
+def _text_match(term: str):
+    like = f"%{term}%"
+    return Produto.nome.ilike(like) | Produto.descricao.ilike(like)
+
+
+def db_find_products_tiered(
+    query: str,
+    k: int = 6,
+    category_hint: Optional[str] = None,
+    must_terms: Optional[List[str]] = None,
+    should_terms: Optional[List[str]] = None,
+    fallback_query: Optional[str] = None,
+    db: Optional[Session] = None,
+) -> Dict[str, Any]:
+    """
+    Busca consultiva em uma unica query, com as fases de fallback viradas camadas de ranking:
+      - "must": casa `query` e todos os `must_terms`
+      - "should": casa `query` (ordenado pelos `should_terms` que casam)
+      - "fallback": casa apenas `fallback_query`
+    Retorna so os itens da melhor camada encontrada:
+      {"items", "tier", "exact_match_found", "unavailable_specs"}
+    `unavailable_specs` = must_terms que nao aparecem em nenhum item retornado
+    (calculado no SQL, sem renormalizar os textos em Python).
+    """
+    q = (query or "").strip()
+    fb = (fallback_query or "").strip()
+    must_terms = [t for t in (must_terms or []) if t]
+    should_terms = [t for t in (should_terms or []) if t]
+    category_hint = (category_hint or "").strip()
+
+    empty: Dict[str, Any] = {"items": [], "tier": None, "exact_match_found": False, "unavailable_specs": []}
+    if not q and not fb and not category_hint and not must_terms and not should_terms:
+        return empty
+
+    q_cond = _text_match(q) if q else true()
+    must_conds = [_text_match(t) for t in must_terms]
+    must_all = and_(q_cond, *must_conds) if must_conds else q_cond
+    match_cond = or_(q_cond, _text_match(fb)) if (q and fb and fb != q) else q_cond
+
+    tier_col = case((must_all, 0), (q_cond, 1), else_=2).label("tier")
+    should_col = sum((case((_text_match(t), 1), else_=0) for t in should_terms), literal(0)).label("should_hits")
+    hit_cols = [case((c, 1), else_=0).label(f"must_hit_{i}") for i, c in enumerate(must_conds)]
+
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        qry = db.query(Produto, tier_col, should_col, *hit_cols).filter(Produto.ativo == True)  # noqa: E712
+        if category_hint:
+            qry = qry.join(CategoriaProduto, Produto.id_categoria == CategoriaProduto.id, isouter=True)
+            cat = f"%{category_hint}%"
+            qry = qry.filter(
+                CategoriaProduto.nome.ilike(cat)
+                | Produto.nome.ilike(cat)
+                | Produto.descricao.ilike(cat)
+            )
+        rows = (
+            qry.filter(match_cond)
+            .order_by(tier_col, should_col.desc(), Produto.id)
+            .limit(max(k * 3, k))
+            .all()
+        )
+        if not rows:
+            return empty
+
+        best = int(rows[0][1])
+        items: List[Dict[str, Any]] = []
+        hits = [0] * len(must_terms)
+        for row in rows:
+            if int(row[1]) != best or len(items) >= k:
+                break
+            normed = _normalize_candidate(row[0], default_score=0.55)
+            if not normed:
+                continue
+            normed["score"] = float(normed.get("score", 0.0)) + int(row[2] or 0)
+            items.append(normed)
+            for i in range(len(must_terms)):
+                hits[i] |= int(row[3 + i] or 0)
+
+        tier = CONSULTIVE_TIERS[best] if items else None
+        return {
+            "items": items,
+            "tier": tier,
+            "exact_match_found": tier == "must",
+            "unavailable_specs": [] if tier in (None, "must") else [t for t, h in zip(must_terms, hits) if not h],
+        }
+    finally:
+        if own_session:
+            db.close()
 
 
 def format_options(options: List[Dict[str, Any]]) -> str:
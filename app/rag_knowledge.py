@@ -1,78 +1,328 @@
+import hashlib
 import json
 import os
+import re
 import threading
+import time
+import uuid
 from typing import Any, Dict, List, Optional
 
 from langchain_core.documents import Document
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-except ImportError:
-    from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 
-
-# Diretórios e modelo
-EMBED_MODEL_NAME = os.getenv(
-    "EMBED_MODEL_NAME",
-    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+from app import index_status
+from app.embeddings import (
+    EMBED_MODEL_NAME,
+    embedder_name,
+    embedder_state,
+    get_embeddings,
+    restore_embedder_state,
 )
+from app.index_build import build_collection, fit_embedder, read_manifest, write_manifest
+from app.constants import STOPWORDS
+from app.text_utils import norm
+
+
+# Diretórios
 CHROMA_DIR = os.getenv("CHROMA_KNOWLEDGE_DIR", os.path.join("data", "chroma_knowledge"))
 CHROMA_COLLECTION = os.getenv("CHROMA_KNOWLEDGE_COLLECTION", "knowledge_base")
 FAQ_PATH = os.getenv("KNOWLEDGE_FAQ_PATH", os.path.join("data", "knowledge", "faq.json"))
+# Chunking: passagens com sobreposicao (caracteres), agrupadas por sentenca
+CHUNK_SIZE = int(os.getenv("KNOWLEDGE_CHUNK_SIZE", "320"))
+CHUNK_OVERLAP = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "80"))
+# Quantas passagens buscar por resultado final (antes de deduplicar por entrada)
+FETCH_FACTOR = 3
+# Manifesto com o hash do FAQ e a collection ativa (trocado de forma atomica)
+MANIFEST_NAME = "index_manifest.json"
 
 # Estado interno (thread-safe)
 _lock = threading.Lock()
-_embeddings: Optional[HuggingFaceEmbeddings] = None
 _vectorstore: Optional[Chroma] = None
 _index_built: bool = False
+_index_hash: Optional[str] = None
 
 
-def _get_embeddings() -> Optional[HuggingFaceEmbeddings]:
-    global _embeddings
-    if _embeddings is not None:
-        return _embeddings
+def _get_embeddings() -> Optional[Any]:
+    # mesmo modelo HF do indice de produtos; hashing proprio (IDF do FAQ) em modo degradado
+    return get_embeddings("knowledge")
 
-    try:
-        _embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL_NAME)
-    except Exception as e:
-        print(f"[knowledge] Falha ao carregar embeddings ({EMBED_MODEL_NAME}): {e}")
-        _embeddings = None
-    return _embeddings
 
-
-def _load_faq_docs() -> List[Document]:
+def _read_faq_entries() -> Optional[List[Dict[str, Any]]]:
+    """
+    Le as entradas validas do FAQ. Retorna None se o arquivo nao existir ou
+    estiver invalido (ex.: no meio de uma edicao), para nao confundir com FAQ vazio.
+    """
     if not os.path.exists(FAQ_PATH):
         print(f"[knowledge] FAQ nao encontrado em {FAQ_PATH}")
-        return []
+        return None
 
     try:
         with open(FAQ_PATH, "r", encoding="utf-8") as f:
             data = json.load(f)
     except Exception as e:
         print(f"[knowledge] Erro lendo FAQ: {e}")
-        return []
+        return None
 
-    docs: List[Document] = []
+    if not isinstance(data, list):
+        print("[knowledge] FAQ deve ser uma lista de entradas.")
+        return None
+
+    entries: List[Dict[str, Any]] = []
     for entry in data:
         if not isinstance(entry, dict):
             continue
         content = (entry.get("content") or "").strip()
         if not content:
             continue
-        doc = Document(
-            page_content=content,
-            metadata={
-                "id": entry.get("id"),
-                "title": entry.get("title"),
-                "tags": entry.get("tags") or [],
-            },
+        entries.append(entry)
+    return entries
+
+
+def _entry_key(entry: Dict[str, Any]) -> str:
+    """Id estavel da entrada (campo `id`; sem id, hash do conteudo)."""
+    key = str(entry.get("id") or "").strip()
+    if key:
+        return key
+    content = (entry.get("content") or "").strip()
+    return "faq_" + hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+
+
+def _entry_hash(entry: Dict[str, Any]) -> str:
+    payload = {
+        "title": entry.get("title"),
+        "content": (entry.get("content") or "").strip(),
+        "tags": entry.get("tags") or [],
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _index_entries(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Mapeia id -> entrada (ids repetidos: vale a ultima ocorrencia)."""
+    indexed: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        indexed[_entry_key(entry)] = entry
+    return indexed
+
+
+def _split_long(sentence: str, size: int) -> List[str]:
+    """Quebra por palavras uma sentenca maior que o tamanho da passagem."""
+    parts: List[str] = []
+    current = ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > size:
+            parts.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _chunk_text(text: str, size: Optional[int] = None, overlap: Optional[int] = None) -> List[str]:
+    """
+    Divide o texto em passagens de ate `size` caracteres, respeitando sentencas.
+    Cada passagem repete as ultimas sentencas da anterior (ate `overlap` caracteres).
+    """
+    size = CHUNK_SIZE if size is None else size
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    text = (text or "").strip()
+    if not text:
+        return []
+    if len(text) <= size:
+        return [text]
+
+    sentences: List[str] = []
+    for sent in re.split(r"(?<=[.!?])\s+", text):
+        sent = sent.strip()
+        if not sent:
+            continue
+        sentences.extend(_split_long(sent, size) if len(sent) > size else [sent])
+
+    chunks: List[str] = []
+    current: List[str] = []
+    for sent in sentences:
+        candidate = " ".join(current + [sent])
+        if current and len(candidate) > size:
+            chunks.append(" ".join(current))
+            carry: List[str] = []
+            for prev in reversed(current):
+                if len(" ".join([prev] + carry)) > overlap:
+                    break
+                carry.insert(0, prev)
+            # sobreposicao nunca pode estourar o tamanho junto com a proxima sentenca
+            while carry and len(" ".join(carry + [sent])) > size:
+                carry.pop(0)
+            current = carry + [sent]
+        else:
+            current.append(sent)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _chunk_id(parent_id: str, chunk: int) -> str:
+    return f"{parent_id}#{chunk}"
+
+
+def _chunking_signature() -> str:
+    return f"sentences:{CHUNK_SIZE}:{CHUNK_OVERLAP}"
+
+
+def _entry_to_docs(entry: Dict[str, Any]) -> List[Document]:
+    """Uma entrada do FAQ vira N passagens; `parent_id` liga todas a entrada original."""
+    key = _entry_key(entry)
+    docs: List[Document] = []
+    for i, passage in enumerate(_chunk_text(entry.get("content") or "")):
+        docs.append(
+            Document(
+                page_content=passage,
+                metadata={
+                    "id": key,
+                    "parent_id": key,
+                    "chunk": i,
+                    "title": entry.get("title"),
+                    # Chroma so aceita metadados escalares
+                    "tags": ",".join(str(t) for t in (entry.get("tags") or [])),
+                },
+            )
         )
-        docs.append(doc)
     return docs
 
 
+def _doc_id(doc: Document) -> str:
+    md = doc.metadata or {}
+    return _chunk_id(str(md.get("parent_id")), int(md.get("chunk", 0)))
+
+
+def _load_faq_docs() -> List[Document]:
+    indexed = _index_entries(_read_faq_entries() or [])
+    return [d for e in indexed.values() for d in _entry_to_docs(e)]
+
+
+def _faq_hash() -> Optional[str]:
+    """sha256 do arquivo do FAQ (None se nao existir/ilegivel)."""
+    try:
+        with open(FAQ_PATH, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except Exception:
+        return None
+
+
+def _manifest_path() -> str:
+    return os.path.join(CHROMA_DIR, MANIFEST_NAME)
+
+
+def _read_manifest() -> Dict[str, Any]:
+    return read_manifest(_manifest_path())
+
+
+def _write_manifest(data: Dict[str, Any]) -> None:
+    write_manifest(_manifest_path(), data)
+
+
+def _manifest_matches(manifest: Dict[str, Any], faq_hash: str, embeddings: Any = None) -> bool:
+    model = embedder_name(embeddings) if embeddings is not None else EMBED_MODEL_NAME
+    return (
+        bool(manifest.get("collection"))
+        and manifest.get("faq_sha256") == faq_hash
+        and manifest.get("embed_model") == model
+        and manifest.get("chunking") == _chunking_signature()
+    )
+
+
+def _open_collection(name: str, embeddings: Any) -> Optional[Chroma]:
+    """Abre uma collection persistida; None se nao existir ou estiver vazia."""
+    try:
+        store = Chroma(
+            collection_name=name,
+            embedding_function=embeddings,
+            persist_directory=CHROMA_DIR,
+        )
+        count = store._collection.count()  # type: ignore[attr-defined]
+    except Exception as e:
+        print(f"[knowledge] Nao consegui abrir a collection {name}: {e}")
+        return None
+    return store if count > 0 else None
+
+
+def _drop_collection(name: str, embeddings: Any) -> None:
+    try:
+        Chroma(
+            collection_name=name,
+            embedding_function=embeddings,
+            persist_directory=CHROMA_DIR,
+        ).delete_collection()
+    except Exception as e:
+        print(f"[knowledge] Nao consegui remover a collection {name}: {e}")
+
+
+def _rebuild_and_swap(embeddings: Any, faq_hash: str, previous: Optional[str]) -> bool:
+    """
+    Constroi uma collection nova (nome versionado pelo hash) e so depois troca o
+    manifesto e o vectorstore em memoria. Se falhar no meio, o indice anterior continua valendo.
+    """
+    global _vectorstore, _index_built, _index_hash
+
+    indexed = _index_entries(_read_faq_entries() or [])
+    if not indexed:
+        print("[knowledge] Nenhum documento para indexar.")
+        return False
+
+    chunks_by_entry = {key: _entry_to_docs(e) for key, e in indexed.items()}
+    docs = [d for entry_docs in chunks_by_entry.values() for d in entry_docs]
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    new_name = f"{CHROMA_COLLECTION}_{faq_hash[:12]}_{uuid.uuid4().hex[:6]}"
+    try:
+        store = Chroma(
+            collection_name=new_name,
+            embedding_function=embeddings,
+            persist_directory=CHROMA_DIR,
+        )
+        # IDF novo numa copia (o indice atual segue servindo); em lotes, e se falhar
+        # build_collection ja remove a collection parcial
+        build_embeddings = fit_embedder(embeddings, docs)
+        stats = build_collection(store, docs, [_doc_id(d) for d in docs], build_embeddings, label="knowledge")
+    except Exception as e:
+        print(f"[knowledge] Falha ao construir indice: {e}")
+        return False
+
+    _write_manifest(
+        {
+            "faq_sha256": faq_hash,
+            "embed_model": embedder_name(embeddings),
+            "embedder_state": embedder_state(build_embeddings),
+            "collection": new_name,
+            "chunking": _chunking_signature(),
+            "doc_count": len(docs),
+            # hash e numero de passagens por entrada: base do reload incremental
+            "entries": {key: _entry_hash(e) for key, e in indexed.items()},
+            "chunk_counts": {key: len(d) for key, d in chunks_by_entry.items()},
+            "built_at": time.time(),
+            "build_stats": stats,
+        }
+    )
+    restore_embedder_state(embeddings, embedder_state(build_embeddings))
+    _vectorstore = store
+    _index_built = True
+    _index_hash = faq_hash
+
+    if previous and previous != new_name:
+        _drop_collection(previous, embeddings)
+    return True
+
+
 def _ensure_index_ready(force: bool = False) -> bool:
-    global _vectorstore, _index_built
+    """
+    Garante o indice do FAQ. Se o manifesto persistido tiver o mesmo hash do
+    FAQ (e o mesmo modelo), apenas reabre a collection; senao reconstroi e troca.
+    `force` reconstroi mesmo com hash igual.
+    """
+    global _vectorstore, _index_built, _index_hash
+
+    # caminho rapido sem lock: buscas nao esperam reloads/rebuilds em andamento
+    if not force and _index_built and _vectorstore is not None:
+        return True
 
     with _lock:
         if not force and _index_built and _vectorstore is not None:
@@ -82,37 +332,114 @@ def _ensure_index_ready(force: bool = False) -> bool:
         if embeddings is None:
             return False
 
-        # Se force, apaga o diretório para reconstruir
-        if force and os.path.exists(CHROMA_DIR):
-            try:
-                import shutil
-                shutil.rmtree(CHROMA_DIR, ignore_errors=True)
-            except Exception as e:
-                print(f"[knowledge] Nao consegui limpar o indice: {e}")
-
-        docs = _load_faq_docs()
-        if not docs:
-            print("[knowledge] Nenhum documento para indexar.")
+        faq_hash = _faq_hash()
+        if faq_hash is None:
+            print(f"[knowledge] FAQ nao encontrado em {FAQ_PATH}")
             return False
 
+        manifest = _read_manifest()
+        if not force and _manifest_matches(manifest, faq_hash, embeddings):
+            store = _open_collection(manifest["collection"], embeddings)
+            if store is not None:
+                restore_embedder_state(embeddings, manifest.get("embedder_state"))
+                _vectorstore = store
+                _index_built = True
+                _index_hash = faq_hash
+                return True
+
+        # sem manifesto: a collection legada (nome fixo, com duplicatas) e descartada na troca
+        previous = manifest.get("collection") or CHROMA_COLLECTION
+        return _rebuild_and_swap(embeddings, faq_hash, previous)
+
+
+def reload_knowledge_index() -> Dict[str, Any]:
+    """
+    Recarrega o FAQ de forma incremental: diff por `id` contra o manifesto,
+    re-embeda so entradas novas/alteradas e aplica upsert/delete na collection ativa.
+    As buscas seguem usando o indice durante a atualizacao (nao passam pelo `_lock`).
+    """
+    global _index_hash
+
+    with _lock:
+        if not _index_built or _vectorstore is None:
+            # indice ainda nao existe: o warmup/primeira busca ja constroi com o FAQ novo
+            return {"mode": "skipped"}
+
+        faq_hash = _faq_hash()
+        if faq_hash is None or faq_hash == _index_hash:
+            return {"mode": "noop"}
+
+        entries = _read_faq_entries()
+        if entries is None:
+            return {"mode": "invalid"}
+
+        embeddings = _get_embeddings()
+        if embeddings is None:
+            return {"mode": "failed", "error": "embeddings indisponiveis"}
+
+        manifest = _read_manifest()
+        old_hashes = manifest.get("entries")
+        old_counts = manifest.get("chunk_counts")
+        if (
+            not isinstance(old_hashes, dict)
+            or not isinstance(old_counts, dict)
+            or not manifest.get("collection")
+            or manifest.get("chunking") != _chunking_signature()
+            or manifest.get("embed_model") != embedder_name(embeddings)
+        ):
+            # manifesto antigo, chunking ou backend de embeddings diferente: reconstroi e troca
+            ok = _rebuild_and_swap(embeddings, faq_hash, manifest.get("collection"))
+            return {"mode": "full" if ok else "failed"}
+
+        current = _index_entries(entries)
+        new_hashes = {key: _entry_hash(e) for key, e in current.items()}
+        added = [k for k in new_hashes if k not in old_hashes]
+        changed = [k for k in new_hashes if k in old_hashes and old_hashes[k] != new_hashes[k]]
+        removed = [k for k in old_hashes if k not in new_hashes]
+
+        new_counts = {k: int(v) for k, v in old_counts.items() if k in new_hashes}
+        upsert_keys = added + changed
+        docs = [d for k in upsert_keys for d in _entry_to_docs(current[k])]
+        stale_ids = [_chunk_id(k, i) for k in removed for i in range(int(old_counts.get(k, 0)))]
+        for k in upsert_keys:
+            new_counts[k] = sum(1 for d in docs if d.metadata.get("parent_id") == k)
+            # passagens antigas alem do novo total sobrariam orfas
+            stale_ids.extend(_chunk_id(k, i) for i in range(new_counts[k], int(old_counts.get(k, 0))))
         try:
-            _vectorstore = Chroma.from_documents(
-                documents=docs,
-                embedding=embeddings,
-                persist_directory=CHROMA_DIR,
-                collection_name=CHROMA_COLLECTION,
-            )
-            _index_built = True
-            return True
+            if docs:
+                # embeda antes de tocar na collection: falha aqui nao altera o indice
+                vectors = embeddings.embed_documents([d.page_content for d in docs])
+                _vectorstore._collection.upsert(  # type: ignore[attr-defined]
+                    ids=[_doc_id(d) for d in docs],
+                    embeddings=vectors,
+                    documents=[d.page_content for d in docs],
+                    metadatas=[d.metadata for d in docs],
+                )
+            if stale_ids:
+                _vectorstore._collection.delete(ids=stale_ids)  # type: ignore[attr-defined]
         except Exception as e:
-            print(f"[knowledge] Falha ao construir indice: {e}")
-            _vectorstore = None
-            _index_built = False
-            return False
+            print(f"[knowledge] Falha no reload incremental: {e}")
+            return {"mode": "failed", "error": str(e)[:200]}
+
+        manifest.update(
+            {
+                "faq_sha256": faq_hash,
+                "doc_count": sum(new_counts.values()),
+                "entries": new_hashes,
+                "chunk_counts": new_counts,
+                "updated_at": time.time(),
+            }
+        )
+        _write_manifest(manifest)
+        _index_hash = faq_hash
+        return {"mode": "incremental", "added": len(added), "changed": len(changed), "removed": len(removed)}
 
 
 def rebuild_knowledge_index(force: bool = False) -> int:
-    """Reconstrói o índice de conhecimento e retorna a contagem de docs."""
+    """
+    Garante o índice de conhecimento e retorna a contagem de docs.
+    Reaproveita o índice persistido quando o hash do FAQ não mudou (force=True reconstrói).
+    """
     ok = _ensure_index_ready(force=force)
     if not ok or _vectorstore is None:
         return 0
@@ -123,16 +450,61 @@ def rebuild_knowledge_index(force: bool = False) -> int:
     return int(count)
 
 
+def _best_passage_per_entry(results: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """Deduplica por entrada (parent): fica a passagem de maior score de cada uma."""
+    best: Dict[str, Dict[str, Any]] = {}
+    for r in results:
+        key = str(r.get("id"))
+        if key not in best or r.get("score", 0.0) > best[key].get("score", 0.0):
+            best[key] = r
+    out = sorted(best.values(), key=lambda x: x.get("score", 0.0), reverse=True)
+    return out[:k]
+
+
+def _lexical_search(query: str, k: int = 5, min_score: float = 0.35) -> List[Dict[str, Any]]:
+    """Busca por termos no FAQ (sem embeddings). Score = fracao dos termos da pergunta encontrados."""
+    terms = [t for t in norm(query).split() if len(t) >= 3 and t not in STOPWORDS]
+    if not terms:
+        return []
+
+    results: List[Dict[str, Any]] = []
+    for doc in _load_faq_docs():
+        md = doc.metadata or {}
+        text = norm(f"{md.get('title') or ''} {doc.page_content}")
+        hits = sum(1 for t in terms if t in text)
+        s = hits / float(len(terms))
+        if s < float(min_score):
+            continue
+        results.append(
+            {
+                "id": md.get("id"),
+                "title": md.get("title"),
+                "content": doc.page_content,
+                "chunk": md.get("chunk", 0),
+                "score": s,
+            }
+        )
+
+    return _best_passage_per_entry(results, k)
+
+
 def search_knowledge(query: str, k: int = 5, min_score: float = 0.35) -> List[Dict[str, Any]]:
-    """Busca no FAQ técnico usando similaridade. Retorna lista com metadados."""
+    """
+    Busca no FAQ técnico usando similaridade entre passagens.
+    Retorna no maximo `k` entradas distintas, cada uma com sua melhor passagem em `content`.
+    """
     if not query or not query.strip():
         return []
 
+    # Warmup em andamento: responde por termos em vez de esperar o indice
+    if index_status.is_pending("knowledge"):
+        return _lexical_search(query, k=k, min_score=min_score)
+
     if not _ensure_index_ready():
         return []
 
     try:
-        docs_scores = _vectorstore.similarity_search_with_relevance_scores(query, k=k)  # type: ignore[operator]
+        docs_scores = _vectorstore.similarity_search_with_relevance_scores(query, k=k * FETCH_FACTOR)  # type: ignore[operator]
     except Exception as e:
         print(f"[knowledge] Falha na busca: {e}")
         return []
@@ -145,20 +517,20 @@ def search_knowledge(query: str, k: int = 5, min_score: float = 0.35) -> List[Di
         md = doc.metadata or {}
         results.append(
             {
-                "id": md.get("id"),
+                "id": md.get("parent_id") or md.get("id"),
                 "title": md.get("title"),
                 "content": doc.page_content,
+                "chunk": md.get("chunk", 0),
                 "score": s,
             }
         )
 
-    results.sort(key=lambda x: x.get("score", 0.0), reverse=True)
-    return results
+    return _best_passage_per_entry(results, k)
 
 
-def format_knowledge_answer(question: str, hint: Optional[str] = None, k: int = 3) -> Optional[str]:
+def format_knowledge_answer(question: str, hint: Optional[str] = None, k: int = 2) -> Optional[str]:
     """
-    Formata uma resposta curta baseada no FAQ tecnico.
+    Formata uma resposta curta baseada no FAQ tecnico, citando a melhor passagem de cada entrada.
     Retorna None se nao houver match suficiente.
     """
     query = " ".join(filter(None, [question or "", hint or ""])).strip()
@@ -166,12 +538,12 @@ def format_knowledge_answer(question: str, hint: Optional[str] = None, k: int =
     if not hits:
         return None
 
-    top_hits = hits[: min(k, 2)]
     lines = ["Encontrei orientacoes tecnicas para sua pergunta:"]
-    for h in top_hits:
+    for h in hits[:k]:
         snippet = (h.get("content") or "").strip()
-        if len(snippet) > 420:
-            snippet = snippet[:417] + "..."
+        # passagens ja saem do chunking com ate CHUNK_SIZE; o corte e so uma protecao
+        if len(snippet) > CHUNK_SIZE + 20:
+            snippet = snippet[: CHUNK_SIZE + 17] + "..."
         title = h.get("title") or "Referencia tecnica"
         lines.append(f"- {title}: {snippet}")
     lines.append("Fonte: base tecnica interna (valores aproximados; confirme em obra/engenharia quando for estrutural).")
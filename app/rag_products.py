@@ -3,97 +3,46 @@ from __future__ import annotations
 import os
 import threading
 import math
-from typing import Any, Dict, List, Optional, Tuple
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from langchain_core.documents import Document
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-except ImportError:
-    from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 
 from database import SessionLocal, Produto
+from app import catalog_cache, index_status
+from app.embeddings import (
+    EMBED_MODEL_NAME,
+    embedder_name,
+    embedder_state,
+    get_embeddings,
+    restore_embedder_state,
+)
+from app.index_build import build_collection, fit_embedder, read_manifest, write_manifest
 
 
 # ============================
 # Configurações do índice
 # ============================
 
-# Modelo bom para PT-BR e buscas "parecidas"
-EMBED_MODEL_NAME = os.getenv(
-    "EMBED_MODEL_NAME",
-    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-)
-
 CHROMA_DIR = os.getenv("CHROMA_DIR", os.path.join("data", "chroma_products"))
 CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "products")
+# Manifesto com a collection ativa (trocado de forma atômica ao fim de cada build)
+MANIFEST_NAME = "index_manifest.json"
 
-# Controle interno
-_lock = threading.Lock()
-_embeddings: Optional[HuggingFaceEmbeddings] = None
+# Controle interno (RLock: _ensure_index_ready chama rebuild_products_index segurando o lock)
+_lock = threading.RLock()
 _vectorstore: Optional[Chroma] = None
 _index_built: bool = False
 _last_index_count: int = -1
-_embeddings_failed: bool = False
 
 
-def _get_embeddings() -> Optional[HuggingFaceEmbeddings]:
-    global _embeddings, _embeddings_failed
-    
-    if _embeddings_failed:
-        return None
-    
-    if _embeddings is not None:
-        return _embeddings
-    
-    offline_mode = os.getenv("HF_OFFLINE", "0") == "1"
-    
-    if offline_mode:
-        os.environ["TRANSFORMERS_OFFLINE"] = "1"
-        os.environ["HF_HUB_OFFLINE"] = "1"
-    
-    max_retries = 2 if not offline_mode else 1
-    for attempt in range(max_retries):
-        try:
-            if not offline_mode and attempt == 0:
-                os.environ["TRANSFORMERS_OFFLINE"] = "0"
-                os.environ.pop("HF_HUB_OFFLINE", None)
-            else:
-                os.environ["TRANSFORMERS_OFFLINE"] = "1"
-                os.environ["HF_HUB_OFFLINE"] = "1"
-            
-            _embeddings = HuggingFaceEmbeddings(
-                model_name=EMBED_MODEL_NAME,
-                model_kwargs={"trust_remote_code": True},
-                encode_kwargs={"normalize_embeddings": True},
-            )
-            print(f"✅ Modelo de embeddings carregado: {EMBED_MODEL_NAME} (offline={os.environ.get('TRANSFORMERS_OFFLINE', '0')})")
-            return _embeddings
-        except Exception as e:
-            attempt_num = attempt + 1
-            error_str = str(e)
-            
-            if "huggingface.co" in error_str.lower() or "timeout" in error_str.lower() or "connection" in error_str.lower():
-                print(f"⚠️ Problema de conexão com HuggingFace (tentativa {attempt_num}/{max_retries})")
-                if attempt < max_retries - 1:
-                    print("   Tentando novamente em modo offline...")
-                    os.environ["TRANSFORMERS_OFFLINE"] = "1"
-                    os.environ["HF_HUB_OFFLINE"] = "1"
-                    continue
-            else:
-                print(f"⚠️ Erro ao carregar embeddings: {error_str[:200]}")
-            
-            if attempt >= max_retries - 1:
-                print("❌ Falha ao carregar modelo de embeddings. Buscas semânticas desabilitadas.")
-                _embeddings_failed = True
-                return None
-    
-    return None
+def _get_embeddings() -> Optional[Any]:
+    # modelo HF compartilhado ou, em modo degradado / EMBED_BACKEND=hashing, hashing por n-gramas
+    return get_embeddings("products")
 
 
 def _produto_to_doc(p: Produto) -> Document:
-    preco = float(p.preco) if p.preco is not None else 0.0
-    estoque = float(p.estoque_atual) if p.estoque_atual is not None else 0.0
     unidade = (p.unidade or "UN").strip()
 
     # Conteúdo usado para embedding / busca
@@ -104,22 +53,48 @@ def _produto_to_doc(p: Produto) -> Document:
     ]
     content = "\n".join([x for x in content_parts if x.strip()])
 
+    # Preço/estoque NÃO entram no índice: são sobrepostos na busca (catalog_cache),
+    # assim mudança de preço não exige re-embedding.
     metadata = {
         "id_produto": int(p.id),
         "nome": p.nome,
         "unidade": unidade,
-        "preco": preco,
-        "estoque": estoque,
-        "ativo": bool(p.ativo),
     }
+    # Atributo estável: filtro de categoria vai direto no `where` do Chroma
+    if p.id_categoria is not None:
+        metadata["id_categoria"] = int(p.id_categoria)
 
     return Document(page_content=content, metadata=metadata)
 
 
+def _manifest_path() -> str:
+    return os.path.join(CHROMA_DIR, MANIFEST_NAME)
+
+
+def _active_collection_name() -> str:
+    """Collection ativa segundo o manifesto (ou o nome fixo legado)."""
+    return read_manifest(_manifest_path()).get("collection") or CHROMA_COLLECTION
+
+
+def _drop_collection(name: str, embeddings: Any) -> None:
+    try:
+        Chroma(
+            collection_name=name,
+            embedding_function=embeddings,
+            persist_directory=CHROMA_DIR,
+        ).delete_collection()
+    except Exception as e:
+        print(f"⚠️ Não consegui remover a collection {name}: {e}")
+
+
 def rebuild_products_index(force: bool = False) -> int:
     """
     Recria o índice vetorial a partir do banco (produtos ativos).
     Retorna a quantidade de documentos indexados.
+
+    O build vai para uma collection nova (embeddings em lotes); o manifesto e o
+    vectorstore em memória só são trocados no final. Se falhar no meio, a
+    collection parcial é descartada e o índice anterior continua valendo.
     """
     global _vectorstore, _index_built, _last_index_count
 
@@ -128,57 +103,77 @@ def rebuild_products_index(force: bool = False) -> int:
         try:
             produtos = db.query(Produto).filter(Produto.ativo == True).all()
             docs = [_produto_to_doc(p) for p in produtos]
+        finally:
+            db.close()
 
-            # Heurística simples: se quantidade não mudou e já existe índice, não refaz
-            if not force and _index_built and _last_index_count == len(docs) and _vectorstore is not None:
-                return _last_index_count
-
-            os.makedirs(CHROMA_DIR, exist_ok=True)
-
-            embeddings = _get_embeddings()
-            if embeddings is None:
-                print("❌ Não foi possível reconstruir o índice: modelo de embeddings indisponível")
-                return 0
+        # Heurística simples: se quantidade não mudou e já existe índice, não refaz
+        if not force and _index_built and _last_index_count == len(docs) and _vectorstore is not None:
+            return _last_index_count
 
-            # Sempre recria do zero (mais previsível)
-            # Apaga a collection anterior removendo o diretório inteiro? (opcional)
-            # Aqui a gente simplesmente cria uma nova store e persiste em disco.
-            _vectorstore = Chroma.from_documents(
-                documents=docs,
-                embedding=embeddings,
-                collection_name=CHROMA_COLLECTION,
-                persist_directory=CHROMA_DIR,
-            )
-            _vectorstore.persist()
+        os.makedirs(CHROMA_DIR, exist_ok=True)
 
-            _index_built = True
-            _last_index_count = len(docs)
-            return _last_index_count
+        embeddings = _get_embeddings()
+        if embeddings is None:
+            print("❌ Não foi possível reconstruir o índice: modelo de embeddings indisponível")
+            return 0
+
+        previous = _active_collection_name()
+        new_name = f"{CHROMA_COLLECTION}_{uuid.uuid4().hex[:8]}"
+        store = Chroma(
+            collection_name=new_name,
+            embedding_function=embeddings,
+            persist_directory=CHROMA_DIR,
+        )
+        # ids estáveis por produto: re-upsert não duplica documentos
+        ids = [str(d.metadata["id_produto"]) for d in docs]
+        # IDF novo numa copia: as buscas seguem com o embedder do indice atual ate a troca
+        build_embeddings = fit_embedder(embeddings, docs)
+        stats = build_collection(store, docs, ids, build_embeddings, label="products")
+
+        write_manifest(
+            _manifest_path(),
+            {
+                "collection": new_name,
+                "embed_model": embedder_name(embeddings),
+                # estado do embedder ajustado ao corpus (IDF do hashing); None no HF
+                "embedder_state": embedder_state(build_embeddings),
+                "doc_count": len(docs),
+                "build_stats": stats,
+            },
+        )
+        restore_embedder_state(embeddings, embedder_state(build_embeddings))
+        _vectorstore = store
+        _index_built = True
+        _last_index_count = len(docs)
 
-        finally:
-            db.close()
+        if previous != new_name:
+            _drop_collection(previous, embeddings)
+        return _last_index_count
 
 
 def _ensure_index_ready() -> bool:
     global _vectorstore, _index_built
+
+    # caminho rápido sem lock: buscas não esperam um rebuild em andamento
+    if _index_built and _vectorstore is not None:
+        return True
+
     with _lock:
         if _index_built and _vectorstore is not None:
             return True
-        
-        if _embeddings_failed:
-            print("⚠️ Não é possível usar buscas semânticas (modelo de embeddings falhou).")
-            return False
 
         os.makedirs(CHROMA_DIR, exist_ok=True)
         embeddings = _get_embeddings()
         
         if embeddings is None:
+            print("⚠️ Não é possível usar buscas semânticas (modelo de embeddings falhou).")
             return False
 
         try:
+            manifest = read_manifest(_manifest_path())
             # Tenta abrir índice persistido (se existir)
             _vectorstore = Chroma(
-                collection_name=CHROMA_COLLECTION,
+                collection_name=manifest.get("collection") or CHROMA_COLLECTION,
                 embedding_function=embeddings,
                 persist_directory=CHROMA_DIR,
             )
@@ -189,6 +184,12 @@ def _ensure_index_ready() -> bool:
             except Exception:
                 count = 0
 
+            # Índice gerado por outro backend (ex.: HF -> hashing) tem outra dimensão: refaz
+            if count and manifest.get("embed_model", EMBED_MODEL_NAME) != embedder_name(embeddings):
+                count = 0
+            else:
+                restore_embedder_state(embeddings, manifest.get("embedder_state"))
+
             if count == 0:
                 rebuild_products_index(force=True)
             else:
@@ -216,17 +217,95 @@ def _distance_to_score(x: float) -> float:
         return 0.0
 
 
-def search_products(query: str, k: int = 6, min_score: float = 0.15) -> List[Dict[str, Any]]:
+def _live_match(
+    row: Dict[str, Any],
+    in_stock: bool,
+    min_price: Optional[float],
+    max_price: Optional[float],
+    unit: Optional[str],
+) -> bool:
+    if not row.get("ativo"):
+        return False
+    if in_stock and float(row.get("estoque") or 0.0) <= 0:
+        return False
+    preco = float(row.get("preco") or 0.0)
+    if min_price is not None and preco < float(min_price):
+        return False
+    if max_price is not None and preco > float(max_price):
+        return False
+    if unit and (row.get("unidade") or "").upper() != unit.strip().upper():
+        return False
+    return True
+
+
+def _build_where(
+    category: Any = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    unit: Optional[str] = None,
+) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Traduz os filtros para o `where` do Chroma, aplicado ANTES do top-k.
+    - categoria (id ou nome, estável): metadado `id_categoria` do índice;
+    - estoque/preço/unidade (vivos): máscara de ids calculada no catalog_cache.
+    Retorna (possivel, where); possivel=False quando nenhum produto atende.
+    """
+    clauses: List[Dict[str, Any]] = []
+
+    if category is not None and category != "":
+        if isinstance(category, int):
+            cat_ids = [category]
+        else:
+            cat_ids = catalog_cache.category_ids(str(category))
+        if not cat_ids:
+            return False, None
+        clauses.append({"id_categoria": {"$in": cat_ids}})
+
+    if in_stock or min_price is not None or max_price is not None or unit:
+        allowed = [
+            pid
+            for pid, row in catalog_cache.snapshot().items()
+            if _live_match(row, in_stock, min_price, max_price, unit)
+        ]
+        if not allowed:
+            return False, None
+        clauses.append({"id_produto": {"$in": allowed}})
+
+    if not clauses:
+        return True, None
+    if len(clauses) == 1:
+        return True, clauses[0]
+    return True, {"$and": clauses}
+
+
+def search_products(
+    query: str,
+    k: int = 6,
+    min_score: float = 0.15,
+    category: Any = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    unit: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
     Busca produtos por similaridade semântica.
     Retorna lista de dicts com {id_produto, nome, unidade, preco, estoque, score}.
 
+    Filtros opcionais (categoria, só com estoque, faixa de preço, unidade) são
+    empurrados para a consulta vetorial, então os k resultados já vêm utilizáveis.
+
     Evita o warning de "relevance scores fora de [0,1]" usando, primeiro,
     similarity_search_with_score (distância) e convertendo para score.
     """
     if not query or not query.strip():
         return []
 
+    # Warmup em andamento: nao espera o rebuild (lock); o chamador cai no SQL
+    if index_status.is_pending("products"):
+        return []
+
     if not _ensure_index_ready():
         print(f"⚠️ Buscas semânticas indisponíveis. Retornando lista vazia para: {query}")
         return []
@@ -236,37 +315,90 @@ def search_products(query: str, k: int = 6, min_score: float = 0.15) -> List[Dic
 
     q = query.strip()
 
+    try:
+        possible, where = _build_where(category, in_stock, min_price, max_price, unit)
+    except Exception as e:
+        print(f"⚠️ Falha ao montar filtros da busca semântica: {str(e)[:200]}")
+        return []
+    if not possible:
+        return []
+    search_kwargs: Dict[str, Any] = {"k": k}
+    if where is not None:
+        search_kwargs["filter"] = where
+
     docs_scores: List[Tuple[Document, float]] = []
 
     # 1) preferir "with_score" (geralmente distância)
     try:
-        docs_dist = _vectorstore.similarity_search_with_score(q, k=k)  # type: ignore[attr-defined]
+        docs_dist = _vectorstore.similarity_search_with_score(q, **search_kwargs)  # type: ignore[attr-defined]
         docs_scores = [(doc, _distance_to_score(dist)) for doc, dist in docs_dist]
     except Exception:
         # 2) fallback: relevance_scores (normaliza)
         try:
-            raw: List[Tuple[Document, float]] = _vectorstore.similarity_search_with_relevance_scores(q, k=k)
+            raw: List[Tuple[Document, float]] = _vectorstore.similarity_search_with_relevance_scores(q, **search_kwargs)
             docs_scores = [(doc, _distance_to_score(score)) for doc, score in raw]
         except Exception:
             # 3) último fallback: sem score
-            docs = _vectorstore.similarity_search(q, k=k)
+            docs = _vectorstore.similarity_search(q, **search_kwargs)
             docs_scores = [(d, 0.5) for d in docs]
 
-    results: List[Dict[str, Any]] = []
+    # Do índice vetorial só aproveitamos id + score
+    hits: List[Tuple[Any, float]] = []
     for doc, score in docs_scores:
         md = doc.metadata or {}
         s = float(score)
         if s < float(min_score):
             continue
+        hits.append((md.get("id_produto"), s))
+
+    return _overlay_live_data(
+        hits,
+        # máscara pode ter envelhecido se o cache recarregou no meio da busca
+        lambda row: _live_match(row, in_stock, min_price, max_price, unit),
+    )
+
+
+def _overlay_live_data(
+    hits: List[Tuple[Any, float]],
+    keep: Optional[Any] = None,
+    live: Optional[Dict[int, Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Junta os hits (id, score) com preço/estoque vivos do catálogo.
+    Produtos removidos ou desativados depois do último rebuild são descartados,
+    assim como os que não passam em `keep(row)` (filtros vivos).
+    `live` permite reaproveitar um único lookup para vários conjuntos de hits.
+    """
+    if not hits:
+        return []
+    if live is None:
+        try:
+            live = catalog_cache.get_many(pid for pid, _ in hits)
+        except Exception as e:
+            # sem dados vivos não mostramos preço congelado: o chamador cai no SQL
+            print(f"⚠️ Falha ao carregar preço/estoque do catálogo: {str(e)[:200]}")
+            return []
 
+    results: List[Dict[str, Any]] = []
+    seen = set()
+    for pid, score in hits:
+        try:
+            row = live.get(int(pid))
+        except (TypeError, ValueError):
+            continue
+        if row is None or not row.get("ativo") or row["id_produto"] in seen:
+            continue
+        if keep is not None and not keep(row):
+            continue
+        seen.add(row["id_produto"])
         results.append(
             {
-                "id_produto": md.get("id_produto"),
-                "nome": md.get("nome"),
-                "unidade": md.get("unidade"),
-                "preco": md.get("preco"),
-                "estoque": md.get("estoque"),
-                "score": s,
+                "id_produto": row["id_produto"],
+                "nome": row["nome"],
+                "unidade": row["unidade"],
+                "preco": row["preco"],
+                "estoque": row["estoque"],
+                "score": score,
             }
         )
 
@@ -274,11 +406,89 @@ def search_products(query: str, k: int = 6, min_score: float = 0.15) -> List[Dic
     return results
 
 
-def search_products_semantic(query: str, k: int = 6, min_relevance: float = None, min_score: float = None) -> List[Dict[str, Any]]:
-    """Compatibilidade com chamadas antigas (min_relevance) e novas (min_score)."""
+def search_products_batch(
+    queries: Sequence[str],
+    k: int = 6,
+    min_score: float = 0.15,
+    category: Any = None,
+    in_stock: bool = False,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    unit: Optional[str] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Versão em lote de `search_products`: retorna uma lista de resultados por query
+    (mesma ordem). Todas as queries são embedadas numa única passada do modelo, o
+    top-k sai de uma única consulta à collection e preço/estoque de um único lookup.
+    """
+    out: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    idx = [i for i, q in enumerate(queries) if q and q.strip()]
+    if not idx or index_status.is_pending("products"):
+        return out
+
+    if not _ensure_index_ready() or _vectorstore is None:
+        return out
+
+    try:
+        possible, where = _build_where(category, in_stock, min_price, max_price, unit)
+    except Exception as e:
+        print(f"⚠️ Falha ao montar filtros da busca semântica: {str(e)[:200]}")
+        return out
+    if not possible:
+        return out
+
+    texts = [queries[i].strip() for i in idx]
+    try:
+        embeddings = _get_embeddings()
+        if embeddings is None:
+            return out
+        vectors = embeddings.embed_documents(texts)
+        raw = _vectorstore._collection.query(  # type: ignore[attr-defined]
+            query_embeddings=vectors,
+            n_results=k,
+            where=where,
+            include=["metadatas", "distances"],
+        )
+    except Exception as e:
+        # fallback: uma busca por query (mesmo resultado, sem o ganho do lote)
+        print(f"⚠️ Busca em lote indisponível ({str(e)[:120]}); buscando uma a uma.")
+        filters = dict(category=category, in_stock=in_stock, min_price=min_price, max_price=max_price, unit=unit)
+        for i in idx:
+            out[i] = search_products(queries[i], k=k, min_score=min_score, **filters)
+        return out
+
+    hits_per_query: List[List[Tuple[Any, float]]] = []
+    for metadatas, distances in zip(raw.get("metadatas") or [], raw.get("distances") or []):
+        hits: List[Tuple[Any, float]] = []
+        for md, dist in zip(metadatas or [], distances or []):
+            s = _distance_to_score(dist)
+            if s >= float(min_score):
+                hits.append(((md or {}).get("id_produto"), s))
+        hits_per_query.append(hits)
+
+    try:
+        live = catalog_cache.get_many(pid for hits in hits_per_query for pid, _ in hits)
+    except Exception as e:
+        print(f"⚠️ Falha ao carregar preço/estoque do catálogo: {str(e)[:200]}")
+        return out
+
+    keep = lambda row: _live_match(row, in_stock, min_price, max_price, unit)  # noqa: E731
+    for i, hits in zip(idx, hits_per_query):
+        out[i] = _overlay_live_data(hits, keep, live=live)
+    return out
+
+
+def search_products_semantic(
+    query: str,
+    k: int = 6,
+    min_relevance: float = None,
+    min_score: float = None,
+    **filters: Any,
+) -> List[Dict[str, Any]]:
+    """Compatibilidade com chamadas antigas (min_relevance) e novas (min_score). Repassa filtros."""
     if min_score is None:
         min_score = 0.15 if min_relevance is None else float(min_relevance)
-    return search_products(query=query, k=k, min_score=float(min_score))
+    return search_products(query=query, k=k, min_score=float(min_score), **filters)
 
 def rebuild_product_index(force: bool = False) -> int:
     # alias para compatibilidade com main.py antigo
@@ -0,0 +1,187 @@
+"""
+Cache de respostas do LLM router (`llm_service.route_intent`).
+
+A decisao do router depende so da mensagem e do `state_summary` (quase tudo booleano),
+e boa parte do trafego se repete ("tem cimento?", "quero areia"). Duas camadas:
+
+- exata: chave = (mensagem normalizada por `norm`, state_summary canonico), com TTL e
+  limite de tamanho (LRU);
+- quase-duplicata (opcional, ROUTER_CACHE_SEMANTIC): mesma state_summary e embedding da
+  mensagem com similaridade >= ROUTER_CACHE_SIM_THRESHOLD. So reaproveita se os termos de
+  conteudo (produto, medida, uso) forem os mesmos, para "quero cimento" nunca responder
+  por "quero areia".
+
+`stats()` expoe hits/misses por camada e a taxa de acerto.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+
+from app import settings
+from app.text_utils import norm
+
+logger = logging.getLogger(__name__)
+
+MIN_CONTENT_TOKEN_LEN = 3
+
+
+@dataclass
+class _Entry:
+    route: Dict[str, Any]
+    state_key: str
+    content: FrozenSet[str]
+    expires_at: float
+    vector: Optional[np.ndarray] = None
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+_stats: Counter = Counter()
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return sorted((_canonical(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, str):
+        return norm(value)
+    return value
+
+
+def state_key(state_summary: Dict[str, Any]) -> str:
+    """state_summary canonico: chaves ordenadas, listas sem ordem, textos normalizados."""
+    return json.dumps(_canonical(state_summary or {}), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def message_key(message: str) -> str:
+    return norm(message)
+
+
+def content_tokens(normalized: str) -> FrozenSet[str]:
+    from app.constants import STOPWORDS
+    from app.spell import COMMON_WORDS
+
+    return frozenset(
+        t for t in normalized.split()
+        if (len(t) >= MIN_CONTENT_TOKEN_LEN or t.isdigit()) and t not in STOPWORDS and t not in COMMON_WORDS
+    )
+
+
+def _embed(normalized: str) -> Optional[np.ndarray]:
+    try:
+        from app.embeddings import get_embeddings
+
+        emb = get_embeddings("router")
+        if emb is None:
+            return None
+        vec = np.asarray(emb.embed_query(normalized), dtype=np.float32)
+        n = float(np.linalg.norm(vec))
+        return vec / n if n > 0 else None
+    except Exception as e:
+        logger.info("router_cache embed_error=%s", str(e)[:120])
+        return None
+
+
+def _purge_expired(now: float) -> None:
+    expired = [k for k, e in _entries.items() if e.expires_at <= now]
+    for k in expired:
+        del _entries[k]
+    if expired:
+        _stats["expired"] += len(expired)
+
+
+def _semantic_lookup(msg: str, skey: str, now: float) -> Optional[Dict[str, Any]]:
+    content = content_tokens(msg)
+    with _lock:
+        pool = [
+            (k, e) for k, e in _entries.items()
+            if e.state_key == skey and e.content == content and e.vector is not None and e.expires_at > now
+        ]
+    if not pool:
+        return None
+    vec = _embed(msg)
+    if vec is None:
+        return None
+    sims = np.stack([e.vector for _, e in pool]) @ vec
+    best = int(np.argmax(sims))
+    if float(sims[best]) < settings.ROUTER_CACHE_SIM_THRESHOLD:
+        return None
+    key, entry = pool[best]
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+    logger.info("router_cache semantic_hit similarity=%.3f", float(sims[best]))
+    return dict(entry.route)
+
+
+def get(message: str, state_summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Rota em cache para (mensagem, state_summary) ou None."""
+    if not settings.ROUTER_CACHE_ENABLED or not message:
+        return None
+    msg, skey = message_key(message), state_key(state_summary)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get((msg, skey))
+        if entry is not None and entry.expires_at <= now:
+            del _entries[(msg, skey)]
+            _stats["expired"] += 1
+            entry = None
+        if entry is not None:
+            _entries.move_to_end((msg, skey))
+            _stats["hits_exact"] += 1
+            return dict(entry.route)
+
+    route = _semantic_lookup(msg, skey, now) if settings.ROUTER_CACHE_SEMANTIC else None
+    with _lock:
+        _stats["hits_semantic" if route is not None else "misses"] += 1
+    return route
+
+
+def put(message: str, state_summary: Dict[str, Any], route: Dict[str, Any]) -> None:
+    if not settings.ROUTER_CACHE_ENABLED or not message or not route:
+        return
+    msg, skey = message_key(message), state_key(state_summary)
+    vector = _embed(msg) if settings.ROUTER_CACHE_SEMANTIC else None
+    now = time.monotonic()
+    with _lock:
+        _entries[(msg, skey)] = _Entry(
+            route=dict(route),
+            state_key=skey,
+            content=content_tokens(msg),
+            expires_at=now + settings.ROUTER_CACHE_TTL_S,
+            vector=vector,
+        )
+        _entries.move_to_end((msg, skey))
+        if len(_entries) > settings.ROUTER_CACHE_MAX_ENTRIES:
+            _purge_expired(now)
+        while len(_entries) > settings.ROUTER_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _stats.clear()
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        hits = _stats["hits_exact"] + _stats["hits_semantic"]
+        lookups = hits + _stats["misses"]
+        return {
+            "entries": len(_entries),
+            "hits_exact": _stats["hits_exact"],
+            "hits_semantic": _stats["hits_semantic"],
+            "misses": _stats["misses"],
+            "evictions": _stats["evictions"],
+            "expired": _stats["expired"],
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -15,6 +15,14 @@ def _env_float(name: str, default: float, min_val: float = 0.0, max_val: float =
         return default
     return max(min_val, min(max_val, val))
 
+# Simple int loader with bounds and default
+def _env_int(name: str, default: int, min_val: int = 0, max_val: int = 1_000_000) -> int:
+    try:
+        val = int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+    return max(min_val, min(max_val, val))
+
 LLM_RENDERING_ENABLED = _env_bool("LLM_RENDERING_ENABLED", default=False)
 
 # Confidence thresholds for LLM decisions (defaults chosen to block low-confidence actions)
@@ -22,3 +30,102 @@ ROUTER_CONFIDENCE_THRESHOLD = _env_float("ROUTER_CONFIDENCE_THRESHOLD", default=
 PLANNER_CONFIDENCE_THRESHOLD = _env_float("PLANNER_CONFIDENCE_THRESHOLD", default=0.70)
 # Hard block: always clarify below this level
 LLM_HARD_BLOCK_THRESHOLD = _env_float("LLM_HARD_BLOCK_THRESHOLD", default=0.40)
+
+# Hot reload do FAQ tecnico (watchdog) e debounce entre eventos de escrita
+KNOWLEDGE_HOT_RELOAD = _env_bool("KNOWLEDGE_HOT_RELOAD", default=False)
+KNOWLEDGE_RELOAD_DEBOUNCE_S = _env_float("KNOWLEDGE_RELOAD_DEBOUNCE_S", default=1.0, min_val=0.0, max_val=30.0)
+
+# Build dos indices vetoriais: documentos por lote e threads do modelo de embeddings (0 = todos os cores)
+INDEX_BATCH_SIZE = _env_int("INDEX_BATCH_SIZE", default=256, min_val=1, max_val=10_000)
+EMBED_NUM_THREADS = _env_int("EMBED_NUM_THREADS", default=0, min_val=0, max_val=256)
+
+# Cache do catalogo vivo (preco/estoque sobrepostos aos hits do indice vetorial)
+CATALOG_CACHE_TTL_S = _env_float("CATALOG_CACHE_TTL_S", default=30.0, min_val=0.0, max_val=3600.0)
+
+# Lista de palavras do portugues (uma por linha; pacote wbrazilian do Debian/Ubuntu): palavra
+# real nunca e "corrigida" pelo app/spell.py. Arquivo ausente = so o vocabulario embutido.
+SPELL_LEXICON_PATH = os.getenv("SPELL_LEXICON_PATH", "/usr/share/dict/brazilian")
+
+# Backend de embeddings: "hf" (sentence-transformers) ou "hashing" (leve, sem download).
+# Com "hf", o hashing entra como modo degradado se o modelo nao carregar.
+EMBED_BACKEND = (os.getenv("EMBED_BACKEND", "hf") or "hf").strip().lower()
+EMBED_HASHING_FALLBACK = _env_bool("EMBED_HASHING_FALLBACK", default=True)
+HASHING_EMBED_DIM = _env_int("HASHING_EMBED_DIM", default=1024, min_val=64, max_val=16384)
+
+# Cache do LLM router: chave (mensagem normalizada, state_summary canonico), TTL e limite LRU.
+# A camada de quase-duplicatas (embeddings da mensagem) e opcional.
+ROUTER_CACHE_ENABLED = _env_bool("ROUTER_CACHE_ENABLED", default=True)
+ROUTER_CACHE_TTL_S = _env_float("ROUTER_CACHE_TTL_S", default=600.0, min_val=0.0, max_val=86400.0)
+ROUTER_CACHE_MAX_ENTRIES = _env_int("ROUTER_CACHE_MAX_ENTRIES", default=2048, min_val=1, max_val=1_000_000)
+ROUTER_CACHE_SEMANTIC = _env_bool("ROUTER_CACHE_SEMANTIC", default=False)
+ROUTER_CACHE_SIM_THRESHOLD = _env_float("ROUTER_CACHE_SIM_THRESHOLD", default=0.92, min_val=0.0, max_val=1.0)
+
+# Tabela pre-computada das sinteses tecnicas (python -m app.synthesis_table); fora dela, chama o LLM
+TECHNICAL_SYNTHESIS_TABLE_ENABLED = _env_bool("TECHNICAL_SYNTHESIS_TABLE_ENABLED", default=True)
+TECHNICAL_SYNTHESIS_TABLE_PATH = os.getenv(
+    "TECHNICAL_SYNTHESIS_TABLE_PATH", os.path.join("data", "technical_synthesis.json")
+)
+
+# Cliente LLM: prazo por chamada (inclui fila e hedge), requisicoes em voo e hedging pelo p95
+LLM_DEFAULT_DEADLINE_S = _env_float("LLM_DEFAULT_DEADLINE_S", default=8.0, min_val=0.1, max_val=120.0)
+LLM_ROUTER_DEADLINE_S = _env_float("LLM_ROUTER_DEADLINE_S", default=4.0, min_val=0.1, max_val=120.0)
+LLM_PLANNER_DEADLINE_S = _env_float("LLM_PLANNER_DEADLINE_S", default=5.0, min_val=0.1, max_val=120.0)
+# router + planner numa chamada (route_and_plan): resposta ate 2x maior que a do router
+LLM_ROUTE_PLAN_DEADLINE_S = _env_float("LLM_ROUTE_PLAN_DEADLINE_S", default=7.0, min_val=0.1, max_val=120.0)
+LLM_RENDER_DEADLINE_S = _env_float("LLM_RENDER_DEADLINE_S", default=4.0, min_val=0.1, max_val=120.0)
+LLM_CHOICE_DEADLINE_S = _env_float("LLM_CHOICE_DEADLINE_S", default=3.0, min_val=0.1, max_val=120.0)
+LLM_SYNTHESIS_DEADLINE_S = _env_float("LLM_SYNTHESIS_DEADLINE_S", default=8.0, min_val=0.1, max_val=120.0)
+LLM_MAX_IN_FLIGHT = _env_int("LLM_MAX_IN_FLIGHT", default=8, min_val=1, max_val=1024)
+LLM_HEDGE_ENABLED = _env_bool("LLM_HEDGE_ENABLED", default=False)
+LLM_HEDGE_MIN_SAMPLES = _env_int("LLM_HEDGE_MIN_SAMPLES", default=20, min_val=1, max_val=10_000)
+LLM_HEDGE_MIN_DELAY_S = _env_float("LLM_HEDGE_MIN_DELAY_S", default=0.3, min_val=0.0, max_val=60.0)
+
+# Telemetria das chamadas LLM (app/llm_telemetry.py): uma linha JSON por chamada, com rotacao
+LLM_TELEMETRY_LOG_ENABLED = _env_bool("LLM_TELEMETRY_LOG_ENABLED", default=True)
+LLM_TELEMETRY_LOG_PATH = os.getenv("LLM_TELEMETRY_LOG_PATH", os.path.join("data", "llm_calls.jsonl"))
+LLM_TELEMETRY_LOG_MAX_BYTES = _env_int("LLM_TELEMETRY_LOG_MAX_BYTES", default=10_000_000, min_val=10_000, max_val=10_000_000_000)
+LLM_TELEMETRY_LOG_BACKUPS = _env_int("LLM_TELEMETRY_LOG_BACKUPS", default=3, min_val=0, max_val=100)
+
+# Transporte do LLM (app/llm_transport.py): groq | record | replay | synthetic (carga offline reproduzivel)
+LLM_TRANSPORT = (os.getenv("LLM_TRANSPORT") or "groq").strip().lower()
+LLM_TRANSPORT_PATH = os.getenv("LLM_TRANSPORT_PATH", os.path.join("data", "llm_recording.jsonl"))
+LLM_TRANSPORT_SEED = _env_int("LLM_TRANSPORT_SEED", default=0, min_val=0, max_val=2**31 - 1)
+LLM_REPLAY_LATENCY = (os.getenv("LLM_REPLAY_LATENCY") or "recorded").strip().lower()  # recorded | synthetic | none
+LLM_REPLAY_ON_MISS = (os.getenv("LLM_REPLAY_ON_MISS") or "synthetic").strip().lower()  # synthetic | error
+# Latencia sintetica log-normal: mediana em ms (0 = sem espera) e sigma
+LLM_SYNTHETIC_LATENCY_MS = _env_float("LLM_SYNTHETIC_LATENCY_MS", default=0.0, min_val=0.0, max_val=60_000.0)
+LLM_SYNTHETIC_LATENCY_SIGMA = _env_float("LLM_SYNTHETIC_LATENCY_SIGMA", default=0.5, min_val=0.0, max_val=5.0)
+
+# Circuit breaker por componente LLM (app/llm_breaker.py): aberto, o fluxo segue sem chamar o LLM
+LLM_BREAKER_ENABLED = _env_bool("LLM_BREAKER_ENABLED", default=True)
+LLM_BREAKER_WINDOW_S = _env_float("LLM_BREAKER_WINDOW_S", default=60.0, min_val=1.0, max_val=3600.0)
+LLM_BREAKER_MIN_CALLS = _env_int("LLM_BREAKER_MIN_CALLS", default=10, min_val=1, max_val=10_000)
+LLM_BREAKER_ERROR_RATE = _env_float("LLM_BREAKER_ERROR_RATE", default=0.5, min_val=0.01, max_val=1.0)
+# p95 acima desta fracao do prazo do componente tambem abre o circuito
+LLM_BREAKER_P95_RATIO = _env_float("LLM_BREAKER_P95_RATIO", default=0.8, min_val=0.05, max_val=10.0)
+LLM_BREAKER_OPEN_S = _env_float("LLM_BREAKER_OPEN_S", default=30.0, min_val=0.0, max_val=3600.0)
+
+# Scheduler das chamadas LLM (app/llm_scheduler.py): limites da conta Groq por minuto;
+# com orcamento baixo, sintese e render sao descartados para sobrar para router/escolha
+LLM_SCHEDULER_ENABLED = _env_bool("LLM_SCHEDULER_ENABLED", default=True)
+LLM_RPM_LIMIT = _env_float("LLM_RPM_LIMIT", default=1000.0, min_val=1.0, max_val=1_000_000.0)
+LLM_TPM_LIMIT = _env_float("LLM_TPM_LIMIT", default=300_000.0, min_val=100.0, max_val=100_000_000.0)
+
+# Router e planner consultivo numa chamada so (route_and_plan) nos turnos consultivos (investigacao
+# pendente ou pergunta consultiva); os demais usam o router simples. False = duas chamadas em serie
+LLM_FUSED_ROUTER_PLANNER = _env_bool("LLM_FUSED_ROUTER_PLANNER", default=True)
+
+# Router + busca do hint especulativos no inicio do turno (app/speculation.py)
+ROUTER_SPECULATIVE_ENABLED = _env_bool("ROUTER_SPECULATIVE_ENABLED", default=False)
+ROUTER_SPECULATIVE_WORKERS = _env_int("ROUTER_SPECULATIVE_WORKERS", default=8, min_val=1, max_val=256)
+
+# Classificador local de intencao (python -m app.intent_classifier train): acima do limiar pula o LLM router
+INTENT_CLASSIFIER_ENABLED = _env_bool("INTENT_CLASSIFIER_ENABLED", default=True)
+INTENT_CLASSIFIER_PATH = os.getenv("INTENT_CLASSIFIER_PATH", os.path.join("data", "intent_classifier.json"))
+INTENT_CLASSIFIER_THRESHOLD = _env_float("INTENT_CLASSIFIER_THRESHOLD", default=0.85, min_val=0.0, max_val=1.0)
+# Decisoes confiaveis do LLM router viram exemplos de treino (mensagens de cliente: opt-in,
+# gravadas com PII mascarada e rotacao por tamanho)
+INTENT_DATASET_LOGGING = _env_bool("INTENT_DATASET_LOGGING", default=False)
+INTENT_DATASET_PATH = os.getenv("INTENT_DATASET_PATH", os.path.join("data", "intent_dataset.jsonl"))
+INTENT_DATASET_MAX_BYTES = _env_int("INTENT_DATASET_MAX_BYTES", default=20_000_000, min_val=10_000, max_val=10_000_000_000)
+INTENT_DATASET_BACKUPS = _env_int("INTENT_DATASET_BACKUPS", default=5, min_val=0, max_val=100)
@@ -0,0 +1,130 @@
+"""
+Execucao especulativa do router no `handle_message` (ROUTER_SPECULATIVE_ENABLED).
+
+Sem especulacao, o turno roteado paga em serie: fluxos deterministicos -> LLM router ->
+busca no catalogo. Com ela, no inicio do turno disparam em paralelo (pool proprio):
+- a decisao de rota para o estado do inicio do turno;
+- a busca no catalogo pelo `extract_product_hint(message)`.
+
+Quando o fluxo chega no router, so reaproveita a rota se o state_summary/known_context
+atual for igual ao usado na especulacao (os fluxos deterministicos podem ter mexido no
+estado); a busca so e reaproveitada se a query final tiver os mesmos termos de conteudo
+do hint. Se um fluxo deterministico responder antes, `cancel()` descarta tudo: tarefas
+ainda na fila nem comecam e as em andamento param no proximo passo (uma chamada LLM ja
+em voo termina, mas o resultado e ignorado).
+"""
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import settings
+from app.router_cache import content_tokens
+from app.text_utils import norm
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_stats: Counter = Counter()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ROUTER_SPECULATIVE_WORKERS,
+                thread_name_prefix="speculative",
+            )
+        return _executor
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+class SpeculativeTurn:
+    def __init__(self) -> None:
+        self.cancelled = threading.Event()
+        self._route: Optional[Future] = None
+        self._catalog: Optional[Future] = None
+        self._catalog_query: Optional[str] = None
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        def _guarded() -> Any:
+            if self.cancelled.is_set():
+                return None
+            return fn(*args)
+
+        return _get_executor().submit(_guarded)
+
+    def start_route(self, fn: Callable[[threading.Event], Optional[Tuple[Any, Any]]]) -> None:
+        """`fn(cancelled)` devolve (chave, resultado); a chave e comparada em `route_for`."""
+        self._route = self._submit(fn, self.cancelled)
+        _count("route_started")
+
+    def start_catalog(self, query: str, fn: Callable[[], List[Dict[str, Any]]]) -> None:
+        self._catalog_query = query
+        self._catalog = self._submit(fn)
+        _count("catalog_started")
+
+    @staticmethod
+    def _result(future: Optional[Future]) -> Any:
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except CancelledError:
+            return None
+        except Exception as e:
+            logger.info("speculative error=%s", str(e)[:200])
+            return None
+
+    def route_for(self, key: Any) -> Optional[Any]:
+        """Resultado especulado se a chave (estado) bater; None = decidir de novo."""
+        outcome = self._result(self._route)
+        if outcome is None:
+            return None
+        spec_key, result = outcome
+        if spec_key != key:
+            _count("route_stale")
+            logger.info("speculative route_stale")
+            return None
+        _count("route_used")
+        return result
+
+    def catalog_for(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Opcoes pre-buscadas se `query` tiver os mesmos termos de conteudo do hint."""
+        if self._catalog is None or not query:
+            return None
+        if content_tokens(norm(query)) != content_tokens(norm(self._catalog_query or "")):
+            _count("catalog_mismatch")
+            return None
+        options = self._result(self._catalog)
+        if options is None:
+            return None
+        _count("catalog_used")
+        return options
+
+    def cancel(self) -> None:
+        """Fim do turno: descarta o que ainda nao foi consumido."""
+        if self.cancelled.is_set():
+            return
+        self.cancelled.set()
+        for future in (self._route, self._catalog):
+            if future is not None and not future.done():
+                future.cancel()
+                _count("cancelled")
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,318 @@
+"""
+Correcao de erros de digitacao ("cimeto", "argamaça", "tijolu") no estilo SymSpell.
+
+O indice pre-computa a vizinhanca de delecoes (ate 2) de cada palavra do
+vocabulario: vocabulario de dominio + tokens do catalogo (via catalog_cache,
+quando o banco esta disponivel). Na consulta, gera as delecoes do token digitado
+e so compara (Damerau-Levenshtein) com os poucos candidatos que colidem, o que
+custa microssegundos por token.
+
+Palavras reais nao sao corrigidas: alem do vocabulario (COMMON_WORDS, KNOWN_WORDS), o
+indice conhece a lista de palavras do portugues em SPELL_LEXICON_PATH, se instalada.
+Tokens curtos (< SHORT_TOKEN_LEN) so sao corrigidos se nao estiverem no lexico e o
+candidato vencer com folga (unico na distancia ou SHORT_MARGIN x mais frequente):
+"forro", "liso", "fino" e "seco" sao palavras, nao erros de "ferro", "piso", "fio", "saco".
+
+Entrada esperada: texto ja normalizado por `text_utils.norm` (minusculo, sem acento).
+As correcoes aplicadas sao logadas e contadas (`correction_stats`) para ajuste do vocabulario.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+MIN_TOKEN_LEN = 4
+# Tokens curtos so aceitam 1 edicao; 2 edicoes so a partir deste tamanho
+TWO_EDITS_MIN_LEN = 8
+# Abaixo deste tamanho, um erro de 1 letra costuma ser outra palavra real: exige folga
+SHORT_TOKEN_LEN = 6
+SHORT_MARGIN = 2.0
+# Reconstroi o indice periodicamente para pegar produtos novos do catalogo
+INDEX_TTL_S = 600.0
+CATALOG_RETRY_S = 60.0
+MEMO_SIZE = 20_000
+
+# Vocabulario do dominio (materiais de construcao), alem do BASE_PRODUCT_WORDS
+DOMAIN_VOCAB = {
+    "cimento", "argamassa", "areia", "brita", "pedrisco", "tijolo", "tijolos", "bloco", "blocos",
+    "concreto", "reboco", "contrapiso", "chapisco", "alvenaria", "laje", "piso", "parede",
+    "porcelanato", "ceramica", "azulejo", "rejunte", "cal", "hidratada", "impermeabilizante",
+    "manta", "asfaltica", "vergalhao", "ferro", "arame", "recozido", "prego", "pregos",
+    "parafuso", "parafusos", "tela", "soldada", "tinta", "tintas", "acrilica", "esmalte",
+    "latex", "fosca", "semibrilho", "selador", "massa", "corrida", "verniz", "lixa",
+    "rolo", "trincha", "pincel", "tubo", "tubos", "cano", "canos", "joelho", "luva",
+    "registro", "conexao", "conexoes", "esgoto", "soldavel", "caixa", "agua", "fio", "fios",
+    "cabo", "cabos", "disjuntor", "tomada", "interruptor", "lampada", "colher", "pedreiro",
+    "desempenadeira", "martelo", "serrote", "trena", "nivel", "prumo", "carrinho", "pa",
+    "enxada", "balde", "telha", "telhas", "madeira", "fundacao", "baldrame", "sapata",
+    "viga", "pilar", "externa", "interna", "externo", "interno", "banheiro", "cozinha",
+    "fachada", "piscina", "estrutural", "branco", "branca", "cinza", "preto",
+    "forro", "pvc", "pino", "pinos", "bucha", "buchas", "broca", "brocas", "fita", "cola",
+    "lona", "grade", "porta", "janela", "portao", "calha", "rufo", "gesso", "drywall",
+}
+
+# Palavras comuns de conversa: sao "conhecidas" e nunca viram produto por engano
+COMMON_WORDS = {
+    "para", "pra", "com", "sem", "quero", "queria", "preciso", "precisando", "gostaria",
+    "comprar", "pedido", "pedir", "quanto", "custa", "preco", "valor", "tem", "voces",
+    "vende", "vendem", "obrigado", "obrigada", "entrega", "retirada", "cartao", "dinheiro",
+    "bairro", "endereco", "orcamento", "finalizar", "fechar", "concluir", "confirmar",
+    "saco", "sacos", "metro", "metros", "quilo", "quilos", "litro", "litros", "unidade",
+    "unidades", "galao", "lata", "qual", "quais", "melhor", "serve", "usar", "como",
+    "onde", "quando", "porque", "sera", "isso", "esse", "essa", "este", "esta", "mais",
+    "menos", "muito", "pouco", "outro", "outra", "tambem", "certo", "beleza", "bom",
+    "boa", "dia", "tarde", "noite", "tudo", "bem", "obra", "casa", "mesa", "nome",
+    "aqui", "agora", "hoje", "amanha", "depois", "antes", "sim", "nao", "ok",
+}
+
+# Adjetivos e verbos comuns: palavras reais (nunca corrigidas), mas que descrevem o pedido,
+# entao ficam fora de COMMON_WORDS (o router_cache as trata como conteudo: fina != grossa)
+KNOWN_WORDS = {
+    # adjetivos comuns na descricao do material/obra
+    "liso", "lisa", "lisos", "lisas", "fino", "fina", "finos", "finas", "grosso", "grossa",
+    "seco", "seca", "secos", "secas", "molhado", "molhada", "umido", "umida", "forte",
+    "fraco", "fraca", "novo", "nova", "novos", "novas", "velho", "velha", "grande", "grandes",
+    "pequeno", "pequena", "medio", "media", "largo", "larga", "curto", "curta", "longo",
+    "longa", "alto", "alta", "baixo", "baixa", "leve", "pesado", "pesada", "claro", "clara",
+    "escuro", "escura", "barato", "barata", "caro", "cara", "duro", "dura", "mole", "quente",
+    "frio", "fria", "limpo", "limpa", "sujo", "suja", "pronto", "pronta", "inteiro", "inteira",
+    "redondo", "redonda", "quadrado", "quadrada", "reto", "reta", "rapido", "rapida",
+    # verbos comuns
+    "pinta", "pintar", "pintei", "pintando", "lixar", "lixando", "cortar", "corta", "furar",
+    "fura", "colar", "fixar", "fixa", "pregar", "prega", "vedar", "veda", "secar", "molhar",
+    "passar", "passa", "fazer", "faz", "fiz", "ter", "tenho", "temos", "tinha", "ser", "sao",
+    "estar", "vai", "vou", "ver", "veja", "olha", "pode", "posso", "quer", "precisa", "levar",
+    "leva", "trazer", "traz", "mandar", "entregar", "usa", "uso", "servir", "aplicar",
+    "aplica", "cobrir", "cobre", "abrir", "abre", "montar", "monta", "instalar", "instala",
+    "trocar", "troca", "reformar", "reforma", "construir", "misturar", "mistura", "achar",
+    "acha", "sei", "saber", "gosto", "gostar", "dar", "dou", "falta", "faltar", "ficar",
+    "fica", "sobrar", "medir", "mede", "pesar", "pesa", "comprei", "compra", "pagar", "paga",
+    "pago", "vem", "vir", "chega", "chegar",
+}
+
+_lock = threading.Lock()
+_index: Optional["SymSpellIndex"] = None
+_built_at: float = 0.0
+_catalog_failed_at: float = 0.0
+_stats: Counter = Counter()
+_lexicon_cache: Dict[str, FrozenSet[str]] = {}
+
+
+def _osa_distance(a: str, b: str, max_d: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment) com corte em `max_d` (retorna max_d+1)."""
+    if a == b:
+        return 0
+    la, lb = len(a), len(b)
+    if abs(la - lb) > max_d:
+        return max_d + 1
+    prev2: List[int] = []
+    prev = list(range(lb + 1))
+    for i in range(1, la + 1):
+        cur = [i] + [0] * lb
+        row_min = cur[0]
+        for j in range(1, lb + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > max_d:
+            return max_d + 1
+        prev2, prev = prev, cur
+    return prev[lb]
+
+
+class SymSpellIndex:
+    def __init__(self, max_distance: int = MAX_EDIT_DISTANCE, prefix_length: int = PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words: Dict[str, int] = {}
+        # palavras reais que nao sao alvo de correcao, mas tambem nunca sao corrigidas
+        self.lexicon: FrozenSet[str] = frozenset()
+        self._deletes: Dict[str, Set[str]] = {}
+        # memo de consultas: mensagens repetem muito os mesmos tokens
+        self._memo: Dict[Tuple[str, int], Optional[Tuple[str, int]]] = {}
+
+    def _delete_variants(self, word: str) -> Set[str]:
+        key = word[: self.prefix_length]
+        out = {key}
+        frontier = {key}
+        for _ in range(self.max_distance):
+            nxt: Set[str] = set()
+            for w in frontier:
+                if len(w) <= 1:
+                    continue
+                for i in range(len(w)):
+                    nxt.add(w[:i] + w[i + 1:])
+            out |= nxt
+            frontier = nxt
+        return out
+
+    def add(self, word: str, count: int = 1) -> None:
+        if not word:
+            return
+        is_new = word not in self.words
+        self.words[word] = self.words.get(word, 0) + count
+        if is_new:
+            for d in self._delete_variants(word):
+                self._deletes.setdefault(d, set()).add(word)
+            self._memo.clear()
+
+    def is_known(self, token: str) -> bool:
+        return token in self.words or token in self.lexicon
+
+    def lookup(self, token: str, max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """Melhor palavra do vocabulario para `token`: (palavra, distancia) ou None."""
+        hit = self._lookup(token, max_distance)
+        return hit[:2] if hit is not None else None
+
+    def _lookup(self, token: str, max_distance: Optional[int] = None) -> Optional[Tuple[str, int, float]]:
+        """(palavra, distancia, folga): folga = frequencia do melhor / do segundo na mesma distancia."""
+        if self.is_known(token):
+            return token, 0, float("inf")
+        max_d = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        key = (token, max_d)
+        if key in self._memo:
+            return self._memo[key]
+
+        candidates: Set[str] = set()
+        for d in self._delete_variants(token):
+            candidates |= self._deletes.get(d, set())
+
+        ranked: List[Tuple[int, int, str]] = []
+        for cand in candidates:
+            dist = _osa_distance(token, cand, max_d)
+            if dist <= max_d:
+                ranked.append((dist, -self.words.get(cand, 0), cand))
+        ranked.sort()
+
+        best: Optional[Tuple[str, int, float]] = None
+        if ranked:
+            dist, neg_count, cand = ranked[0]
+            runner_up = next((-c for d, c, _ in ranked[1:] if d == dist), 0)
+            best = (cand, dist, (-neg_count / runner_up) if runner_up else float("inf"))
+
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = best
+        return best
+
+
+def _catalog_tokens() -> Counter:
+    """Tokens (normalizados) dos nomes de produto do catalogo; vazio se o banco estiver fora."""
+    global _catalog_failed_at
+    if _catalog_failed_at and time.monotonic() - _catalog_failed_at < CATALOG_RETRY_S:
+        return Counter()
+    try:
+        from app import catalog_cache
+        from app.text_utils import norm
+
+        counts: Counter = Counter()
+        for row in catalog_cache.snapshot().values():
+            for tok in norm(row.get("nome") or "").split():
+                if tok.isalpha() and len(tok) >= MIN_TOKEN_LEN:
+                    counts[tok] += 1
+        return counts
+    except Exception as e:
+        _catalog_failed_at = time.monotonic()
+        logger.info("spell_index_catalog_unavailable error=%s", str(e)[:120])
+        return Counter()
+
+
+def load_lexicon(path: Optional[str] = None) -> FrozenSet[str]:
+    """Lista de palavras (uma por linha; o que vier depois de "/" e ignorado, como no .dic do hunspell)."""
+    from app import settings
+    from app.text_utils import norm
+
+    path = settings.SPELL_LEXICON_PATH if path is None else path
+    if path in _lexicon_cache:
+        return _lexicon_cache[path]
+    words: Set[str] = set()
+    try:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                w = norm(line.split("/", 1)[0].strip())
+                if w.isalpha():
+                    words.add(w)
+    except OSError as e:
+        logger.info("spell_lexicon_unavailable path=%s error=%s", path, str(e)[:120])
+    _lexicon_cache[path] = frozenset(words)
+    return _lexicon_cache[path]
+
+
+def build_index(
+    extra_words: Optional[Iterable[str]] = None,
+    include_catalog: bool = True,
+    lexicon: Optional[Iterable[str]] = None,
+) -> SymSpellIndex:
+    """`lexicon`: palavras reais que nunca sao corrigidas (padrao: arquivo SPELL_LEXICON_PATH)."""
+    from app.constants import STOPWORDS
+    from app.text_utils import BASE_PRODUCT_WORDS
+
+    idx = SymSpellIndex()
+    idx.lexicon = frozenset(lexicon) if lexicon is not None else load_lexicon()
+    # palavras do dominio pesam mais que tokens do catalogo no desempate
+    for w in DOMAIN_VOCAB | set(BASE_PRODUCT_WORDS):
+        idx.add(w, 100)
+    for w in COMMON_WORDS | KNOWN_WORDS | set(STOPWORDS):
+        idx.add(w, 50)
+    for w in extra_words or []:
+        idx.add(w, 10)
+    if include_catalog:
+        for w, c in _catalog_tokens().items():
+            idx.add(w, c)
+    return idx
+
+
+def get_index() -> SymSpellIndex:
+    global _index, _built_at
+    now = time.monotonic()
+    if _index is not None and now - _built_at < INDEX_TTL_S:
+        return _index
+    with _lock:
+        if _index is None or now - _built_at >= INDEX_TTL_S:
+            _index = build_index()
+            _built_at = now
+        return _index
+
+
+def set_index(index: Optional[SymSpellIndex]) -> None:
+    """Troca o indice em uso (None forca rebuild na proxima consulta)."""
+    global _index, _built_at
+    with _lock:
+        _index = index
+        _built_at = time.monotonic() if index is not None else 0.0
+
+
+def correct_token(token: str, index: Optional[SymSpellIndex] = None) -> str:
+    if len(token) < MIN_TOKEN_LEN or not token.isalpha():
+        return token
+    idx = index or get_index()
+    max_d = 2 if len(token) >= TWO_EDITS_MIN_LEN else 1
+    hit = idx._lookup(token, max_distance=max_d)
+    if hit is None or hit[1] == 0:
+        return token
+    if len(token) < SHORT_TOKEN_LEN and hit[2] < SHORT_MARGIN:
+        return token
+    _stats[(token, hit[0])] += 1
+    logger.info("spell_correction token=%s corrected=%s distance=%d", token, hit[0], hit[1])
+    return hit[0]
+
+
+def correct_text(text: str, index: Optional[SymSpellIndex] = None) -> str:
+    """Corrige token a token um texto ja normalizado (`norm`)."""
+    if not text:
+        return text
+    idx = index or get_index()
+    return " ".join(correct_token(tok, idx) for tok in text.split())
+
+
+def correction_stats(top: int = 50) -> List[Dict[str, object]]:
+    """Correcoes mais frequentes desde o start (para ajustar o vocabulario)."""
+    return [{"token": t, "corrected": c, "count": n} for (t, c), n in _stats.most_common(top)]
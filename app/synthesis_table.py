@@ -0,0 +1,315 @@
+"""
+Tabela pre-computada das sinteses tecnicas (`llm_service.generate_technical_synthesis`).
+
+O contexto consultivo vem de enums pequenos: produto x aplicacao (GENERIC_PRODUCTS /
+TECHNICAL_RULES) x respostas da investigacao (INVESTIGATION_FLOWS). O job offline
+enumera as combinacoes validas, gera a sintese com o LLM, valida e grava num JSON
+versionado; no caminho ao vivo a sintese vira um lookup em dicionario e o LLM so e
+chamado para combinacoes fora da tabela.
+
+Versionamento: cada entrada guarda o hash do prompt que a gerou (prompt, fatores
+tecnicos e modelo). Se qualquer um mudar, a entrada deixa de casar e o job a regenera.
+
+Uso:
+    python -m app.synthesis_table              # gera so o que falta ou ficou velho
+    python -m app.synthesis_table --full       # regenera tudo
+    python -m app.synthesis_table --dry-run    # lista as combinacoes
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app import settings
+from app.text_utils import norm
+
+TABLE_FORMAT_VERSION = 1
+MIN_SYNTHESIS_LEN = 40
+MAX_SYNTHESIS_LEN = 600
+
+# Campos que entram no prompt da sintese, na ordem do prompt
+PROMPT_FIELDS = ("application", "environment", "exposure", "load_type", "surface", "grain", "size")
+
+# Opcoes da investigacao -> valor canonico (genero/sinonimos da mesma resposta)
+CANONICAL_VALUES: Dict[str, Dict[str, str]] = {
+    "environment": {"interna": "interna", "interno": "interna", "externa": "externa", "externo": "externa"},
+    "exposure": {"coberto": "coberto", "coberta": "coberto", "exposto": "exposto", "exposta": "exposto"},
+    "load_type": {
+        "residencial": "residencial",
+        "carga pesada": "pesado",
+        "pesado": "pesado",
+        "comercial": "pesado",
+        "garagem": "pesado",
+    },
+    "surface": {"parede": "parede", "madeira": "madeira", "metal": "metal", "ferro": "metal"},
+    "grain": {"fino": "fino", "fina": "fino", "medio": "medio", "media": "medio", "grosso": "grosso", "grossa": "grosso"},
+    "size": {"1": "1", "2": "2", "3": "3", "4": "4", "pequena": "1", "media": "2", "grande": "3"},
+}
+
+_lock = threading.Lock()
+_table: Dict[str, Dict[str, Any]] = {}
+_loaded_mtime: Optional[float] = None
+
+
+def table_path() -> str:
+    return settings.TECHNICAL_SYNTHESIS_TABLE_PATH
+
+
+def _product_key(product: str) -> Optional[str]:
+    from app.flows.consultive_investigation import INVESTIGATION_FLOWS
+
+    p = norm(product)
+    for key in INVESTIGATION_FLOWS:
+        if key in p:
+            return key
+    return None
+
+
+def _applications(product: str) -> List[str]:
+    from app.flows.technical_recommendations import TECHNICAL_RULES
+    from app.flows.usage_context import GENERIC_PRODUCTS
+
+    apps = list(GENERIC_PRODUCTS.get(product, {}).get("contexts", {}))
+    for rule_key in TECHNICAL_RULES.get(product, {}):
+        if len(rule_key) == 4 and rule_key[0] and rule_key[0] not in apps:
+            apps.append(rule_key[0])
+    return apps
+
+
+def canonical_context(product: str, context: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    (produto, contexto canonico) para o lookup, ou None se algum valor estiver fora
+    dos enums conhecidos (ai a sintese vai para o LLM com o texto original).
+    """
+    key = _product_key(product)
+    if key is None:
+        return None
+    out: Dict[str, str] = {}
+    for field in PROMPT_FIELDS:
+        value = context.get(field)
+        if not value:
+            continue
+        v = norm(str(value))
+        if field == "application":
+            if v not in _applications(key):
+                return None
+            out[field] = v
+            continue
+        canonical = CANONICAL_VALUES.get(field, {}).get(v)
+        if canonical is None:
+            return None
+        out[field] = canonical
+    return key, out
+
+
+def entry_key(product: str, context: Dict[str, str]) -> str:
+    return "|".join([product] + [f"{f}={context[f]}" for f in PROMPT_FIELDS if context.get(f)])
+
+
+def prompt_hash(product: str, context: Dict[str, str], factors: Sequence[str]) -> str:
+    from app.llm_service import SYNTHESIS_MODEL, build_synthesis_prompt
+
+    prompt = build_synthesis_prompt(product, context, list(factors))
+    return hashlib.sha1(f"{SYNTHESIS_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def iter_contexts() -> Iterator[Tuple[str, Dict[str, str]]]:
+    """Combinacoes validas: aplicacao x respostas de cada passo da investigacao (respeitando skip_if)."""
+    from app.flows.consultive_investigation import INVESTIGATION_FLOWS
+
+    for product, flow in INVESTIGATION_FLOWS.items():
+        steps = []
+        for step in flow:
+            field = step["field"].replace("consultive_", "", 1)
+            if field not in PROMPT_FIELDS:
+                continue  # nao muda o prompt (ex.: argamassa_type)
+            values = sorted({CANONICAL_VALUES[field][norm(o)] for o in step["options"]})
+            steps.append((step, field, values))
+
+        for application in _applications(product):
+            for combo in itertools.product(*[values for _, _, values in steps]):
+                ctx: Dict[str, str] = {"application": application}
+                state: Dict[str, Any] = {}
+                for (step, field, _), value in zip(steps, combo):
+                    skip_if = step.get("skip_if")
+                    if skip_if and skip_if(state):
+                        continue
+                    ctx[field] = value
+                    state[step["field"]] = value
+                # "parede interna" com ambiente externa: combinacao que a conversa nao produz
+                if _contradiction(application, ctx) is None:
+                    yield product, ctx
+
+
+def _unique_contexts() -> List[Tuple[str, Dict[str, str]]]:
+    seen, out = set(), []
+    for product, ctx in iter_contexts():
+        k = entry_key(product, ctx)
+        if k not in seen:
+            seen.add(k)
+            out.append((product, ctx))
+    return out
+
+
+def _contradiction(normalized: str, context: Dict[str, str]) -> Optional[str]:
+    """Campo cujo valor o texto contradiz (ex.: cita "externa" numa laje interna), ou None."""
+    padded = f" {normalized} "
+    for field in ("environment", "exposure"):
+        value = context.get(field)
+        if not value:
+            continue
+        others = set(CANONICAL_VALUES[field].values()) - {value}
+        if any(f" {o} " in padded for o in others):
+            return field
+    return None
+
+
+def validate_synthesis(text: str, context: Dict[str, str]) -> Optional[str]:
+    """Motivo da rejeicao, ou None se a sintese pode ir para a tabela."""
+    t = norm(text or "")
+    if len(text or "") < MIN_SYNTHESIS_LEN:
+        return "curta demais"
+    if len(text) > MAX_SYNTHESIS_LEN:
+        return "longa demais"
+    app = context.get("application")
+    if app and app not in t:
+        return f"nao menciona a aplicacao '{app}'"
+    field = _contradiction(t, context)
+    if field:
+        return f"contradiz {field}={context[field]}"
+    return None
+
+
+def _read_table(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    if not isinstance(data, dict) or data.get("format_version") != TABLE_FORMAT_VERSION:
+        return {}
+    entries = data.get("entries")
+    return entries if isinstance(entries, dict) else {}
+
+
+def _write_table(path: str, entries: Dict[str, Dict[str, Any]]) -> None:
+    """Grava de forma atomica (tmp + os.replace): o caminho ao vivo nunca le arquivo pela metade."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {"format_version": TABLE_FORMAT_VERSION, "generated_at": time.time(), "entries": entries},
+            f,
+            ensure_ascii=False,
+            indent=2,
+            sort_keys=True,
+        )
+    os.replace(tmp, path)
+
+
+def _current_table() -> Dict[str, Dict[str, Any]]:
+    """Tabela em memoria; recarrega se o arquivo mudou (job rodou com o servidor no ar)."""
+    global _table, _loaded_mtime
+    path = table_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    if mtime != _loaded_mtime:
+        with _lock:
+            if mtime != _loaded_mtime:
+                _table = _read_table(path) if mtime is not None else {}
+                _loaded_mtime = mtime
+    return _table
+
+
+def reset() -> None:
+    global _table, _loaded_mtime
+    with _lock:
+        _table, _loaded_mtime = {}, None
+
+
+def lookup(product: str, context: Dict[str, Any], factors: Sequence[str]) -> Optional[str]:
+    """Sintese pre-computada para o contexto, ou None (fora da tabela ou entrada velha)."""
+    if not settings.TECHNICAL_SYNTHESIS_TABLE_ENABLED:
+        return None
+    table = _current_table()
+    if not table:
+        return None
+    canonical = canonical_context(product, context)
+    if canonical is None:
+        return None
+    key, ctx = canonical
+    entry = table.get(entry_key(key, ctx))
+    if not entry or entry.get("prompt_hash") != prompt_hash(key, ctx, factors):
+        return None
+    return entry.get("synthesis") or None
+
+
+def build_table(full: bool = False, path: Optional[str] = None) -> Dict[str, int]:
+    """Gera (ou completa) a tabela. Sinteses reprovadas na validacao nao entram."""
+    from app.llm_service import extract_product_factors, llm_technical_synthesis
+
+    path = path or table_path()
+    old = {} if full else _read_table(path)
+    entries: Dict[str, Dict[str, Any]] = {}
+    stats = {"combinations": 0, "kept": 0, "generated": 0, "rejected": 0, "failed": 0}
+
+    for product, ctx in _unique_contexts():
+        stats["combinations"] += 1
+        key = entry_key(product, ctx)
+        factors = extract_product_factors(product)
+        phash = prompt_hash(product, ctx, factors)
+        if old.get(key, {}).get("prompt_hash") == phash:
+            entries[key] = old[key]
+            stats["kept"] += 1
+            continue
+        try:
+            text = llm_technical_synthesis(product, ctx, factors)
+        except Exception as e:
+            print(f"[synthesis] {key}: falhou: {e}")
+            stats["failed"] += 1
+            continue
+        reason = validate_synthesis(text, ctx)
+        if reason:
+            print(f"[synthesis] {key}: rejeitada ({reason})")
+            stats["rejected"] += 1
+            continue
+        entries[key] = {"synthesis": text, "prompt_hash": phash, "context": ctx, "generated_at": time.time()}
+        stats["generated"] += 1
+
+    _write_table(path, entries)
+    print(
+        f"[synthesis] {stats['combinations']} combinacoes: {stats['kept']} mantidas, {stats['generated']} geradas, "
+        f"{stats['rejected']} rejeitadas, {stats['failed']} com erro -> {path}"
+    )
+    return stats
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gera a tabela pre-computada de sinteses tecnicas.")
+    parser.add_argument("--full", action="store_true", help="regenera todas as entradas")
+    parser.add_argument("--dry-run", action="store_true", help="so lista as combinacoes")
+    parser.add_argument("--out", default=None, help=f"padrao: {table_path()}")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        contexts = _unique_contexts()
+        for product, ctx in contexts:
+            print(entry_key(product, ctx))
+        print(f"{len(contexts)} combinacoes")
+        return 0
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    stats = build_table(full=args.full, path=args.out)
+    return 0 if not stats["failed"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
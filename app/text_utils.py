@@ -11,6 +11,7 @@ from app.constants import (
 )
 
 from app.guardrails import apply_guardrails, SAFE_NOTE
+from app import spell
 
 
 # Heurística simples para detectar quando a mensagem "parece um pedido" mesmo sem "quero".
@@ -196,8 +197,9 @@ def is_consultive_question(message: str) -> bool:
 
     if has_consultive_pattern or has_question_marker:
         # Confirma que tem alguma palavra relacionada a produto/construção
+        tc = spell.correct_text(t)  # "cimeto" -> "cimento"
         has_product_context = (
-            any(re.search(rf"\b{re.escape(w)}\b", t) for w in BASE_PRODUCT_WORDS) or
+            any(re.search(rf"\b{re.escape(w)}\b", tc) for w in BASE_PRODUCT_WORDS) or
             any(w in t for w in ["laje", "parede", "piso", "teto", "banheiro", "cozinha", "area externa", "obra"])
         )
 
@@ -244,8 +246,9 @@ def has_product_intent(message: str) -> bool:
     if QTY_UNITS_REGEX.search(t):
         return True
 
-    # Contém palavra-base de produto
-    if any(re.search(rf"\b{re.escape(w)}\b", t) for w in BASE_PRODUCT_WORDS):
+    # Contém palavra-base de produto (tolerando erro de digitação: "tijolu", "argamaça")
+    tc = spell.correct_text(t)
+    if any(re.search(rf"\b{re.escape(w)}\b", tc) for w in BASE_PRODUCT_WORDS):
         return True
 
     return False
@@ -0,0 +1,171 @@
+"""
+Teste de carga do pipeline completo (`handle_message`) sem chamar o Groq.
+
+O LLM sai do transporte offline (app/llm_transport.py): `synthetic` gera rotas/planos
+validos por regras; `replay` serve uma gravacao feita com LLM_TRANSPORT=record (com a
+latencia gravada, sintetica ou nenhuma). Roda as conversas de benchmarks/data/conversations.json
+em N sessoes concorrentes e emite JSON com latencia por turno (p50/p95/p99), vazao,
+erros e a telemetria das chamadas LLM por componente.
+
+O estado de sessao usa JSONB: aponte --db-url para um Postgres DE TESTE (o catalogo de
+benchmarks/data/catalog.json e semeado nele).
+
+Uso:
+    python -m benchmarks.conversation_load --db-url postgresql://... --sessions 200 --concurrency 16
+    python -m benchmarks.conversation_load --db-url postgresql://... --transport replay \\
+        --recording data/llm_recording.jsonl --replay-latency recorded
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.engine import make_url
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from database import SessionLocal, Base  # noqa: E402
+from app import catalog_cache, llm_service, llm_telemetry, settings  # noqa: E402
+from benchmarks.retrieval import CATALOG_PATH, DATA_DIR, _make_engine, percentile, seed_catalog  # noqa: E402
+
+CONVERSATIONS_PATH = os.path.join(DATA_DIR, "conversations.json")
+
+
+def _run_session(session_id: str, turns: Sequence[str]) -> List[Dict[str, Any]]:
+    from app.flow_controller import handle_message
+
+    out = []
+    for message in turns:
+        started = time.perf_counter()
+        error = None
+        try:
+            handle_message(message=message, session_id=session_id)
+        except Exception as e:  # o teste de carga registra e segue
+            error = f"{type(e).__name__}: {str(e)[:120]}"
+        out.append({"latency_s": time.perf_counter() - started, "error": error})
+    return out
+
+
+def run_load(
+    db_url: str,
+    transport: str = "synthetic",
+    recording: Optional[str] = None,
+    replay_latency: Optional[str] = None,
+    sessions: int = 50,
+    concurrency: int = 8,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    if make_url(db_url).get_backend_name() != "postgresql":
+        raise ValueError("o estado de sessao usa JSONB: use --db-url de um Postgres de teste")
+    if transport not in ("synthetic", "replay"):
+        raise ValueError("transporte offline: synthetic ou replay")
+
+    with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    with open(CONVERSATIONS_PATH, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+
+    overrides = {"LLM_TRANSPORT": transport, "LLM_TRANSPORT_SEED": seed}
+    if recording:
+        overrides["LLM_TRANSPORT_PATH"] = recording
+    if replay_latency:
+        overrides["LLM_REPLAY_LATENCY"] = replay_latency
+    originals = {name: getattr(settings, name) for name in overrides}
+    original_bind = SessionLocal.kw.get("bind")
+
+    engine = _make_engine(db_url)
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    llm_service._groq_client = None
+    llm_telemetry.reset()
+    SessionLocal.configure(bind=engine)
+    catalog_cache.invalidate()
+    try:
+        Base.metadata.create_all(bind=engine)
+        seeded = seed_catalog(engine, catalog)
+
+        run_id = time.strftime("%Y%m%d%H%M%S")
+        jobs = [(f"load-{run_id}-{i}", conversations[i % len(conversations)]) for i in range(sessions)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda job: _run_session(*job), jobs))
+        elapsed = time.perf_counter() - started
+
+        turns = [t for session in results for t in session]
+        latencies = [t["latency_s"] for t in turns]
+        errors = [t["error"] for t in turns if t["error"]]
+        client = llm_service._groq_client
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {
+                "transport": transport,
+                "recording": settings.LLM_TRANSPORT_PATH if transport == "replay" else None,
+                "replay_latency": settings.LLM_REPLAY_LATENCY if transport == "replay" else None,
+                "synthetic_latency_ms": settings.LLM_SYNTHETIC_LATENCY_MS,
+                "sessions": sessions,
+                "concurrency": concurrency,
+                "seed": seed,
+                "db": make_url(str(engine.url)).render_as_string(hide_password=True),
+                "products": seeded,
+            },
+            "turns": len(turns),
+            "turns_per_s": round(len(turns) / elapsed, 2) if elapsed else None,
+            "latency_ms": {
+                "p50": round((percentile(latencies, 50) or 0.0) * 1000, 2),
+                "p95": round((percentile(latencies, 95) or 0.0) * 1000, 2),
+                "p99": round((percentile(latencies, 99) or 0.0) * 1000, 2),
+            },
+            "errors": len(errors),
+            "error_samples": sorted(set(errors))[:5],
+            "replay": {"hits": client.hits, "misses": client.misses} if hasattr(client, "hits") else None,
+            "llm": llm_telemetry.snapshot(),
+        }
+    finally:
+        for name, value in originals.items():
+            setattr(settings, name, value)
+        llm_service._groq_client = None
+        SessionLocal.configure(bind=original_bind)
+        catalog_cache.invalidate()
+        engine.dispose()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga offline do handle_message (LLM sintetico ou replay).")
+    parser.add_argument("--db-url", required=True, help="Postgres DE TESTE")
+    parser.add_argument("--transport", choices=["synthetic", "replay"], default="synthetic")
+    parser.add_argument("--recording", default=None, help=f"gravacao para replay (padrao: {settings.LLM_TRANSPORT_PATH})")
+    parser.add_argument("--replay-latency", choices=["recorded", "synthetic", "none"], default=None)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="arquivo JSON de saida (padrao: stdout)")
+    args = parser.parse_args(argv)
+
+    # logs da aplicacao (print) vao para stderr; stdout fica so com o JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_load(
+            db_url=args.db_url,
+            transport=args.transport,
+            recording=args.recording,
+            replay_latency=args.replay_latency,
+            sessions=args.sessions,
+            concurrency=args.concurrency,
+            seed=args.seed,
+        )
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+"""
+Benchmark de qualidade e latencia da busca de produtos.
+
+Semeia um catalogo de teste (benchmarks/data/catalog.json) num banco local
+(SQLite em memoria por padrao, ou --db-url apontando para um Postgres DE TESTE),
+roda o conjunto rotulado de consultas PT-BR (benchmarks/data/queries.json) contra
+cada estrategia de busca e emite JSON com recall@k, MRR, latencia p50/p95 e
+numero de queries SQL por estrategia, para comparar execucoes.
+
+Uso:
+    python -m benchmarks.retrieval --embedder hashing --k 5 --out bench.json
+    python -m benchmarks.retrieval --embedder real --strategies semantic,db_find_best_products
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import StaticPool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from database import SessionLocal, Produto, CategoriaProduto, ProdutoAtributo, Base  # noqa: E402
+from app import catalog_cache, index_status, rag_products  # noqa: E402
+from app import product_search  # noqa: E402
+from app.embeddings import EMBED_MODEL_NAME, HashingEmbeddings  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CATALOG_PATH = os.path.join(DATA_DIR, "catalog.json")
+QUERIES_PATH = os.path.join(DATA_DIR, "queries.json")
+
+
+# ============================
+# Metricas
+# ============================
+
+def recall_at_k(result_ids: Sequence[Any], expected: Sequence[Any], k: int) -> float:
+    if not expected:
+        return 0.0
+    top = set(result_ids[:k])
+    return sum(1 for e in expected if e in top) / len(expected)
+
+
+def reciprocal_rank(result_ids: Sequence[Any], expected: Sequence[Any], k: int) -> float:
+    wanted = set(expected)
+    for rank, rid in enumerate(result_ids[:k], start=1):
+        if rid in wanted:
+            return 1.0 / rank
+    return 0.0
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Percentil por nearest-rank (None se vazio)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[idx]
+
+
+# ============================
+# Banco semeado + contagem de queries
+# ============================
+
+class QueryCounter:
+    def __init__(self, engine: Engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args: Any, **kwargs: Any) -> None:
+        self.count += 1
+
+
+def _make_engine(db_url: Optional[str]) -> Engine:
+    if not db_url or (db_url.startswith("sqlite://") and make_url(db_url).database in (None, "", ":memory:")):
+        return create_engine(
+            "sqlite://",
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+        )
+    return create_engine(db_url)
+
+
+def seed_catalog(engine: Engine, catalog: Dict[str, Any]) -> int:
+    """Cria so as tabelas do catalogo e grava categorias/produtos com ids fixos (merge)."""
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[CategoriaProduto.__table__, Produto.__table__, ProdutoAtributo.__table__],
+    )
+    db = SessionLocal(bind=engine)
+    try:
+        for c in catalog.get("categories", []):
+            db.merge(CategoriaProduto(id=c["id"], nome=c["nome"]))
+        for p in catalog.get("products", []):
+            db.merge(Produto(**p))
+        db.commit()
+        return len(catalog.get("products", []))
+    finally:
+        db.close()
+
+
+# ============================
+# Estrategias
+# ============================
+
+def _semantic(q: str, k: int) -> List[int]:
+    return [r["id_produto"] for r in rag_products.search_products(q, k=k, min_score=0.0)]
+
+
+def _sql_ilike(q: str, k: int) -> List[int]:
+    return [int(p.id) for p in product_search._sql_fallback_find_products(q, k=k)]
+
+
+def _best_products(q: str, k: int) -> List[int]:
+    return [r["id"] for r in product_search.db_find_best_products(q, k=k)]
+
+
+def _constraints(q: str, k: int) -> List[int]:
+    return [r["id"] for r in product_search.db_find_best_products_with_constraints(q, k=k)]
+
+
+def _tiered(q: str, k: int) -> List[int]:
+    return [r["id"] for r in product_search.db_find_products_tiered(q, k=k)["items"]]
+
+
+STRATEGIES: Dict[str, Callable[[str, int], List[int]]] = {
+    "semantic": _semantic,
+    "sql_ilike": _sql_ilike,
+    "db_find_best_products": _best_products,
+    "constraints": _constraints,
+    "tiered": _tiered,
+}
+
+
+def _build_vector_index(embedder: Any, chroma_dir: str) -> Dict[str, Any]:
+    rag_products.CHROMA_DIR = chroma_dir
+    rag_products._get_embeddings = lambda: embedder
+    rag_products._vectorstore = None
+    rag_products._index_built = False
+    rag_products._last_index_count = -1
+    try:
+        count = rag_products.rebuild_products_index(force=True)
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:200]}
+    return {"ok": count > 0, "docs": count}
+
+
+def run_strategy(
+    name: str,
+    fn: Callable[[str, int], List[int]],
+    queries: List[Dict[str, Any]],
+    k: int,
+    counter: QueryCounter,
+    details: bool = False,
+) -> Dict[str, Any]:
+    # aquecimento (cache do catalogo, lazy init) fora da medicao
+    try:
+        fn(queries[0]["query"], k)
+    except Exception:
+        pass
+
+    recalls: List[float] = []
+    rrs: List[float] = []
+    latencies: List[float] = []
+    per_query: List[Dict[str, Any]] = []
+    errors = 0
+    db_before = counter.count
+
+    for item in queries:
+        q, expected = item["query"], item["expected_ids"]
+        started = time.perf_counter()
+        try:
+            ids = fn(q, k)
+            error = None
+        except Exception as e:
+            ids, error = [], str(e)[:200]
+            errors += 1
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        recalls.append(recall_at_k(ids, expected, k))
+        rrs.append(reciprocal_rank(ids, expected, k))
+        if details:
+            per_query.append({"query": q, "expected": expected, "got": ids[:k], "error": error})
+
+    db_queries = counter.count - db_before
+    n = len(queries)
+    out: Dict[str, Any] = {
+        "strategy": name,
+        f"recall@{k}": round(sum(recalls) / n, 4),
+        "mrr": round(sum(rrs) / n, 4),
+        "latency_ms_p50": round(percentile(latencies, 50) or 0.0, 3),
+        "latency_ms_p95": round(percentile(latencies, 95) or 0.0, 3),
+        "db_queries": db_queries,
+        "db_queries_per_query": round(db_queries / n, 2),
+        "errors": errors,
+    }
+    if details:
+        out["queries"] = per_query
+    return out
+
+
+def run_benchmark(
+    k: int = 5,
+    embedder: str = "hashing",
+    strategies: Optional[Sequence[str]] = None,
+    db_url: Optional[str] = None,
+    details: bool = False,
+) -> Dict[str, Any]:
+    with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    with open(QUERIES_PATH, "r", encoding="utf-8") as f:
+        queries = json.load(f)
+
+    names = list(strategies or STRATEGIES)
+    unknown = [s for s in names if s not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"estrategias desconhecidas: {unknown}")
+
+    engine = _make_engine(db_url)
+    original_bind = SessionLocal.kw.get("bind")
+    original_chroma_dir = rag_products.CHROMA_DIR
+    original_get_embeddings = rag_products._get_embeddings
+    SessionLocal.configure(bind=engine)
+    catalog_cache.invalidate()
+    index_status.reset()
+    try:
+        seeded = seed_catalog(engine, catalog)
+        counter = QueryCounter(engine)
+
+        # hashing: instancia propria (o IDF e ajustado ao catalogo semeado no build)
+        emb = HashingEmbeddings() if embedder == "hashing" else original_get_embeddings()
+        with tempfile.TemporaryDirectory(prefix="bench_chroma_") as chroma_dir:
+            index = _build_vector_index(emb, chroma_dir) if emb is not None else {"ok": False, "error": "embeddings indisponiveis"}
+            results = [run_strategy(n, STRATEGIES[n], queries, k, counter, details) for n in names]
+            rag_products._vectorstore = None
+            rag_products._index_built = False
+
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {
+                "k": k,
+                "embedder": embedder,
+                "embed_model": getattr(emb, "model_name", None) or EMBED_MODEL_NAME,
+                "db": make_url(str(engine.url)).render_as_string(hide_password=True),
+                "products": seeded,
+                "queries": len(queries),
+            },
+            "vector_index": index,
+            "results": results,
+        }
+    finally:
+        SessionLocal.configure(bind=original_bind)
+        rag_products.CHROMA_DIR = original_chroma_dir
+        rag_products._get_embeddings = original_get_embeddings
+        catalog_cache.invalidate()
+        engine.dispose()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark da busca de produtos (recall@k, MRR, latencia, queries SQL).")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embedder", choices=["hashing", "real"], default="hashing")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="lista separada por virgula")
+    parser.add_argument("--db-url", default=None, help="padrao: SQLite em memoria. Use apenas bancos de teste.")
+    parser.add_argument("--details", action="store_true", help="inclui o resultado de cada consulta")
+    parser.add_argument("--out", default=None, help="arquivo JSON de saida (padrao: stdout)")
+    args = parser.parse_args(argv)
+
+    # logs da aplicacao (print) vao para stderr; stdout fica so com o JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(
+            k=args.k,
+            embedder=args.embedder,
+            strategies=[s.strip() for s in args.strategies.split(",") if s.strip()],
+            db_url=args.db_url,
+            details=args.details,
+        )
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,6 +8,8 @@ from sqlalchemy import (
     TIMESTAMP,
     Numeric,
     ForeignKey,
+    JSON,
+    func,
     text,
 )
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship
@@ -61,6 +63,37 @@ class Produto(Base):
     itens_orcamento = relationship("ItemOrcamento", back_populates="produto")
 
 
+class ProdutoAtributo(Base):
+    """
+    Atributos estruturados extraidos do nome/descricao do produto
+    (ver app/product_attributes.py). Colunas tipadas indexadas para filtro
+    + JSON com todos os atributos do CATEGORY_SCHEMA.
+    """
+    __tablename__ = "produto_atributos"
+
+    id_produto = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE"), primary_key=True)
+    categoria_schema = Column(String(40), index=True)  # chave do CATEGORY_SCHEMA (ex.: tintas)
+
+    cp_classe = Column(String(20), index=True)          # ex.: CP II-E-32
+    kg_embalagem = Column(Numeric(10, 3), index=True)
+    diametro_mm = Column(Numeric(10, 2), index=True)
+    volume_l = Column(Numeric(10, 3), index=True)
+    material = Column(String(30), index=True)
+    acabamento = Column(String(30), index=True)
+
+    # conversao de embalagem por unidade vendida (kg/L acima + m, m2, pecas por caixa)
+    m_por_unidade = Column(Numeric(10, 3))
+    m2_por_unidade = Column(Numeric(10, 3))
+    pecas_por_caixa = Column(Integer)
+
+    # JSONB no Postgres; JSON no SQLite (benchmarks/testes)
+    atributos = Column(JSONB().with_variant(JSON(), "sqlite"), nullable=False, default=dict)
+    fonte_hash = Column(String(40), nullable=False)   # nome/descricao/versao do extrator
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    produto = relationship("Produto")
+
+
 class Cliente(Base):
     __tablename__ = "clientes"
 
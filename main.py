@@ -2,36 +2,26 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from dotenv import load_dotenv
 
-from database import init_db
 from app.api_routes import router
 from app.whatsapp_webhook import router as whatsapp_router
-from app.rag_products import rebuild_product_index
-from app.rag_knowledge import rebuild_knowledge_index
+from app.index_warmup import start_index_warmup
+from app.knowledge_watcher import start_faq_watcher, stop_faq_watcher
+from app import settings
 
 load_dotenv()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # cria tabelas
-    try:
-        init_db()
-    except Exception as e:
-        # não derruba o servidor se o banco estiver fora no boot
-        print("[WARN] init_db falhou:", e)
-
-    # (re)indexa catálogo no vector store
-    # catálogo pequeno -> pode recriar sempre no startup sem dor
-    try:
-        rebuild_product_index()
-    except Exception as e:
-        # não derruba o servidor se embeddings/chroma falharem
-        print("[WARN] rebuild_product_index falhou:", e)
-    try:
-        rebuild_knowledge_index()
-    except Exception as e:
-        print("[WARN] rebuild_knowledge_index falhou:", e)
+    # init_db + (re)indexacao do catalogo/FAQ rodam em background:
+    # o servidor aceita trafego na hora e /health/ready informa quando os indices estao prontos.
+    # Ate la, as buscas caem no caminho lexical (SQL ILIKE / FAQ por termos).
+    app.state.index_warmup = start_index_warmup()
+    # hot reload do FAQ (opcional): re-embeda so entradas alteradas
+    app.state.faq_watcher = start_faq_watcher() if settings.KNOWLEDGE_HOT_RELOAD else None
     yield
+    if app.state.faq_watcher is not None:
+        stop_faq_watcher(app.state.faq_watcher)
 
 
 app = FastAPI(title="Chatbot Materiais de Construção", lifespan=lifespan)
@@ -4,4 +4,27 @@ import sys
 # Garante que o pacote local `app` seja importável durante os testes
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
-    sys.path.insert(0, ROOT)
\ No newline at end of file
+    sys.path.insert(0, ROOT)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _isolate_llm_state(monkeypatch):
+    # cada teste mocka o Groq com uma rota propria: nao reaproveita rota de outro teste,
+    # nem modelo local/tabela de sinteses/dataset de treino/trilha de telemetria em data/;
+    # router e planner separados (os testes de fluxo mockam route_intent)
+    from app import llm_breaker, llm_scheduler, router_cache, settings
+
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_ENABLED", False)
+    monkeypatch.setattr(settings, "INTENT_DATASET_LOGGING", False)
+    monkeypatch.setattr(settings, "TECHNICAL_SYNTHESIS_TABLE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_FUSED_ROUTER_PLANNER", False)
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_LOG_ENABLED", False)
+    router_cache.clear()
+    llm_breaker.reset()
+    llm_scheduler.reset()
+    yield
+    router_cache.clear()
+    llm_breaker.reset()
+    llm_scheduler.reset()
@@ -0,0 +1,187 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+from app import catalog_cache, index_status, rag_products
+
+
+class _Col:
+    def __init__(self, name):
+        self.name = name
+
+    def in_(self, ids):
+        return ("in", list(ids))
+
+
+class _FakeProduto:
+    id = _Col("id")
+
+
+class _FakeDB:
+    """Tabela de produtos em memoria; conta quantas queries foram feitas."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def session(self):
+        db = self
+
+        class _Query:
+            def __init__(self):
+                self.ids = None
+
+            def filter(self, cond):
+                self.ids = cond[1]
+                return self
+
+            def all(self):
+                db.queries.append(self.ids)
+                return [r for r in db.rows if self.ids is None or r.id in self.ids]
+
+        class _Session:
+            def query(self, model):
+                return _Query()
+
+            def close(self):
+                pass
+
+        return _Session()
+
+
+def _produto(pid, preco, estoque=10, ativo=True):
+    return SimpleNamespace(
+        id=pid, nome=f"Produto {pid}", descricao="", unidade="UN", preco=preco, estoque_atual=estoque, ativo=ativo, id_categoria=1
+    )
+
+
+class _FakeStore:
+    def __init__(self, hits):
+        self.hits = hits
+        self.filters = []
+
+    def similarity_search_with_score(self, q, k=6, filter=None):
+        self.filters.append(filter)
+        hits = [(md, dist) for md, dist in self.hits if _matches(md, filter)]
+        return [(Document(page_content="x", metadata=md), dist) for md, dist in hits[:k]]
+
+
+def _matches(md, where):
+    """Subconjunto do `where` do Chroma usado pela busca ($and / $in)."""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(_matches(md, w) for w in where["$and"])
+    (key, cond), = where.items()
+    return md.get(key) in cond["$in"]
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = _FakeDB([_produto(1, 30.0), _produto(2, 45.5, estoque=0), _produto(3, 12.0, ativo=False)])
+    monkeypatch.setattr(catalog_cache, "SessionLocal", db.session)
+    monkeypatch.setattr(catalog_cache, "Produto", _FakeProduto)
+    monkeypatch.setattr(catalog_cache, "_fetch_categories", lambda: {1: "Cimentos", 2: "Tintas e Vernizes"})
+    monkeypatch.setattr(catalog_cache, "_fetch_conversions", lambda ids=None: {})
+    catalog_cache.invalidate()
+    index_status.reset()
+    yield db
+    catalog_cache.invalidate()
+
+
+def _use_store(monkeypatch, hits):
+    store = _FakeStore(hits)
+    monkeypatch.setattr(rag_products, "_vectorstore", store)
+    monkeypatch.setattr(rag_products, "_ensure_index_ready", lambda: True)
+    return store
+
+
+def test_search_overlays_live_price_instead_of_indexed_metadata(fake_db, monkeypatch):
+    # metadados antigos de um indice legado (preco congelado) sao ignorados
+    _use_store(monkeypatch, [({"id_produto": 1, "preco": 99.0}, 0.1), ({"id_produto": 2}, 0.3)])
+
+    results = rag_products.search_products("cimento")
+
+    assert [r["id_produto"] for r in results] == [1, 2]
+    assert results[0]["preco"] == 30.0
+    assert results[1]["estoque"] == 0.0
+
+    fake_db.rows[0].preco = 31.0
+    catalog_cache.invalidate([1])
+    assert rag_products.search_products("cimento")[0]["preco"] == 31.0
+
+
+def test_search_drops_products_deactivated_or_removed_since_rebuild(fake_db, monkeypatch):
+    _use_store(monkeypatch, [({"id_produto": 3}, 0.1), ({"id_produto": 404}, 0.2), ({"id_produto": 1}, 0.3)])
+
+    assert [r["id_produto"] for r in rag_products.search_products("cimento")] == [1]
+
+
+def test_catalog_cache_uses_single_query_per_refresh(fake_db):
+    catalog_cache.get_many([1, 2])
+    catalog_cache.get_many([2, 1])
+    assert fake_db.queries == [None]
+
+    fake_db.rows.append(_produto(7, 5.0))
+    assert catalog_cache.get_many([1, 7])[7]["preco"] == 5.0
+    assert fake_db.queries == [None, [7]]
+
+
+def test_indexed_document_has_no_price_or_stock():
+    doc = rag_products._produto_to_doc(_produto(1, 30.0))
+    assert "preco" not in doc.metadata
+    assert "estoque" not in doc.metadata
+
+
+def test_filters_are_pushed_into_vector_query(fake_db, monkeypatch):
+    fake_db.rows.append(_produto(4, 80.0))
+    store = _use_store(
+        monkeypatch,
+        [
+            ({"id_produto": 2, "id_categoria": 1}, 0.05),  # sem estoque
+            ({"id_produto": 4, "id_categoria": 2}, 0.1),  # outra categoria
+            ({"id_produto": 1, "id_categoria": 1}, 0.2),
+        ],
+    )
+
+    results = rag_products.search_products("cimento", k=1, category="cimento", in_stock=True)
+
+    assert [r["id_produto"] for r in results] == [1]
+    where = store.filters[-1]
+    assert {"id_categoria": {"$in": [1]}} in where["$and"]
+
+
+def test_price_range_and_impossible_filters(fake_db, monkeypatch):
+    fake_db.rows.append(_produto(4, 80.0))
+    store = _use_store(monkeypatch, [({"id_produto": 4}, 0.1), ({"id_produto": 1}, 0.2)])
+
+    assert [r["id_produto"] for r in rag_products.search_products("x", max_price=50)] == [1]
+    assert store.filters[-1] == {"id_produto": {"$in": [1, 2]}}
+
+    calls = len(store.filters)
+    assert rag_products.search_products("x", category="ferragens") == []
+    assert rag_products.search_products("x", min_price=1000) == []
+    assert len(store.filters) == calls
+
+
+def test_db_find_best_products_filters_in_the_index(fake_db, monkeypatch):
+    from app import product_search
+
+    fake_db.rows.append(_produto(4, 80.0))
+    store = _use_store(
+        monkeypatch,
+        [
+            ({"id_produto": 2, "id_categoria": 1}, 0.05),  # sem estoque
+            ({"id_produto": 4, "id_categoria": 2}, 0.1),  # outra categoria
+            ({"id_produto": 1, "id_categoria": 1}, 0.2),
+        ],
+    )
+
+    results = product_search.db_find_best_products("cimento cp ii", k=1, category_hint="cimento cp ii")
+
+    assert [r["id"] for r in results] == [1]
+    assert {"id_categoria": {"$in": [1]}} in store.filters[-1]["$and"]
+    # hint sem categoria no catalogo nao vira filtro (nao zera a busca)
+    assert product_search.category_filter_for("ferragem para porta") is None
+    assert product_search.category_filter_for("tinta acrilica") == "tinta"
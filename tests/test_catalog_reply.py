@@ -4,7 +4,7 @@ from app import flow_controller
 def test_catalog_reply_safe(monkeypatch):
     calls = {"set": 0}
 
-    def _db_find_best_products(query, k=6):
+    def _db_find_best_products(query, k=6, category_hint=None):
         return [{"id": 1, "nome": "Item 1"}]
 
     def _set_last_suggestions(session_id, options, hint, context=None):
@@ -28,11 +28,16 @@ def test_consultive_investigation_sets_last_suggestions(monkeypatch):
     })
 
     monkeypatch.setattr(
-        "app.flows.consultive_investigation.db_find_best_products_with_constraints",
-        lambda *args, **kwargs: [
-            {"id": 1, "nome": "Cimento CP II"},
-            {"id": 2, "nome": "Cimento CP III"},
-        ],
+        "app.flows.consultive_investigation.db_find_products_tiered",
+        lambda *args, **kwargs: {
+            "items": [
+                {"id": 1, "nome": "Cimento CP II"},
+                {"id": 2, "nome": "Cimento CP III"},
+            ],
+            "tier": "must",
+            "exact_match_found": True,
+            "unavailable_specs": [],
+        },
     )
     monkeypatch.setattr(
         "app.flows.technical_recommendations.get_technical_recommendation",
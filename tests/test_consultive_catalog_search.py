@@ -1,4 +1,11 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
 from app import flow_controller
+from app.product_search import db_find_products_tiered
+from database import Base, CategoriaProduto, Produto
 
 
 def test_search_consultive_exact_match(monkeypatch):
@@ -12,21 +19,17 @@ def test_search_consultive_exact_match(monkeypatch):
             "strict": True,
         }
 
-    def _search(query, k=6, category_hint=None, must_terms=None, should_terms=None, strict=False):
-        calls.append(
-            {
-                "category_hint": category_hint,
-                "must_terms": must_terms,
-                "should_terms": should_terms,
-                "strict": strict,
-            }
-        )
-        if strict:
-            return [{"id": 1, "nome": "Cimento CP III", "preco": 30.0, "unidade": "UN", "estoque": 10}]
-        return []
+    def _search(query, k=6, category_hint=None, must_terms=None, should_terms=None, fallback_query=None):
+        calls.append({"category_hint": category_hint, "must_terms": must_terms, "should_terms": should_terms})
+        return {
+            "items": [{"id": 1, "nome": "Cimento CP III", "preco": 30.0, "unidade": "UN", "estoque": 10}],
+            "tier": "must",
+            "exact_match_found": True,
+            "unavailable_specs": [],
+        }
 
     monkeypatch.setattr(flow_controller, "extract_catalog_constraints_from_consultive", _extract)
-    monkeypatch.setattr(flow_controller, "db_find_best_products_with_constraints", _search)
+    monkeypatch.setattr(flow_controller, "db_find_products_tiered", _search)
     result = flow_controller._search_consultive_catalog(
         product_hint="cimento",
         summary_text="Recomendo CP III.",
@@ -36,7 +39,7 @@ def test_search_consultive_exact_match(monkeypatch):
     assert result["exact_match_found"] is True
     assert result["items"]
     assert result["warning_text"] is None
-    assert calls and calls[0]["strict"] is True
+    assert calls == [{"category_hint": "cimento", "must_terms": ["cp iii"], "should_terms": ["externa"]}]
 
 
 def test_search_consultive_fallback_warning(monkeypatch):
@@ -48,13 +51,16 @@ def test_search_consultive_fallback_warning(monkeypatch):
             "strict": True,
         }
 
-    def _search(query, k=6, category_hint=None, must_terms=None, should_terms=None, strict=False):
-        if strict:
-            return []
-        return [{"id": 2, "nome": "Cimento CP II", "preco": 25.0, "unidade": "UN", "estoque": 8}]
+    def _search(query, k=6, category_hint=None, must_terms=None, should_terms=None, fallback_query=None):
+        return {
+            "items": [{"id": 2, "nome": "Cimento CP II", "preco": 25.0, "unidade": "UN", "estoque": 8}],
+            "tier": "should",
+            "exact_match_found": False,
+            "unavailable_specs": ["cp iv"],
+        }
 
     monkeypatch.setattr(flow_controller, "extract_catalog_constraints_from_consultive", _extract)
-    monkeypatch.setattr(flow_controller, "db_find_best_products_with_constraints", _search)
+    monkeypatch.setattr(flow_controller, "db_find_products_tiered", _search)
     result = flow_controller._search_consultive_catalog(
         product_hint="cimento",
         summary_text="Recomendo CP IV.",
@@ -65,3 +71,47 @@ def test_search_consultive_fallback_warning(monkeypatch):
     assert result["unavailable_specs"] == ["cp iv"]
     assert result["warning_text"]
     assert result["items"]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[CategoriaProduto.__table__, Produto.__table__])
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        CategoriaProduto(id=1, nome="Cimentos"),
+        Produto(id=1, nome="Cimento CP II 50kg", descricao="uso geral", preco=35, estoque_atual=5, ativo=True, id_categoria=1),
+        Produto(id=2, nome="Cimento CP II 25kg", descricao="uso geral, area externa", preco=20, estoque_atual=5, ativo=True, id_categoria=1),
+        Produto(id=3, nome="Cimento CP III 50kg", descricao="obras pesadas", preco=40, estoque_atual=5, ativo=True, id_categoria=1),
+        Produto(id=4, nome="Cimento CP IV 50kg", descricao="fundacao", preco=42, estoque_atual=0, ativo=False, id_categoria=1),
+    ])
+    session.commit()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a, **kw: statements.append(a[2]))
+    session.statements = statements
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_tiered_query_prefers_must_tier_in_one_round_trip(db):
+    out = db_find_products_tiered("cimento", category_hint="cimento", must_terms=["cp iii"], db=db)
+    assert out["tier"] == "must" and out["exact_match_found"] is True
+    assert [i["id"] for i in out["items"]] == [3]
+    assert out["unavailable_specs"] == []
+    assert len(db.statements) == 1
+
+
+def test_tiered_query_relaxes_and_reports_missing_specs(db):
+    # CP IV so existe inativo: cai para a camada should, ordenada pelos should_terms
+    out = db_find_products_tiered(
+        "cimento", category_hint="cimento", must_terms=["cp iv", "cp ii"], should_terms=["externa"], db=db
+    )
+    assert out["tier"] == "should" and out["exact_match_found"] is False
+    assert [i["id"] for i in out["items"]][:1] == [2]
+    assert out["unavailable_specs"] == ["cp iv"]
+
+    fallback = db_find_products_tiered("cimento laje", must_terms=["cp iv"], fallback_query="cimento", db=db)
+    assert fallback["tier"] == "fallback"
+    assert {i["id"] for i in fallback["items"]} == {1, 2, 3}
+    assert len(db.statements) == 2
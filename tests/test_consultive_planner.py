@@ -194,3 +194,168 @@ def test_planner_low_confidence_clarify(monkeypatch):
 
     reply, _ = flow_controller.handle_message("quero cimento", "s1")
     assert "area interna ou externa" in reply.lower()
+
+
+def _fused_payload(action: str, plan: Any) -> str:
+    return json.dumps(
+        {
+            "route": {
+                "intent": "TECHNICAL_QUESTION",
+                "product_query": "cimento",
+                "category_hint": "cimento",
+                "constraints": {"environment": "externa"},
+                "action": action,
+                "clarifying_question": None,
+                "confidence": 0.9,
+            },
+            "plan": plan,
+        }
+    )
+
+
+def test_route_and_plan_returns_route_with_plan(monkeypatch):
+    plan = {
+        "missing_fields": ["load_type"],
+        "next_action": "ASK_CONTEXT",
+        "next_question": "Uso residencial ou carga pesada?",
+        "assumptions": [],
+        "confidence": 0.8,
+    }
+    _mock_groq(monkeypatch, _fused_payload("ASK_USAGE_CONTEXT", plan))
+    out = llm_service.route_and_plan("qual cimento pra laje externa?", {}, {})
+    assert out and out["action"] == "ASK_USAGE_CONTEXT"
+    assert out["plan"]["next_action"] == "ASK_CONTEXT"
+    assert out["plan"]["missing_fields"] == ["load_type"]
+
+
+def test_route_and_plan_drops_plan_for_catalog_action(monkeypatch):
+    plan = {"missing_fields": [], "next_action": "READY_TO_ANSWER", "confidence": 0.9}
+    _mock_groq(monkeypatch, _fused_payload("SHOW_CATALOG", plan))
+    out = llm_service.route_and_plan("tem cimento?", {}, {})
+    assert out and out["action"] == "SHOW_CATALOG"
+    assert out["plan"] is None
+
+
+def test_route_and_plan_invalid_plan_keeps_route(monkeypatch):
+    _mock_groq(monkeypatch, _fused_payload("ASK_USAGE_CONTEXT", {"next_action": "QUALQUER"}))
+    out = llm_service.route_and_plan("qual cimento pra laje externa?", {}, {})
+    assert out and out["action"] == "ASK_USAGE_CONTEXT"
+    assert out["plan"] is None
+
+
+def test_route_and_plan_invalid_route(monkeypatch):
+    _mock_groq(monkeypatch, json.dumps({"plan": None}))
+    assert llm_service.route_and_plan("qual cimento?", {}, {}) is None
+
+
+def test_planner_uses_fused_plan_without_second_call(monkeypatch):
+    state = _base_state()
+
+    def _no_planner(*_args, **_kwargs):
+        raise AssertionError("planner nao deveria ser chamado")
+
+    monkeypatch.setattr(flow_controller, "plan_consultive_next_step", _no_planner)
+    monkeypatch.setattr(flow_controller, "patch_state", lambda *_: None)
+
+    plan = {
+        "missing_fields": ["load_type"],
+        "next_action": "ASK_CONTEXT",
+        "next_question": "Uso residencial ou carga pesada?",
+        "assumptions": [],
+        "confidence": 0.8,
+    }
+    reply, needs_human = flow_controller._handle_consultive_planner(
+        session_id="s1",
+        message="qual cimento pra laje externa?",
+        st=state,
+        product_hint="cimento",
+        constraints={"environment": "externa"},
+        fallback_to_usage=True,
+        fallback_to_consultive=False,
+        plan=plan,
+    )
+    assert reply == "Uso residencial ou carga pesada?"
+    assert needs_human is False
+
+
+def _in_memory_state(monkeypatch, state: Dict[str, Any]) -> None:
+    """Estado da sessao em memoria para os modulos que o fluxo le/grava (sem Postgres)."""
+    from app import preferences, session_state
+    from app.flows import quantity, removal
+
+    def _patch(_user_id, updates):
+        state.update(updates or {})
+        return state
+
+    for module in (session_state, flow_controller, preferences, quantity, removal):
+        monkeypatch.setattr(module, "get_state", lambda _: state)
+        monkeypatch.setattr(module, "patch_state", _patch)
+
+
+def test_handle_message_fused_flow_makes_one_llm_call(monkeypatch):
+    state = _base_state()
+    _in_memory_state(monkeypatch, state)
+    monkeypatch.setattr(flow_controller.settings, "LLM_FUSED_ROUTER_PLANNER", True)
+    monkeypatch.setattr(flow_controller, "save_chat_db", lambda *_: None)
+    monkeypatch.setattr(flow_controller, "list_orcamento_items", lambda *_: [])
+
+    plan = {
+        "missing_fields": ["load_type"],
+        "next_action": "ASK_CONTEXT",
+        "next_question": "Uso residencial ou carga pesada?",
+        "assumptions": [],
+        "confidence": 0.8,
+    }
+    calls = []
+
+    class _CountingGroq(_FakeGroq):
+        def create(self, **kwargs):
+            calls.append(kwargs)
+            return super().create(**kwargs)
+
+    fake = _CountingGroq(_fused_payload("ASK_USAGE_CONTEXT", plan))
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: fake)
+
+    reply, needs_human = flow_controller.handle_message("qual cimento pra laje externa?", "s1")
+    assert reply == "Uso residencial ou carga pesada?"
+    assert needs_human is False
+    assert len(calls) == 1
+    assert calls[0]["component"] == "route_plan"
+
+
+def test_cached_route_is_not_recorded_again(monkeypatch):
+    state = _base_state()
+    _in_memory_state(monkeypatch, state)
+    monkeypatch.setattr(flow_controller.settings, "LLM_FUSED_ROUTER_PLANNER", True)
+    monkeypatch.setattr(flow_controller, "save_chat_db", lambda *_: None)
+    monkeypatch.setattr(flow_controller, "list_orcamento_items", lambda *_: [])
+    recorded = []
+    monkeypatch.setattr(flow_controller.intent_classifier, "record_decision", lambda *args: recorded.append(args))
+
+    plan = {
+        "missing_fields": ["load_type"],
+        "next_action": "ASK_CONTEXT",
+        "next_question": "Uso residencial ou carga pesada?",
+        "assumptions": [],
+        "confidence": 0.8,
+    }
+    _mock_groq(monkeypatch, _fused_payload("ASK_USAGE_CONTEXT", plan))
+
+    for _ in range(2):
+        state.clear()
+        state.update(_base_state())
+        reply, _ = flow_controller.handle_message("qual cimento pra laje externa?", "s1")
+        assert reply == "Uso residencial ou carga pesada?"
+    assert len(recorded) == 1
+
+
+def test_fused_call_only_for_consultive_turns(monkeypatch):
+    monkeypatch.setattr(flow_controller.settings, "LLM_FUSED_ROUTER_PLANNER", True)
+    used = []
+    monkeypatch.setattr(flow_controller, "route_and_plan", lambda *_: used.append("route_plan") or {})
+    monkeypatch.setattr(flow_controller, "route_intent", lambda *_: used.append("router") or {})
+
+    flow_controller._route_turn("qual cimento pra laje externa?", {}, {})
+    flow_controller._route_turn("quero finalizar o pedido", {}, {})
+    flow_controller._route_turn("externa", {"consultive_pending": True}, {})
+    assert used == ["route_plan", "router", "route_plan"]
@@ -46,3 +46,27 @@ def test_policy_quando_required_preenchidos_pede_quantidade():
     attrs = {"item": "joelho", "material": "pvc", "sistema_uso": "esgoto", "diametro": "50mm"}
     action = policy.next_action("tubos_conexoes", attrs, {}, [])
     assert action["action"] == "ask_qty"
+
+
+def test_info_gain_prefere_divisao_equilibrada_a_mais_valores():
+    # sistema_uso: 3 valores mas quase todos iguais; diametro: 2 metades
+    candidates = [
+        {"attributes": {"sistema_uso": "esgoto" if i == 0 else "gas" if i == 1 else "agua_fria", "diametro": 20 if i < 5 else 50}}
+        for i in range(10)
+    ]
+    attrs = {"item": "tubo", "material": "pvc"}
+    assert policy.next_action("tubos_conexoes", attrs, {}, candidates)["slot"] == "diametro"
+
+
+def test_info_gain_ignora_atributo_que_nao_descarta_ninguem():
+    # so 1 candidato tem sistema_uso: a resposta nao elimina os demais (atributo ausente)
+    candidates = [{"attributes": {"sistema_uso": "esgoto"}}] + [{"attributes": {}} for _ in range(5)]
+    gain = policy.expected_info_gain(policy.attribute_codes(candidates, ["sistema_uso"]))
+    assert gain[0] == 0.0
+
+
+def test_info_gain_empate_desfeito_por_atributo_menos_perguntado():
+    candidates = [{"attributes": {"sistema_uso": s, "diametro": d}} for s, d in [("esgoto", 20), ("agua_fria", 50)]]
+    attrs = {"item": "tubo", "material": "pvc"}
+    assert policy.next_action("tubos_conexoes", attrs, {}, candidates)["slot"] == "sistema_uso"
+    assert policy.next_action("tubos_conexoes", attrs, {"sistema_uso": 1}, candidates)["slot"] == "diametro"
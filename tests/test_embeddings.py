@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from app import embeddings, settings
+from app.embeddings import HashingEmbeddings
+
+
+def _cos(a, b):
+    return float(np.dot(a, b))
+
+
+def test_hashing_embeddings_are_deterministic_and_normalized():
+    emb = HashingEmbeddings(dim=256)
+    a = emb.embed_query("Cimento CP II 50kg")
+    assert a == HashingEmbeddings(dim=256).embed_documents(["cimento cp ii 50kg"])[0]
+    assert abs(np.linalg.norm(a) - 1.0) < 1e-5
+    assert len(a) == 256
+
+
+def test_hashing_embeddings_tolerate_typos():
+    emb = HashingEmbeddings()
+    cimento = emb.embed_query("cimento")
+    assert _cos(cimento, emb.embed_query("cimeto")) > _cos(cimento, emb.embed_query("tijolo"))
+
+
+def test_fit_and_state_roundtrip():
+    corpus = ["Tinta Acrilica Branca 18L", "Tinta Esmalte Preto", "Cimento CP II 50kg"]
+    emb = HashingEmbeddings(dim=128).fit(corpus)
+    state = emb.state()
+
+    other = HashingEmbeddings(dim=128)
+    assert other.load_state(state)
+    assert np.allclose(other.embed_query("tinta branca"), emb.embed_query("tinta branca"), atol=1e-4)
+    # estado de outra configuracao nao e aplicado
+    assert not HashingEmbeddings(dim=64).load_state(state)
+
+
+def test_falls_back_to_hashing_when_hf_model_fails(monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_BACKEND", "hf")
+    monkeypatch.setattr(settings, "EMBED_HASHING_FALLBACK", True)
+    monkeypatch.setattr(embeddings, "_load_hf_model", lambda: None)
+    monkeypatch.setattr(embeddings, "_hashing", {})
+
+    products = embeddings.get_embeddings("products")
+    knowledge = embeddings.get_embeddings("knowledge")
+
+    assert isinstance(products, HashingEmbeddings)
+    # IDF e por indice: instancias separadas
+    assert products is not knowledge
+    assert embeddings.get_embeddings("products") is products
+
+    monkeypatch.setattr(settings, "EMBED_HASHING_FALLBACK", False)
+    assert embeddings.get_embeddings("products") is None
+
+
+def test_hashing_backend_selected_by_env_skips_model(monkeypatch):
+    monkeypatch.setattr(settings, "EMBED_BACKEND", "hashing")
+    monkeypatch.setattr(embeddings, "_hashing", {})
+
+    def _should_not_load():
+        raise AssertionError("nao deve carregar o modelo HF")
+
+    monkeypatch.setattr(embeddings, "_load_hf_model", _should_not_load)
+    assert isinstance(embeddings.get_embeddings("products"), HashingEmbeddings)
+
+
+def test_fit_embedder_leaves_the_live_instance_untouched():
+    from langchain_core.documents import Document
+
+    from app import index_build
+
+    emb = HashingEmbeddings(dim=64).fit(["cimento", "areia"])
+    before = emb.state()
+    fitted = index_build.fit_embedder(emb, [Document(page_content="tinta"), Document(page_content="massa")])
+    assert fitted is not emb
+    assert emb.state() == before
+    assert fitted.state() != before
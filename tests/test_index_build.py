@@ -0,0 +1,166 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+from app import index_build, rag_products
+
+
+class _FakeEmbeddings:
+    def __init__(self, fail_on_batch=None):
+        self.batches = []
+        self.fail_on_batch = fail_on_batch
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        if self.fail_on_batch is not None and len(self.batches) == self.fail_on_batch:
+            raise RuntimeError("modelo caiu")
+        return [[float(len(t))] for t in texts]
+
+
+class _FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for i, doc in zip(ids, documents):
+            self.rows[i] = doc
+
+
+class _FakeChroma:
+    collections = {}
+
+    def __init__(self, collection_name=None, embedding_function=None, persist_directory=None):
+        self.name = collection_name
+        self._collection = _FakeCollection(_FakeChroma.collections.setdefault(collection_name, {}))
+
+    def delete_collection(self):
+        _FakeChroma.collections.pop(self.name, None)
+
+
+def _docs(n):
+    return [Document(page_content=f"produto {i}", metadata={"id_produto": i}) for i in range(n)]
+
+
+def test_build_collection_batches_and_reports_throughput():
+    _FakeChroma.collections = {}
+    emb = _FakeEmbeddings()
+    store = _FakeChroma(collection_name="novo")
+
+    stats = index_build.build_collection(store, _docs(5), [str(i) for i in range(5)], emb, label="t", batch_size=2)
+
+    assert [len(b) for b in emb.batches] == [2, 2, 1]
+    assert len(_FakeChroma.collections["novo"]) == 5
+    assert stats["docs"] == 5
+    assert stats["batches"] == 3
+    assert stats["docs_per_s"] is None or stats["docs_per_s"] > 0
+    assert index_build.last_build_stats("t")["docs"] == 5
+
+
+def test_build_collection_drops_partial_collection_on_failure():
+    _FakeChroma.collections = {}
+    emb = _FakeEmbeddings(fail_on_batch=2)
+    store = _FakeChroma(collection_name="parcial")
+
+    with pytest.raises(RuntimeError):
+        index_build.build_collection(store, _docs(5), [str(i) for i in range(5)], emb, label="t", batch_size=2)
+
+    assert "parcial" not in _FakeChroma.collections
+
+
+@pytest.fixture
+def products_env(tmp_path, monkeypatch):
+    produtos = [
+        SimpleNamespace(
+            id=i, nome=f"Produto {i}", descricao="", unidade="UN", preco=10, estoque_atual=5, ativo=True, id_categoria=1
+        )
+        for i in range(3)
+    ]
+
+    class _Query:
+        def filter(self, *args):
+            return self
+
+        def all(self):
+            return produtos
+
+    class _Session:
+        def query(self, model):
+            return _Query()
+
+        def close(self):
+            pass
+
+    _FakeChroma.collections = {"products": {"legado": "x"}}
+    emb = _FakeEmbeddings()
+    monkeypatch.setattr(rag_products, "SessionLocal", _Session)
+    monkeypatch.setattr(rag_products, "Chroma", _FakeChroma)
+    monkeypatch.setattr(rag_products, "_get_embeddings", lambda: emb)
+    monkeypatch.setattr(rag_products, "CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(rag_products, "_vectorstore", None)
+    monkeypatch.setattr(rag_products, "_index_built", False)
+    monkeypatch.setattr(rag_products, "_last_index_count", -1)
+    return emb
+
+
+def test_products_rebuild_swaps_to_new_collection(products_env):
+    assert rag_products.rebuild_products_index(force=True) == 3
+
+    active = rag_products._active_collection_name()
+    assert active != "products"
+    assert list(_FakeChroma.collections) == [active]
+    assert set(_FakeChroma.collections[active]) == {"0", "1", "2"}
+
+
+def test_products_failed_rebuild_keeps_previous_index(products_env):
+    rag_products.rebuild_products_index(force=True)
+    active = rag_products._active_collection_name()
+    store_before = rag_products._vectorstore
+
+    products_env.fail_on_batch = len(products_env.batches) + 1
+    with pytest.raises(RuntimeError):
+        rag_products.rebuild_products_index(force=True)
+
+    assert rag_products._active_collection_name() == active
+    assert rag_products._vectorstore is store_before
+    assert list(_FakeChroma.collections) == [active]
+
+
+def test_products_rebuild_publishes_idf_only_with_the_swap(products_env, monkeypatch):
+    from app.embeddings import HashingEmbeddings
+
+    live = HashingEmbeddings(dim=64).fit(["cimento", "areia"])
+    before = live.state()
+    seen_during_build = []
+
+    class _SpyCollection(_FakeCollection):
+        def upsert(self, ids, embeddings, documents, metadatas):
+            seen_during_build.append(live.state())
+            super().upsert(ids, embeddings, documents, metadatas)
+
+    class _SpyChroma(_FakeChroma):
+        def __init__(self, collection_name=None, embedding_function=None, persist_directory=None):
+            super().__init__(collection_name, embedding_function, persist_directory)
+            self._collection = _SpyCollection(self._collection.rows)
+
+    monkeypatch.setattr(rag_products, "Chroma", _SpyChroma)
+    monkeypatch.setattr(rag_products, "_get_embeddings", lambda: live)
+
+    rag_products.rebuild_products_index(force=True)
+    assert seen_during_build and all(s == before for s in seen_during_build)
+    manifest = index_build.read_manifest(rag_products._manifest_path())
+    assert live.state() == manifest["embedder_state"] != before
+
+    # build que falha nao mexe no IDF em uso
+    published = live.state()
+
+    def _boom(*args, **kwargs):
+        raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(_SpyCollection, "upsert", _boom)
+    with pytest.raises(RuntimeError):
+        rag_products.rebuild_products_index(force=True)
+    assert live.state() == published
@@ -0,0 +1,95 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import api_routes, index_status, index_warmup, rag_knowledge, rag_products
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(api_routes.router)
+    return TestClient(app)
+
+
+def test_warmup_marks_components_ready(monkeypatch):
+    index_status.reset()
+    monkeypatch.setattr(index_warmup, "init_db", lambda: None)
+    monkeypatch.setattr(index_warmup, "sync_product_attributes", lambda: None)
+    monkeypatch.setattr(index_warmup, "rebuild_product_index", lambda: 12)
+    monkeypatch.setattr(index_warmup, "rebuild_knowledge_index", lambda: 31)
+
+    snap = index_warmup.run_index_warmup()
+
+    assert snap["db"]["status"] == "ready"
+    assert snap["products"]["status"] == "ready"
+    assert snap["products"]["count"] == 12
+    assert snap["knowledge"]["count"] == 31
+    assert index_status.all_ready()
+    index_status.reset()
+
+
+def test_warmup_failure_does_not_stop_other_steps(monkeypatch):
+    index_status.reset()
+
+    def _boom():
+        raise RuntimeError("chroma fora")
+
+    monkeypatch.setattr(index_warmup, "init_db", lambda: None)
+    monkeypatch.setattr(index_warmup, "sync_product_attributes", lambda: None)
+    monkeypatch.setattr(index_warmup, "rebuild_product_index", _boom)
+    monkeypatch.setattr(index_warmup, "rebuild_knowledge_index", lambda: 0)
+
+    snap = index_warmup.run_index_warmup()
+
+    assert snap["db"]["status"] == "ready"
+    assert snap["products"]["status"] == "failed"
+    assert "chroma fora" in snap["products"]["error"]
+    # indice vazio conta como falha (so caminho lexical disponivel)
+    assert snap["knowledge"]["status"] == "failed"
+    index_status.reset()
+
+
+def test_search_products_degrades_while_warming(monkeypatch):
+    index_status.reset()
+    index_status.set_status("products", "building")
+
+    def _should_not_run():
+        raise AssertionError("nao deve bloquear esperando o indice")
+
+    monkeypatch.setattr(rag_products, "_ensure_index_ready", _should_not_run)
+    assert rag_products.search_products("cimento") == []
+    index_status.reset()
+
+
+def test_search_knowledge_uses_lexical_path_while_warming(monkeypatch):
+    index_status.reset()
+    index_status.set_status("knowledge", "pending")
+    monkeypatch.setattr(rag_knowledge, "_ensure_index_ready", lambda force=False: False)
+
+    hits = rag_knowledge.search_knowledge("traco argamassa assentamento tijolo", k=3)
+    assert hits
+    assert hits[0]["id"] == "argamassa_assentamento_1_3"
+    index_status.reset()
+
+
+def test_health_endpoints_report_readiness():
+    index_status.reset()
+    client = _client()
+
+    assert client.get("/health/live").json() == {"status": "ok"}
+
+    index_status.set_status("db", "ready")
+    index_status.set_status("products", "building")
+    index_status.set_status("knowledge", "pending")
+    resp = client.get("/health/ready")
+    assert resp.status_code == 503
+    assert resp.json()["status"] == "warming"
+
+    index_status.set_status("products", "ready", count=10)
+    index_status.set_status("knowledge", "failed", error="x")
+    resp = client.get("/health/ready")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "ready"
+    assert body["degraded"] is True
+    assert body["components"]["products"]["count"] == 10
+    index_status.reset()
@@ -0,0 +1,171 @@
+import json
+
+import numpy as np
+import pytest
+
+from app import intent_classifier, settings
+
+_CATALOG = {"intent": "BROWSE_CATALOG", "action": "SHOW_CATALOG"}
+_CHECKOUT = {"intent": "CHECKOUT", "action": "HANDOFF_CHECKOUT"}
+_CLARIFY = {"intent": "UNKNOWN", "action": "ASK_CLARIFYING_QUESTION"}
+
+
+def _samples():
+    out = []
+    for prod in ("cimento", "areia", "brita", "tijolo", "tinta", "argamassa", "cal", "telha"):
+        for tpl in ("tem {p}?", "voces tem {p}", "quais {p} voces tem", "que tipo de {p} tem"):
+            out.append({"message": tpl.format(p=prod), "state_summary": {}, "route": _CATALOG})
+    for msg in ("quero finalizar", "pode fechar o pedido", "vou pagar agora", "finalizar compra"):
+        out.append({"message": msg, "state_summary": {"cart_has_items": True}, "route": _CHECKOUT})
+    for msg in ("hmm", "nao sei", "sei la", "talvez"):
+        out.append({"message": msg, "state_summary": {}, "route": _CLARIFY})
+    return out
+
+
+@pytest.fixture
+def model_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_ENABLED", True)
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_PATH", str(tmp_path / "intent.json"))
+    intent_classifier.reset()
+    yield tmp_path / "intent.json"
+    intent_classifier.reset()
+
+
+def test_trained_model_short_circuits_confident_routes(model_path, monkeypatch):
+    model = intent_classifier.train(_samples())
+    intent_classifier.save_model(model)
+
+    route = intent_classifier.predict_route("tem areia?", {})
+    assert route["action"] == "SHOW_CATALOG" and route["source"] == "local"
+    assert "areia" in route["product_query"] and route["confidence"] >= settings.INTENT_CLASSIFIER_THRESHOLD
+
+    # esclarecimento depende de texto do LLM: nunca sai do modelo local
+    assert intent_classifier.predict_route("sei la", {}) is None
+
+    monkeypatch.setattr(settings, "INTENT_CLASSIFIER_THRESHOLD", 1.01)
+    assert intent_classifier.predict_route("tem areia?", {}) is None
+
+
+def test_without_model_falls_back_to_router(model_path):
+    assert intent_classifier.predict_route("tem areia?", {}) is None
+
+
+def test_records_only_confident_router_decisions(tmp_path, monkeypatch):
+    path = tmp_path / "dataset.jsonl"
+    monkeypatch.setattr(settings, "INTENT_DATASET_LOGGING", True)
+    monkeypatch.setattr(settings, "INTENT_DATASET_PATH", str(path))
+
+    intent_classifier.record_decision("tem cimento?", {"in_checkout": False}, dict(_CATALOG, confidence=0.9))
+    intent_classifier.record_decision("hmm", {}, dict(_CLARIFY, confidence=0.2))
+
+    rows = intent_classifier.load_dataset()
+    assert [r["message"] for r in rows] == ["tem cimento?"]
+    assert rows[0]["route"] == _CATALOG
+    assert json.loads(path.read_text().splitlines()[0])["state_summary"] == {"in_checkout": False}
+
+
+def test_dataset_masks_pii_and_rotates(tmp_path, monkeypatch):
+    path = tmp_path / "dataset.jsonl"
+    monkeypatch.setattr(settings, "INTENT_DATASET_LOGGING", True)
+    monkeypatch.setattr(settings, "INTENT_DATASET_PATH", str(path))
+    monkeypatch.setattr(settings, "INTENT_DATASET_MAX_BYTES", 400)
+    monkeypatch.setattr(settings, "INTENT_DATASET_BACKUPS", 2)
+
+    route = dict(_CHECKOUT, confidence=0.9)
+    intent_classifier.record_decision("meu email e joao@exemplo.com, cpf 12345678900", {}, route)
+    for i in range(10):
+        intent_classifier.record_decision(f"quero finalizar {i}", {}, route)
+
+    rows = intent_classifier.load_dataset()
+    raw = "".join(p.read_text() for p in tmp_path.iterdir())
+    assert "joao@exemplo.com" not in raw and "12345678900" not in raw
+    assert (tmp_path / "dataset.jsonl.1").exists() and not (tmp_path / "dataset.jsonl.3").exists()
+    assert rows[-1]["message"] == "quero finalizar 9"
+
+
+def test_training_cli_reports_holdout(tmp_path, monkeypatch, capsys):
+    data = tmp_path / "dataset.jsonl"
+    data.write_text("\n".join(json.dumps(s) for s in _samples()), encoding="utf-8")
+    out = tmp_path / "model.json"
+    assert intent_classifier.main(["train", "--dataset", str(data), "--out", str(out)]) == 0
+    assert "accuracy" in capsys.readouterr().out
+    assert intent_classifier.IntentModel.from_dict(json.loads(out.read_text())) is not None
+
+
+def test_saved_weights_reproduce_sklearn_probabilities():
+    from sklearn.linear_model import LogisticRegression
+
+    samples = _samples()
+    model = intent_classifier.train(samples)
+    x = np.stack([model.features(s["message"], s["state_summary"]) for s in samples])
+    ref = LogisticRegression(C=10.0, max_iter=1000, class_weight="balanced")
+    ref.fit(x, [f"{s['route']['intent']}|{s['route']['action']}" for s in samples])
+
+    assert list(ref.classes_) == model.labels
+    np.testing.assert_allclose(model.predict_proba(x), ref.predict_proba(x), atol=1e-4)
+
+
+def test_binary_training_keeps_softmax_format():
+    samples = [s for s in _samples() if s["route"] is not _CLARIFY]
+    model = intent_classifier.train(samples)
+    assert model.weights.shape[1] == 2
+    assert model.predict("quero finalizar", {"cart_has_items": True})[1] == "HANDOFF_CHECKOUT"
+
+
+def test_train_from_history_writes_to_the_given_dataset(tmp_path, monkeypatch, capsys):
+    import database
+    from app import llm_service
+
+    history = [s["message"] for s in _samples()] + ["tem cimento?", "hmm"]
+
+    class _Query:
+        def order_by(self, *_):
+            return self
+
+        def limit(self, n):
+            return self
+
+        def all(self):
+            return [(m,) for m in history]
+
+    class _Session:
+        def query(self, *_):
+            return _Query()
+
+        def close(self):
+            pass
+
+    routes = {s["message"]: s["route"] for s in _samples()}
+
+    def _route_intent(message, state_summary):
+        route = routes.get(message, _CLARIFY)
+        return dict(route, confidence=0.2 if route is _CLARIFY else 0.9)
+
+    monkeypatch.setattr(database, "SessionLocal", _Session)
+    monkeypatch.setattr(llm_service, "route_intent", _route_intent)
+    monkeypatch.setattr(settings, "INTENT_DATASET_LOGGING", False)  # padrao: o CLI grava mesmo assim
+    monkeypatch.setattr(settings, "INTENT_DATASET_PATH", str(tmp_path / "default.jsonl"))
+
+    data = tmp_path / "custom.jsonl"
+    out = tmp_path / "model.json"
+    argv = ["train", "--from-history", "100", "--dataset", str(data), "--out", str(out)]
+    assert intent_classifier.main(argv) == 0
+
+    written = len(data.read_text().splitlines())
+    assert written == 36  # 32 de catalogo + 4 de checkout; esclarecimentos nao viram rotulo
+    assert f"{written} exemplos destilados" in capsys.readouterr().out
+    assert not (tmp_path / "default.jsonl").exists()
+    assert out.exists()
+
+
+def test_prediction_sees_the_same_text_as_the_dataset(tmp_path, monkeypatch):
+    path = tmp_path / "dataset.jsonl"
+    monkeypatch.setattr(settings, "INTENT_DATASET_LOGGING", True)
+    monkeypatch.setattr(settings, "INTENT_DATASET_PATH", str(path))
+    raw = "quero finalizar, meu email e joao@exemplo.com " + "e entreguem rapido " * 10
+    intent_classifier.record_decision(raw, {}, dict(_CHECKOUT, confidence=0.9))
+    stored = intent_classifier.load_dataset()[0]["message"]
+    assert stored != raw
+
+    model = intent_classifier.train(_samples())
+    np.testing.assert_array_equal(model.features(raw, {}), model.features(stored, {}))
@@ -0,0 +1,76 @@
+from langchain_core.documents import Document
+
+from app import index_status, rag_knowledge
+
+
+LONG_TEXT = (
+    "CP II e um cimento composto para uso comum. Serve para reboco e assentamento. "
+    "Argamassa leva cimento, areia e agua. Concreto leva tambem brita. "
+    "Evitar em ambientes agressivos como maresia. Para durabilidade maior, sugerir CP III."
+)
+
+
+def test_chunk_text_respects_size_and_overlap():
+    chunks = rag_knowledge._chunk_text(LONG_TEXT, size=120, overlap=60)
+    assert len(chunks) > 1
+    assert all(len(c) <= 120 for c in chunks)
+    # a ultima sentenca de uma passagem reaparece no inicio da seguinte
+    last_sentence = chunks[0].split(". ")[-1]
+    assert chunks[1].startswith(last_sentence.rstrip("."))
+    assert rag_knowledge._chunk_text("curto") == ["curto"]
+
+
+def test_entry_to_docs_carries_parent_metadata():
+    docs = rag_knowledge._entry_to_docs({"id": "cp2", "title": "CP II", "content": LONG_TEXT})
+    assert len(docs) >= 1
+    assert {d.metadata["parent_id"] for d in docs} == {"cp2"}
+    assert [d.metadata["chunk"] for d in docs] == list(range(len(docs)))
+    assert rag_knowledge._doc_id(docs[0]) == "cp2#0"
+
+
+class _FakeStore:
+    def __init__(self, rows):
+        self.rows = rows
+        self.k = None
+
+    def similarity_search_with_relevance_scores(self, query, k):
+        self.k = k
+        return self.rows[:k]
+
+
+def _doc(parent, chunk, text, title="T"):
+    return Document(page_content=text, metadata={"id": parent, "parent_id": parent, "chunk": chunk, "title": title})
+
+
+def test_search_dedupes_by_parent_and_keeps_best_passage(monkeypatch):
+    index_status.reset()
+    store = _FakeStore(
+        [
+            (_doc("cp2", 1, "passagem boa do cp2"), 0.82),
+            (_doc("cp2", 0, "passagem fraca do cp2"), 0.61),
+            (_doc("traco", 0, "traco 1:3"), 0.55),
+            (_doc("cp3", 0, "cp iii"), 0.20),
+        ]
+    )
+    monkeypatch.setattr(rag_knowledge, "_vectorstore", store)
+    monkeypatch.setattr(rag_knowledge, "_index_built", True)
+
+    hits = rag_knowledge.search_knowledge("cimento cp ii reboco", k=2)
+
+    assert store.k == 2 * rag_knowledge.FETCH_FACTOR
+    assert [h["id"] for h in hits] == ["cp2", "traco"]
+    assert hits[0]["content"] == "passagem boa do cp2"
+
+
+def test_format_answer_quotes_best_passage(monkeypatch):
+    monkeypatch.setattr(
+        rag_knowledge,
+        "search_knowledge",
+        lambda q, k=2: [
+            {"id": "cp2", "title": "CP II", "content": "passagem boa do cp2", "score": 0.8},
+            {"id": "traco", "title": "Traco", "content": "traco 1:3", "score": 0.6},
+        ],
+    )
+    out = rag_knowledge.format_knowledge_answer("cimento pra reboco?")
+    assert "- CP II: passagem boa do cp2" in out
+    assert "- Traco: traco 1:3" in out
@@ -0,0 +1,159 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import rag_knowledge
+from app.knowledge_watcher import _FaqEventHandler
+
+
+class _FakeEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t))] for t in texts]
+
+
+class _FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for i, doc in zip(ids, documents):
+            self.rows[i] = doc
+
+    def delete(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+
+class _FakeChroma:
+    collections = {}
+
+    def __init__(self, collection_name=None, embedding_function=None, persist_directory=None):
+        self.name = collection_name
+        self._collection = _FakeCollection(_FakeChroma.collections.setdefault(collection_name, {}))
+
+    def delete_collection(self):
+        _FakeChroma.collections.pop(self.name, None)
+
+
+def _write_faq(path, entries):
+    path.write_text(json.dumps(entries), encoding="utf-8")
+
+
+@pytest.fixture
+def faq(tmp_path, monkeypatch):
+    path = tmp_path / "faq.json"
+    _write_faq(
+        path,
+        [
+            {"id": "a", "title": "A", "content": "conteudo a"},
+            {"id": "b", "title": "B", "content": "conteudo b"},
+        ],
+    )
+    emb = _FakeEmbeddings()
+    _FakeChroma.collections = {}
+    monkeypatch.setattr(rag_knowledge, "Chroma", _FakeChroma)
+    monkeypatch.setattr(rag_knowledge, "_get_embeddings", lambda: emb)
+    monkeypatch.setattr(rag_knowledge, "FAQ_PATH", str(path))
+    monkeypatch.setattr(rag_knowledge, "CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(rag_knowledge, "_vectorstore", None)
+    monkeypatch.setattr(rag_knowledge, "_index_built", False)
+    monkeypatch.setattr(rag_knowledge, "_index_hash", None)
+    rag_knowledge.rebuild_knowledge_index()
+    emb.embedded.clear()
+    return SimpleNamespace(path=path, emb=emb)
+
+
+def _live_rows():
+    return rag_knowledge._vectorstore._collection.rows
+
+
+def test_reload_reembeds_only_added_and_changed(faq):
+    _write_faq(
+        faq.path,
+        [
+            {"id": "a", "title": "A", "content": "conteudo a"},
+            {"id": "b", "title": "B", "content": "conteudo b revisado"},
+            {"id": "c", "title": "C", "content": "conteudo c"},
+        ],
+    )
+    out = rag_knowledge.reload_knowledge_index()
+
+    assert out == {"mode": "incremental", "added": 1, "changed": 1, "removed": 0}
+    assert sorted(faq.emb.embedded) == ["conteudo b revisado", "conteudo c"]
+    assert _live_rows() == {"a#0": "conteudo a", "b#0": "conteudo b revisado", "c#0": "conteudo c"}
+    assert set(rag_knowledge._read_manifest()["entries"]) == {"a", "b", "c"}
+
+
+def test_reload_removes_deleted_entries(faq):
+    _write_faq(faq.path, [{"id": "a", "title": "A", "content": "conteudo a"}])
+    out = rag_knowledge.reload_knowledge_index()
+
+    assert out["removed"] == 1
+    assert faq.emb.embedded == []
+    assert list(_live_rows()) == ["a#0"]
+
+
+def test_reload_noop_and_invalid_json_keep_index(faq):
+    assert rag_knowledge.reload_knowledge_index() == {"mode": "noop"}
+
+    faq.path.write_text("[{\"id\": \"a\", ", encoding="utf-8")
+    assert rag_knowledge.reload_knowledge_index() == {"mode": "invalid"}
+    assert set(_live_rows()) == {"a#0", "b#0"}
+
+
+def test_reload_drops_orphan_passages_when_entry_shrinks(faq, monkeypatch):
+    monkeypatch.setattr(rag_knowledge, "CHUNK_SIZE", 30)
+    monkeypatch.setattr(rag_knowledge, "CHUNK_OVERLAP", 0)
+    long_b = "Primeira frase longa de b. Segunda frase longa de b. Terceira frase de b."
+    _write_faq(
+        faq.path,
+        [
+            {"id": "a", "title": "A", "content": "conteudo a"},
+            {"id": "b", "title": "B", "content": long_b},
+        ],
+    )
+    # chunking mudou -> reconstrucao completa
+    assert rag_knowledge.reload_knowledge_index()["mode"] == "full"
+    assert {"b#0", "b#1", "b#2"} <= set(_live_rows())
+
+    _write_faq(
+        faq.path,
+        [
+            {"id": "a", "title": "A", "content": "conteudo a"},
+            {"id": "b", "title": "B", "content": "b curto"},
+        ],
+    )
+    out = rag_knowledge.reload_knowledge_index()
+    assert out["mode"] == "incremental" and out["changed"] == 1
+    assert _live_rows() == {"a#0": "conteudo a", "b#0": "b curto"}
+    assert rag_knowledge._read_manifest()["chunk_counts"] == {"a": 1, "b": 1}
+
+
+def test_watcher_handler_debounces_faq_events(tmp_path):
+    target = tmp_path / "faq.json"
+    calls = []
+    handler = _FaqEventHandler(str(target), 0.05, lambda: calls.append(1) or {"mode": "noop"})
+
+    ev = SimpleNamespace(event_type="modified", src_path=str(target), is_directory=False)
+    other = SimpleNamespace(event_type="modified", src_path=str(tmp_path / "outro.json"), is_directory=False)
+    for _ in range(5):
+        handler.dispatch(ev)
+    handler.dispatch(other)
+
+    time.sleep(0.3)
+    assert calls == [1]
+
+    # save via temp file + rename tambem dispara
+    moved = SimpleNamespace(event_type="moved", src_path=str(tmp_path / ".faq.tmp"), dest_path=str(target), is_directory=False)
+    handler.dispatch(moved)
+    time.sleep(0.3)
+    assert calls == [1, 1]
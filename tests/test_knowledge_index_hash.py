@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from app import rag_knowledge
+
+
+class _FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(t))] for t in texts]
+
+
+class _FakeCollection:
+    def __init__(self, store):
+        self._store = store
+
+    def count(self):
+        return len(_FakeChroma.collections.get(self._store.name, []))
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if self._store.name not in _FakeChroma.built:
+            _FakeChroma.built.append(self._store.name)
+        _FakeChroma.collections.setdefault(self._store.name, []).extend(documents)
+
+
+class _FakeChroma:
+    """Chroma em memoria: collections persistem num dict por nome."""
+
+    collections = {}
+    built = []
+
+    def __init__(self, collection_name=None, embedding_function=None, persist_directory=None):
+        self.name = collection_name
+        self._collection = _FakeCollection(self)
+
+    def delete_collection(self):
+        _FakeChroma.collections.pop(self.name, None)
+
+
+def _write_faq(path, entries):
+    path.write_text(json.dumps(entries), encoding="utf-8")
+
+
+@pytest.fixture
+def knowledge_env(tmp_path, monkeypatch):
+    faq = tmp_path / "faq.json"
+    _write_faq(faq, [{"id": "a", "title": "A", "content": "conteudo a"}])
+    _FakeChroma.collections = {"knowledge_base": ["legado", "duplicado"]}
+    _FakeChroma.built = []
+    monkeypatch.setattr(rag_knowledge, "Chroma", _FakeChroma)
+    monkeypatch.setattr(rag_knowledge, "_get_embeddings", lambda: _FakeEmbeddings())
+    monkeypatch.setattr(rag_knowledge, "FAQ_PATH", str(faq))
+    monkeypatch.setattr(rag_knowledge, "CHROMA_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(rag_knowledge, "_vectorstore", None)
+    monkeypatch.setattr(rag_knowledge, "_index_built", False)
+    monkeypatch.setattr(rag_knowledge, "_index_hash", None)
+    return faq
+
+
+def _restart(monkeypatch):
+    # simula novo processo: estado em memoria zerado, disco preservado
+    monkeypatch.setattr(rag_knowledge, "_vectorstore", None)
+    monkeypatch.setattr(rag_knowledge, "_index_built", False)
+
+
+def test_first_build_writes_manifest_and_drops_legacy(knowledge_env):
+    assert rag_knowledge.rebuild_knowledge_index() == 1
+
+    manifest = rag_knowledge._read_manifest()
+    assert manifest["faq_sha256"] == rag_knowledge._faq_hash()
+    assert manifest["collection"] in _FakeChroma.collections
+    assert "knowledge_base" not in _FakeChroma.collections
+
+
+def test_same_hash_reopens_without_reembedding(knowledge_env, monkeypatch):
+    rag_knowledge.rebuild_knowledge_index()
+    assert len(_FakeChroma.built) == 1
+
+    _restart(monkeypatch)
+    assert rag_knowledge.rebuild_knowledge_index() == 1
+    assert len(_FakeChroma.built) == 1
+
+
+def test_changed_faq_rebuilds_and_swaps(knowledge_env, monkeypatch):
+    rag_knowledge.rebuild_knowledge_index()
+    old = rag_knowledge._read_manifest()["collection"]
+
+    _write_faq(
+        knowledge_env,
+        [
+            {"id": "a", "title": "A", "content": "conteudo a"},
+            {"id": "b", "title": "B", "content": "conteudo b"},
+        ],
+    )
+    _restart(monkeypatch)
+    assert rag_knowledge.rebuild_knowledge_index() == 2
+
+    new = rag_knowledge._read_manifest()["collection"]
+    assert new != old
+    assert old not in _FakeChroma.collections
+    assert list(_FakeChroma.collections) == [new]
+
+
+def test_failed_rebuild_keeps_previous_index(knowledge_env, monkeypatch):
+    rag_knowledge.rebuild_knowledge_index()
+    manifest_before = rag_knowledge._read_manifest()
+    store_before = rag_knowledge._vectorstore
+
+    def _boom(self, **kwargs):
+        raise RuntimeError("embedding falhou")
+
+    monkeypatch.setattr(_FakeCollection, "upsert", _boom)
+    assert rag_knowledge._ensure_index_ready(force=True) is False
+
+    assert rag_knowledge._read_manifest() == manifest_before
+    assert rag_knowledge._vectorstore is store_before
+    # collection parcial descartada; so a anterior continua no disco
+    assert list(_FakeChroma.collections) == [manifest_before["collection"]]
@@ -0,0 +1,107 @@
+import pytest
+
+from app import llm_breaker, llm_service, settings
+from app.llm_client import LLMTimeout
+
+
+@pytest.fixture(autouse=True)
+def _breaker_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_BREAKER_MIN_CALLS", 5)
+    monkeypatch.setattr(settings, "LLM_BREAKER_ERROR_RATE", 0.5)
+    monkeypatch.setattr(settings, "LLM_BREAKER_P95_RATIO", 0.8)
+    monkeypatch.setattr(settings, "LLM_BREAKER_OPEN_S", 30.0)
+    monkeypatch.setattr(settings, "LLM_ROUTER_DEADLINE_S", 1.0)
+
+
+def _trip(component="router"):
+    for _ in range(5):
+        llm_breaker.record(component, True, 0.1)
+
+
+def test_error_rate_opens_and_skips_calls():
+    for _ in range(4):
+        llm_breaker.record("router", True, 0.1)
+    assert llm_breaker.allow("router")  # poucas amostras ainda
+    llm_breaker.reset()
+    for failed in (True, True, False, False, False):
+        llm_breaker.record("router", failed, 0.1)
+    assert llm_breaker.get("router").state == llm_breaker.CLOSED  # 40% < 50%
+
+    _trip()
+    assert llm_breaker.get("router").state == llm_breaker.OPEN
+    assert not llm_breaker.allow("router")
+    assert llm_breaker.snapshot()["router"]["skipped"] == 1
+    # outros componentes seguem independentes
+    assert llm_breaker.allow("planner")
+
+
+def test_slow_p95_opens_even_without_errors():
+    for _ in range(5):
+        llm_breaker.record("router", False, 0.9)  # 0.9s >= 0.8 x prazo de 1s
+    assert llm_breaker.get("router").state == llm_breaker.OPEN
+
+
+def test_half_open_probe_closes_or_reopens(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BREAKER_OPEN_S", 0.0)
+    _trip()
+    assert llm_breaker.allow("router")  # vira meio-aberto e libera um teste
+    assert llm_breaker.get("router").state == llm_breaker.HALF_OPEN
+    assert not llm_breaker.allow("router")  # so um teste por vez
+    llm_breaker.record("router", True, 0.1)
+    assert llm_breaker.get("router").state == llm_breaker.OPEN
+
+    assert llm_breaker.allow("router")
+    llm_breaker.record("router", False, 0.1)
+    assert llm_breaker.get("router").state == llm_breaker.CLOSED
+
+    transitions = llm_breaker.snapshot()["router"]["transitions"]
+    assert transitions == {"closed->open": 1, "open->half_open": 2, "half_open->open": 1, "half_open->closed": 1}
+    text = llm_breaker.render_prometheus()
+    assert 'llm_breaker_state{component="router",state="closed"} 1' in text
+    assert 'llm_breaker_transitions_total{component="router",from="half_open",to="closed"} 1' in text
+
+
+class _TimeoutGroq:
+    def __init__(self):
+        self.calls = 0
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise LLMTimeout("router: sem resposta")
+
+
+def test_router_timeouts_trip_breaker_and_later_calls_skip_llm(monkeypatch):
+    fake = _TimeoutGroq()
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: fake)
+    for i in range(5):
+        assert llm_service.route_intent(f"tem cimento {i}?", {}) is None
+    assert fake.calls == 5
+    assert llm_breaker.get("router").state == llm_breaker.OPEN
+
+    assert llm_service.route_intent("tem areia?", {}) is None
+    assert fake.calls == 5
+
+
+def test_fused_route_plan_has_its_own_breaker(monkeypatch):
+    fake = _TimeoutGroq()
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: fake)
+    for i in range(5):
+        assert llm_service.route_and_plan(f"qual cimento {i}?", {}, {}) is None
+    assert llm_breaker.get("route_plan").state == llm_breaker.OPEN
+    assert llm_breaker.get("router").state == llm_breaker.CLOSED  # prompt e prazo diferentes
+
+    assert llm_service.route_and_plan("qual areia?", {}, {}) is None
+    assert fake.calls == 5
+
+
+def test_open_synthesis_breaker_uses_technical_rules(monkeypatch):
+    def _no_llm():
+        raise AssertionError("LLM nao deveria ser chamado")
+
+    monkeypatch.setattr(llm_service, "_get_groq_client", _no_llm)
+    _trip("synthesis")
+    context = {"application": "laje", "environment": "externa", "exposure": "exposto", "load_type": "residencial"}
+    text = llm_service.generate_technical_synthesis("cimento", context, [])
+    assert "resistência a sulfatos" in text
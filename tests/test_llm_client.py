@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import llm_scheduler, settings
+from app.llm_client import LLMClient, LLMTimeout
+
+
+class _FakeGroqServer:
+    """Servidor local compativel com /openai/v1/chat/completions; `delays` = atraso por requisicao."""
+
+    def __init__(self):
+        self.delays = []
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    n = server.requests
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    delay = server.delays[n] if n < len(server.delays) else 0.0
+                time.sleep(delay)
+                with server._lock:
+                    server.in_flight -= 1
+                payload = {
+                    "id": f"cmpl-{n}",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": f"resposta {n}"},
+                    }],
+                    "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+                }
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # cliente desistiu (prazo/hedge)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    srv = _FakeGroqServer()
+    yield srv
+    srv.close()
+
+
+@pytest.fixture
+def client(server):
+    c = LLMClient(api_key="test", base_url=server.url, max_in_flight=2)
+    yield c
+    c.close()
+
+
+def _call(client, **kw):
+    resp = client.chat.completions.create(
+        component="router", model="fake", messages=[{"role": "user", "content": "oi"}], **kw
+    )
+    return resp.choices[0].message.content
+
+
+def test_sync_facade_returns_sdk_response(client, server):
+    assert _call(client) == "resposta 0"
+    assert client.stats()["calls"] == 1
+
+
+def test_deadline_raises_instead_of_holding_the_worker(client, server):
+    server.delays = [1.0]
+    started = time.perf_counter()
+    with pytest.raises(LLMTimeout):
+        _call(client, deadline_s=0.3)
+    assert time.perf_counter() - started < 0.8
+    assert client.stats()["timeouts"] == 1
+
+
+def test_hedges_after_p95_and_keeps_first_answer(client, server, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_S", 0.05)
+    for _ in range(5):
+        client._record_latency("router", 0.05)
+
+    server.delays = [1.0, 0.0]  # primeira tentativa trava, a de hedge responde na hora
+    trace = {}
+    started = time.perf_counter()
+    assert _call(client, deadline_s=3.0, trace=trace) == "resposta 1"
+    assert time.perf_counter() - started < 0.8
+    stats = client.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+    assert trace == {"attempts": 2, "hedged": True}
+
+
+def test_no_hedge_without_scheduler_budget(client, server, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_S", 0.05)
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_RPM_LIMIT", 60.0)
+    for _ in range(5):
+        client._record_latency("router", 0.05)
+    sched = llm_scheduler.get_scheduler()
+    for _ in range(60):
+        sched.acquire("router", 1, timeout_s=1.0)
+
+    server.delays = [0.3, 0.0]
+    trace = {}
+    assert _call(client, deadline_s=3.0, trace=trace) == "resposta 0"
+    assert server.requests == 1
+    assert trace == {"attempts": 1, "hedge_denied": "budget"}
+    assert client.stats()["hedges"] == 0 and client.stats()["hedges_denied"] == 1
+
+
+@pytest.mark.parametrize("delays, winner, tokens_used", [
+    ([1.0, 0.0], "resposta 1", 7),  # hedge respondeu: cobra o uso real
+    ([0.3, 1.0], "resposta 0", 0),  # hedge cancelado: devolve a estimativa
+])
+def test_hedge_budget_is_settled(client, server, monkeypatch, delays, winner, tokens_used):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_S", 0.05)
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_TPM_LIMIT", 600.0)  # recarrega 10 tokens/s
+    for _ in range(5):
+        client._record_latency("router", 0.05)
+    llm_scheduler.get_scheduler().acquire("router", 300, timeout_s=1.0)
+
+    server.delays = delays
+    trace = {}
+    assert _call(client, deadline_s=3.0, trace=trace, max_tokens=200) == winner
+    assert trace["hedged"] is True
+    # sem o acerto ficariam ~100 (estimativa de 200 do hedge presa no bucket)
+    snap = llm_scheduler.get_scheduler().snapshot()
+    assert snap["tokens_available"] == pytest.approx(300 - tokens_used, abs=6)
+    assert snap["components"]["router"]["hedges"] == 1
+
+
+def test_semaphore_limits_requests_in_flight(client, server):
+    server.delays = [0.2] * 6
+    threads = [threading.Thread(target=_call, args=(client,)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert server.requests == 6
+    assert server.max_in_flight == 2
@@ -45,7 +45,7 @@ def test_router_show_catalog(monkeypatch):
     monkeypatch.setattr(flow_controller, "maybe_render_customer_message", lambda *_: None)
     monkeypatch.setattr(flow_controller, "save_chat_db", _noop)
     monkeypatch.setattr(flow_controller, "list_orcamento_items", lambda _: [])
-    monkeypatch.setattr(flow_controller, "db_find_best_products", lambda *_: [])
+    monkeypatch.setattr(flow_controller, "db_find_best_products", lambda *args, **kwargs: [])
     monkeypatch.setattr(flow_controller, "ask_usage_context", lambda *_: "Qual uso?")
     monkeypatch.setattr(flow_controller, "start_usage_context_flow", lambda *args, **kwargs: None)
 
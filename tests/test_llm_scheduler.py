@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+from app import llm_breaker, llm_scheduler, llm_service, llm_telemetry, settings
+
+
+@pytest.fixture(autouse=True)
+def _scheduler_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_RPM_LIMIT", 1000.0)
+    monkeypatch.setattr(settings, "LLM_TPM_LIMIT", 10_000.0)
+    llm_telemetry.reset()
+    yield
+    llm_telemetry.reset()
+
+
+def test_optional_work_is_shed_before_critical_work():
+    sched = llm_scheduler.Scheduler(rpm=1000, tpm=1000)
+    sched.acquire("router", 400, timeout_s=1.0)  # sobra 60%
+    sched.acquire("render", 50, timeout_s=1.0)  # 55% >= reserva de 50%
+    with pytest.raises(llm_scheduler.LLMShed):
+        sched.acquire("render", 100, timeout_s=1.0)
+    sched.acquire("synthesis", 200, timeout_s=1.0)  # 35% >= 25%
+    with pytest.raises(llm_scheduler.LLMShed):
+        sched.acquire("synthesis", 200, timeout_s=1.0)
+    sched.acquire("router", 300, timeout_s=1.0)  # critico usa ate o fim
+
+    snap = sched.snapshot()["components"]
+    assert snap["render"] == {
+        "granted": 1,
+        "shed": 1,
+        "timeouts": 0,
+        "hedges": 0,
+        "hedges_denied": 0,
+        "queue_wait_avg_ms": pytest.approx(0.0, abs=5),
+    }
+    assert snap["synthesis"]["shed"] == 1
+    assert snap["router"]["granted"] == 2
+
+
+def test_router_overtakes_waiting_planner():
+    sched = llm_scheduler.Scheduler(rpm=120, tpm=100_000)  # recarrega 2 requisicoes/s
+    for _ in range(120):
+        sched.acquire("router", 1, timeout_s=1.0)
+
+    results = {}
+
+    def _planner():
+        try:
+            sched.acquire("planner", 1, timeout_s=0.8)  # precisa de 10% de reserva: ~6s
+            results["planner"] = "granted"
+        except llm_scheduler.LLMBudgetTimeout:
+            results["planner"] = "timeout"
+
+    worker = threading.Thread(target=_planner)
+    worker.start()
+    time.sleep(0.05)
+    ticket = sched.acquire("router", 1, timeout_s=1.0)  # ~0.5s para 1 requisicao
+    worker.join()
+
+    assert 0.2 < ticket.wait_s < 0.9
+    assert results["planner"] == "timeout"
+    assert sched.snapshot()["components"]["planner"]["timeouts"] == 1
+
+
+def test_budget_timeout_is_not_a_provider_timeout():
+    sched = llm_scheduler.Scheduler(rpm=60, tpm=100_000)
+    for _ in range(60):
+        sched.acquire("router", 1, timeout_s=1.0)
+    with pytest.raises(llm_scheduler.LLMBudgetTimeout) as exc:
+        sched.acquire("planner", 1, timeout_s=0.05)
+    assert not isinstance(exc.value, TimeoutError)
+
+
+def test_hedge_needs_budget_above_the_class_reserve():
+    sched = llm_scheduler.Scheduler(rpm=1000, tpm=1000)
+    assert sched.try_acquire("planner", 500) is not None  # sobra 50% >= 10%
+    assert sched.try_acquire("planner", 450) is None  # sobraria 5%
+    assert sched.try_acquire("router", 450) is not None  # critico usa ate o fim
+    snap = sched.snapshot()
+    assert snap["tokens_available"] == pytest.approx(50, abs=5)
+    assert snap["components"]["planner"]["hedges"] == 1
+    assert snap["components"]["planner"]["hedges_denied"] == 1
+
+
+def test_settle_refunds_estimate():
+    sched = llm_scheduler.Scheduler(rpm=1000, tpm=1000)
+    ticket = sched.acquire("router", 600, timeout_s=1.0)
+    sched.settle(ticket, 100)
+    assert sched.snapshot()["tokens_available"] == pytest.approx(900, abs=5)
+
+
+class _FakeGroq:
+    def __init__(self):
+        self.calls = []
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        msg = type("Msg", (), {"content": "Mensagem polida."})()
+        return type("Resp", (), {"choices": [type("C", (), {"message": msg})()]})()
+
+
+def test_low_budget_sheds_render_and_synthesis_without_calling_llm(monkeypatch):
+    fake = _FakeGroq()
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: fake)
+    monkeypatch.setattr(settings, "LLM_TPM_LIMIT", 1000.0)
+    llm_scheduler.get_scheduler().acquire("router", 700, timeout_s=1.0)  # sobra 30%
+
+    assert llm_service.render_customer_message("neutral", {"type": "greeting"}) is None
+    context = {"application": "laje", "environment": "externa", "exposure": "exposto", "load_type": "residencial"}
+    text = llm_service.generate_technical_synthesis("cimento", context, [])
+    assert "resistência a sulfatos" in text  # TECHNICAL_RULES
+    assert fake.calls == []
+
+    snap = llm_telemetry.snapshot()
+    assert snap["render"]["outcomes"] == {"shed": 1}
+    assert snap["synthesis"]["outcomes"] == {"shed": 1}
+    # descarte local nao conta como falha do provedor
+    assert "render" not in llm_breaker.snapshot() or llm_breaker.snapshot()["render"]["window_calls"] == 0
+    assert 'llm_scheduler_requests_total{component="render",result="shed"} 1' in llm_scheduler.render_prometheus()
+
+
+def test_call_reports_queue_wait_and_remaining_deadline(monkeypatch):
+    fake = _FakeGroq()
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: fake)
+    llm_service.render_customer_message("neutral", {"type": "greeting"})
+
+    assert len(fake.calls) == 1
+    assert fake.calls[0]["component"] == "render"
+    assert fake.calls[0]["deadline_s"] <= settings.LLM_RENDER_DEADLINE_S
+    assert "llm_queue_wait_seconds_count{component=\"render\"} 1" in llm_telemetry.render_prometheus()
+
+
+def test_budget_timeouts_do_not_open_the_breaker(monkeypatch):
+    fake = _FakeGroq()
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: fake)
+    monkeypatch.setattr(settings, "LLM_BREAKER_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_BREAKER_MIN_CALLS", 2)
+    monkeypatch.setattr(settings, "LLM_RPM_LIMIT", 60.0)
+    monkeypatch.setattr(settings, "LLM_PLANNER_DEADLINE_S", 0.05)
+    sched = llm_scheduler.get_scheduler()
+    for _ in range(60):
+        sched.acquire("router", 1, timeout_s=1.0)
+
+    for _ in range(3):
+        assert llm_service.plan_consultive_next_step("pra laje", {}, "cimento", {}) is None
+    assert fake.calls == []
+
+    snap = llm_telemetry.snapshot()["planner"]
+    assert snap["outcomes"] == {"budget_timeout": 3}
+    assert snap["queue_wait_avg_ms"] >= 40
+    assert llm_breaker.get("planner").state == llm_breaker.CLOSED
+    assert llm_breaker.snapshot()["planner"]["window_calls"] == 0
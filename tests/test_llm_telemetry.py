@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from app import llm_service, llm_telemetry, settings
+from app.llm_client import LLMTimeout
+
+
+class _FakeResp:
+    def __init__(self, content: str, prompt_tokens: int = 120, completion_tokens: int = 30):
+        self.choices = [type("C", (), {"message": type("M", (), {"content": content})()})()]
+        self.usage = type("U", (), {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})()
+
+
+class _FakeGroq:
+    def __init__(self, content=None, error=None):
+        self._content = content
+        self._error = error
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        if self._error is not None:
+            raise self._error
+        kwargs["trace"]["attempts"] = 1
+        return _FakeResp(self._content)
+
+
+@pytest.fixture(autouse=True)
+def _telemetry(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_LOG_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_TELEMETRY_LOG_PATH", str(tmp_path / "llm_calls.jsonl"))
+    llm_telemetry.reset()
+    yield
+    llm_telemetry.reset()
+
+
+def _mock_groq(monkeypatch, **kw):
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: _FakeGroq(**kw))
+
+
+def _rows():
+    with open(settings.LLM_TELEMETRY_LOG_PATH, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_router_call_records_tokens_latency_and_cost(monkeypatch):
+    payload = {
+        "intent": "BROWSE_CATALOG",
+        "product_query": "cimento",
+        "category_hint": "cimento",
+        "constraints": {},
+        "action": "SHOW_CATALOG",
+        "clarifying_question": None,
+        "confidence": 0.9,
+    }
+    _mock_groq(monkeypatch, content=json.dumps(payload))
+    assert llm_service.route_intent("tem cimento?", {})
+
+    router = llm_telemetry.snapshot()["router"]
+    assert router["calls"] == 1 and router["outcomes"] == {"ok": 1}
+    assert router["prompt_tokens"] == 120 and router["completion_tokens"] == 30
+    assert router["cost_usd"] > 0
+
+    (row,) = _rows()
+    assert row["component"] == "router" and row["model"] == llm_service.LLM_MODEL
+    assert row["outcome"] == "ok" and row["attempts"] == 1
+    assert row["latency_ms"] >= 0
+
+
+def test_parse_and_validation_failures_are_counted(monkeypatch):
+    _mock_groq(monkeypatch, content="nao eh json")
+    assert llm_service.route_intent("tem cimento?", {}) is None
+    _mock_groq(monkeypatch, content=json.dumps({"intent": "QUALQUER"}))
+    assert llm_service.plan_consultive_next_step("cimento", {}, "cimento", {}) is None
+
+    snap = llm_telemetry.snapshot()
+    assert snap["router"]["outcomes"] == {"parse_error": 1}
+    assert snap["planner"]["outcomes"] == {"invalid": 1}
+
+
+def test_timeout_is_recorded_and_call_falls_back(monkeypatch):
+    _mock_groq(monkeypatch, error=LLMTimeout("router: sem resposta"))
+    assert llm_service.route_intent("tem cimento?", {}) is None
+
+    (row,) = _rows()
+    assert row["outcome"] == "timeout"
+    assert row["prompt_tokens"] is None and row["cost_usd"] is None
+
+
+def test_prometheus_export_has_histogram_and_counters(monkeypatch):
+    _mock_groq(monkeypatch, content="2")
+    assert llm_service.interpret_choice("a segunda", [{"nome": "A"}, {"nome": "B"}]) == 2
+
+    text = llm_telemetry.render_prometheus()
+    assert 'llm_calls_total{component="choice",outcome="ok"} 1' in text
+    assert 'llm_call_latency_seconds_bucket{component="choice",le="+Inf"} 1' in text
+    assert 'llm_call_latency_seconds_count{component="choice"} 1' in text
+    assert 'llm_tokens_total{component="choice",kind="prompt"} 120' in text
@@ -0,0 +1,117 @@
+import json
+import time
+
+import pytest
+
+from app import llm_service, llm_transport, settings
+from app.llm_client import LLMTimeout
+
+
+@pytest.fixture
+def synthetic(monkeypatch):
+    transport = llm_transport.SyntheticTransport(seed=1)
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: transport)
+    return transport
+
+
+def test_synthetic_router_and_planner_pass_validation(synthetic):
+    route = llm_service.route_intent("qual melhor cimento pra laje?", {})
+    assert route and route["intent"] == "TECHNICAL_QUESTION"
+    assert route["action"] == "ASK_USAGE_CONTEXT"
+    assert "cimento" in route["product_query"]
+
+    assert llm_service.route_intent("quero finalizar o pedido", {})["action"] == "HANDOFF_CHECKOUT"
+
+    plan = llm_service.plan_consultive_next_step("pra laje", {}, "cimento", {"application": "laje"})
+    assert plan and plan["next_action"] == "ASK_CONTEXT" and plan["missing_fields"] == ["environment"]
+    ready = llm_service.plan_consultive_next_step("externa", {}, "cimento", {"application": "laje", "environment": "externa"})
+    assert ready and ready["next_action"] == "READY_TO_ANSWER"
+
+
+def test_synthetic_fused_and_choice(synthetic):
+    fused = llm_service.route_and_plan("qual melhor cimento pra laje?", {}, {})
+    assert fused and fused["plan"] and fused["plan"]["next_action"] == "ASK_CONTEXT"
+    assert llm_service.interpret_choice("quero a segunda", [{"nome": "A"}, {"nome": "B"}]) == 2
+    assert llm_service.interpret_choice("nao sei", [{"nome": "A"}]) is None
+
+
+def test_synthetic_latency_is_seeded_and_respects_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_SYNTHETIC_LATENCY_MS", 200.0)
+    a = llm_transport.SyntheticTransport(seed=7)
+    b = llm_transport.SyntheticTransport(seed=7)
+    assert [a.synthetic_latency() for _ in range(5)] == [b.synthetic_latency() for _ in range(5)]
+
+    monkeypatch.setattr(settings, "LLM_SYNTHETIC_LATENCY_MS", 5000.0)
+    monkeypatch.setattr(settings, "LLM_SYNTHETIC_LATENCY_SIGMA", 0.0)
+    started = time.perf_counter()
+    with pytest.raises(LLMTimeout):
+        a.chat.completions.create(component="router", deadline_s=0.05, model="m", messages=[{"role": "user", "content": "oi"}])
+    assert time.perf_counter() - started < 1.0
+
+
+class _LiveFake:
+    """Cliente 'de verdade' para gravar: responde um JSON de rota fixo."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content = json.dumps({
+            "intent": "FIND_PRODUCT",
+            "product_query": f"areia {self.calls}",
+            "category_hint": "areia",
+            "constraints": {},
+            "action": "SEARCH_PRODUCTS",
+            "clarifying_question": None,
+            "confidence": 0.9,
+        })
+        return llm_transport.make_response(content, kwargs["model"], 100, 20)
+
+
+def test_record_then_replay_serves_same_answers_offline(monkeypatch, tmp_path):
+    path = str(tmp_path / "rec.jsonl")
+    live = _LiveFake()
+    recorder = llm_transport.RecordingTransport(live, path=path)
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: recorder)
+    first = llm_service.route_intent("tem areia?", {})
+    second = llm_service.route_intent("tem areia fina?", {})
+    assert live.calls == 2
+
+    monkeypatch.setattr(settings, "LLM_REPLAY_LATENCY", "none")
+    replay = llm_transport.ReplayTransport(path=path)
+    assert len(replay) == 2
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: replay)
+    from app import router_cache
+
+    router_cache.clear()
+    assert llm_service.route_intent("tem areia?", {}) == first
+    assert llm_service.route_intent("tem areia fina?", {}) == second
+    assert (replay.hits, replay.misses) == (2, 0)
+    assert live.calls == 2
+
+
+def test_replay_miss_falls_back_to_synthetic_or_errors(monkeypatch, tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("", encoding="utf-8")
+    replay = llm_transport.ReplayTransport(path=str(path))
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: replay)
+
+    monkeypatch.setattr(settings, "LLM_REPLAY_ON_MISS", "synthetic")
+    assert llm_service.route_intent("tem cimento?", {})["action"] == "SEARCH_PRODUCTS"
+
+    monkeypatch.setattr(settings, "LLM_REPLAY_ON_MISS", "error")
+    assert llm_service.route_intent("tem tijolo?", {}) is None
+    assert replay.misses == 2
+
+
+def test_build_client_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        llm_transport.build_client("mock", lambda: None)
+    assert isinstance(llm_transport.build_client("synthetic", lambda: None), llm_transport.SyntheticTransport)
+
+
+def test_offline_transport_requires_respond():
+    with pytest.raises(TypeError):
+        llm_transport._OfflineTransport(seed=1)
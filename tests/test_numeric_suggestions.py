@@ -34,7 +34,7 @@ def test_numeric_selection_after_usage_context(monkeypatch):
         {"id": 2, "nome": "Produto 2"},
         {"id": 3, "nome": "Produto 3"},
     ]
-    monkeypatch.setattr(usage_context, "db_find_best_products", lambda *args, **kwargs: products)
+    monkeypatch.setattr(usage_context, "db_find_best_products_batch", lambda *args, **kwargs: [products, []])
     monkeypatch.setattr("app.flows.consultive_investigation.start_investigation", lambda *_: None)
 
     # Executa fluxo que popula last_suggestions
@@ -57,7 +57,7 @@ def test_numeric_selection_after_usage_context(monkeypatch):
     def _db_get_product_by_id(pid):
         return _FakeProd(pid)
 
-    def _set_pending_for_qty(session_id, produto, requested_kg=None):
+    def _set_pending_for_qty(session_id, produto, requested=None):
         return f"qty-set-{produto.id}"
 
     monkeypatch.setattr(flow_controller, "get_state", _get_state)
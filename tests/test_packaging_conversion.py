@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import catalog_cache
+from app.flows import quantity
+from app.parsing import extract_measure_quantity, measure_as_units, units_from_conversion
+from app.product_attributes import conversion_row, packaging_conversions
+
+
+@pytest.mark.parametrize(
+    "nome,expected",
+    [
+        ("Cimento CP V-ARI 40kg", {"kg": 40.0}),
+        ("Impermeabilizante Cimentício 18kg", {"kg": 18.0}),
+        ("Prego 18x30 500g", {"kg": 0.5}),
+        ("Vergalhão CA-50 10mm (3/8) 12m", {"m": 12.0}),
+        ("Tela Soldada Q-92 2x3m", {"m2": 6.0}),
+        ("Porcelanato 60x60 Caixa 2,16m²", {"m2": 2.16}),
+        ("Parafuso Phillips 4x40 Caixa com 100", {"pc": 100.0}),
+        ("Tinta Acrílica Fosca Branca 18L", {"l": 18.0, "m2": 180.0}),
+    ],
+)
+def test_conversion_table_from_product_name(nome, expected):
+    assert conversion_row(packaging_conversions(nome)) == expected
+
+
+def test_paint_yield_from_description_wins_over_estimate():
+    conv = packaging_conversions("Tinta Acrílica Premium 18L", "Rende até 380 m² por demão")
+    assert conv["m2_por_unidade"] == 380.0
+
+
+@pytest.mark.parametrize(
+    "msg,expected",
+    [
+        ("quero 200kg", (200.0, "kg")),
+        ("2,5 litros", (2.5, "l")),
+        ("uns 60m² de parede", (60.0, "m2")),
+        ("30 metros", (30.0, "m")),
+        ("tubo 25mm", None),
+        ("4 sacos", None),
+    ],
+)
+def test_extract_measure_quantity(msg, expected):
+    assert extract_measure_quantity(msg) == expected
+
+
+def test_units_round_up_to_whole_packages():
+    assert units_from_conversion({"kg": 50.0}, 120, "kg", "SC") == (3.0, "120kg ≈ 3 saco(s) de 50kg")
+    assert units_from_conversion({"m": 12.0}, 30, "m", "BR")[0] == 3.0
+    assert units_from_conversion({"m2": 180.0}, 400, "m2")[0] == 3.0
+    assert units_from_conversion({"kg": 50.0}, 30, "m") is None
+
+
+def test_pending_qty_converts_with_cached_table(monkeypatch):
+    produto = SimpleNamespace(id=7, nome="Argamassa AC-III", unidade="SC", preco=30.0, estoque_atual=50)
+    state = {"awaiting_qty": True, "pending_product_id": 7}
+    added = []
+
+    monkeypatch.setattr(catalog_cache, "get_many", lambda ids: {7: {"nome": produto.nome, "conversao": {"kg": 15.0}}})
+    monkeypatch.setattr(quantity, "get_state", lambda sid: state)
+    monkeypatch.setattr(quantity, "patch_state", lambda sid, patch: state.update(patch))
+    monkeypatch.setattr(quantity, "db_get_product_by_id", lambda pid: produto)
+    monkeypatch.setattr(quantity, "add_item_to_orcamento", lambda sid, p, qty: added.append(qty) or (True, "ok"))
+    monkeypatch.setattr(quantity, "format_orcamento", lambda sid: "")
+
+    # nome sem o peso: vale a tabela de conversao (tamanho fora do antigo 20/25/50)
+    quantity.handle_pending_qty("s1", "preciso de 100kg")
+    assert added == [7.0]
+
+
+def test_conversions_fall_back_to_name_when_cache_is_down(monkeypatch):
+    def _down(ids):
+        raise RuntimeError("banco fora")
+
+    monkeypatch.setattr(catalog_cache, "get_many", _down)
+    assert catalog_cache.conversions(1, nome="Cimento CP II 40kg") == {"kg": 40.0}
+
+
+@pytest.mark.parametrize(
+    "unidade,msg,expected",
+    [
+        ("M", "30 metros", 30.0),
+        ("KG", "2,5kg", 2.5),
+        ("M2", "uns 60m²", 60.0),
+    ],
+)
+def test_pending_qty_sold_by_the_requested_measure_is_one_to_one(monkeypatch, unidade, msg, expected):
+    produto = SimpleNamespace(id=8, nome="Cabo Flexivel 2,5mm", unidade=unidade, preco=3.0, estoque_atual=500)
+    state = {"awaiting_qty": True, "pending_product_id": 8}
+    added = []
+
+    # sem linha de conversao no cadastro
+    monkeypatch.setattr(catalog_cache, "get_many", lambda ids: {8: {"nome": produto.nome, "conversao": {}}})
+    monkeypatch.setattr(quantity, "get_state", lambda sid: state)
+    monkeypatch.setattr(quantity, "patch_state", lambda sid, patch: state.update(patch))
+    monkeypatch.setattr(quantity, "db_get_product_by_id", lambda pid: produto)
+    monkeypatch.setattr(quantity, "add_item_to_orcamento", lambda sid, p, qty: added.append(qty) or (True, "ok"))
+    monkeypatch.setattr(quantity, "format_orcamento", lambda sid: "")
+
+    reply = quantity.handle_pending_qty("s1", msg)
+    assert "nao indica" not in reply
+    assert added == [expected]
+
+
+def test_other_measure_still_needs_conversion():
+    assert measure_as_units(5, "kg", "M") is None
+    assert measure_as_units(5, "m", "RL") is None  # rolo: tabela de conversao decide
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base, CategoriaProduto, Produto, ProdutoAtributo
+from app import product_attributes
+from app.conversation import policy
+from app.product_attributes import extract_attributes, find_candidates, sync_product_attributes
+
+
+def test_extracts_typed_attributes_from_names():
+    cimento = extract_attributes("Cimento CP II-E-32 50kg")
+    assert cimento["cp_classe"] == "CP II-E-32"
+    assert cimento["kg_embalagem"] == 50.0
+    assert extract_attributes("Cimento CP V-ARI 40kg")["cp_classe"] == "CP V-ARI"
+
+    tinta = extract_attributes("Tinta Esmalte Sintético Preto 900ml", "Esmalte para metais e madeiras")
+    assert tinta["categoria_schema"] == "tintas"
+    assert tinta["volume_l"] == pytest.approx(0.9)
+    assert tinta["atributos"] == {"base": "solvente", "volume": pytest.approx(0.9)}
+
+    # mm2 (bitola de fio) nao e diametro; polegada so vale para tubos
+    assert extract_attributes("Fio Flexível 2,5mm² 100m")["diametro_mm"] is None
+    assert extract_attributes("Trincha 2 Polegadas")["diametro_mm"] is None
+    assert extract_attributes("Joelho PVC Soldável 3/4\"")["diametro_mm"] == 25.0
+
+
+def test_schema_attributes_for_tubes():
+    out = extract_attributes("Joelho 90° PVC Soldável 25mm", "Conexão em curva 90 graus para tubo soldável")
+    assert out["categoria_schema"] == "tubos_conexoes"
+    assert out["atributos"] == {
+        "item": "joelho",
+        "material": "pvc",
+        "angulo": "90",
+        "diametro": 25.0,
+        "tipo_conexao": "soldavel",
+    }
+    # cita pintura, mas e ferramenta
+    assert extract_attributes("Rolo de Lã para Pintura 23cm")["categoria_schema"] is None
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[CategoriaProduto.__table__, Produto.__table__, ProdutoAtributo.__table__],
+    )
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        Produto(id=1, nome="Tubo PVC Soldável 25mm 6m", descricao="Tubo para água fria", preco=30, estoque_atual=5, ativo=True),
+        Produto(id=2, nome="Tubo PVC Soldável 50mm 6m", descricao="Tubo para água fria", preco=60, estoque_atual=5, ativo=True),
+        Produto(id=3, nome="Tubo Esgoto PVC 100mm 6m", descricao="Tubo para esgoto", preco=90, estoque_atual=5, ativo=True),
+        Produto(id=4, nome="Tubo PVC Soldável 32mm 6m", descricao="Tubo para água fria", preco=40, estoque_atual=0, ativo=False),
+        Produto(id=5, nome="Cimento CP II-E-32 50kg", descricao="", preco=38, estoque_atual=10, ativo=True),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_sync_is_incremental_and_removes_missing_products(db):
+    assert sync_product_attributes(db=db) == {"scanned": 5, "updated": 5, "removed": 0}
+    assert sync_product_attributes(db=db)["updated"] == 0
+
+    db.query(Produto).filter(Produto.id == 2).update({"nome": "Tubo PVC Soldável 40mm 6m"})
+    db.query(Produto).filter(Produto.id == 5).delete()
+    db.commit()
+
+    assert sync_product_attributes(db=db) == {"scanned": 4, "updated": 1, "removed": 1}
+    assert float(db.get(ProdutoAtributo, 2).diametro_mm) == 40.0
+
+
+def test_candidates_feed_policy_with_real_attributes(db):
+    sync_product_attributes(db=db)
+
+    candidates, total = find_candidates("tubos_conexoes", {"item": "tubo", "material": "pvc"}, db=db)
+    assert total == 3  # inativo fica de fora
+    assert {c["id"] for c in candidates} == {1, 2, 3}
+
+    # sistema_uso divide em 2 (agua fria x esgoto); diametro divide em 3
+    action = policy.next_action("tubos_conexoes", {"item": "tubo", "material": "pvc"}, {}, candidates, total)
+    assert action["slot"] == "diametro"
+
+    narrowed, total = find_candidates(
+        "tubos_conexoes", {"item": "tubo", "sistema_uso": "agua_fria", "diametro": "50mm"}, db=db
+    )
+    assert total == 1 and narrowed[0]["id"] == 2
+    assert narrowed[0]["attributes"]["diametro"] == 50.0
+
+
+def test_candidates_degrade_to_empty_without_table(monkeypatch):
+    def _broken():
+        raise RuntimeError("banco fora")
+
+    monkeypatch.setattr(product_attributes, "SessionLocal", _broken)
+    assert find_candidates("tintas", {}) == ([], 0)
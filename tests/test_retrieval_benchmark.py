@@ -0,0 +1,23 @@
+from benchmarks import retrieval
+from database import SessionLocal
+
+
+def test_metrics():
+    assert retrieval.recall_at_k([3, 1, 2], [1, 9], k=2) == 0.5
+    assert retrieval.reciprocal_rank([3, 1, 2], [1, 2], k=3) == 0.5
+    assert retrieval.reciprocal_rank([3], [1], k=3) == 0.0
+    assert retrieval.percentile([5, 1, 3, 2, 4], 50) == 3
+    assert retrieval.percentile([], 95) is None
+
+
+def test_benchmark_runs_on_seeded_sqlite_and_restores_bind():
+    bind_before = SessionLocal.kw.get("bind")
+
+    report = retrieval.run_benchmark(k=5, strategies=["sql_ilike", "db_find_best_products"], details=True)
+
+    assert SessionLocal.kw.get("bind") is bind_before
+    assert report["config"]["queries"] == len(report["results"][0]["queries"])
+    by_name = {r["strategy"]: r for r in report["results"]}
+    assert by_name["sql_ilike"]["db_queries_per_query"] == 1.0
+    assert 0.0 < by_name["db_find_best_products"]["recall@5"] <= 1.0
+    assert by_name["db_find_best_products"]["errors"] == 0
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+
+from app import llm_service, router_cache, settings
+
+
+class _CountingGroq:
+    def __init__(self, payload):
+        self.calls = 0
+        self._content = json.dumps(payload)
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls += 1
+        msg = type("M", (), {"content": self._content})()
+        return type("R", (), {"choices": [type("C", (), {"message": msg})()]})()
+
+
+_ROUTE = {
+    "intent": "BROWSE_CATALOG",
+    "product_query": "cimento",
+    "category_hint": "cimento",
+    "constraints": {},
+    "action": "SHOW_CATALOG",
+    "clarifying_question": None,
+    "confidence": 0.9,
+}
+
+
+def test_router_reuses_route_for_same_message_and_state(monkeypatch):
+    groq = _CountingGroq(_ROUTE)
+    monkeypatch.setattr(llm_service, "_get_groq_client", lambda: groq)
+
+    state = {"in_checkout": False, "asked_context_fields": ["uso", "ambiente"]}
+    first = llm_service.route_intent("Tem cimento?", state)
+    # mesma mensagem normalizada e mesmo estado (listas sem ordem): nao chama o LLM
+    again = llm_service.route_intent("tem  CIMENTO", {"asked_context_fields": ["ambiente", "uso"], "in_checkout": False})
+    assert again == dict(first, source="cache") and groq.calls == 1
+    assert "source" not in first
+
+    # estado diferente muda a decisao do router: nova chamada
+    llm_service.route_intent("tem cimento?", {"in_checkout": True})
+    assert groq.calls == 2
+    assert router_cache.stats()["hits_exact"] == 1
+    assert router_cache.stats()["hit_rate"] == 0.3333
+
+
+def test_cache_expires_and_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "ROUTER_CACHE_MAX_ENTRIES", 2)
+    for msg in ("quero areia", "quero brita", "quero cal"):
+        router_cache.put(msg, {}, dict(_ROUTE))
+    assert router_cache.get("quero areia", {}) is None
+    assert router_cache.get("quero cal", {}) is not None
+    assert router_cache.stats()["evictions"] == 1
+
+    monkeypatch.setattr(settings, "ROUTER_CACHE_TTL_S", 0.0)
+    router_cache.put("quero tijolo", {}, dict(_ROUTE))
+    assert router_cache.get("quero tijolo", {}) is None
+    assert router_cache.stats()["expired"] >= 1
+
+
+def test_semantic_tier_requires_same_content_terms(monkeypatch):
+    class _Emb:
+        def embed_query(self, text):
+            # so as palavras de conteudo pesam: variacoes de frase ficam quase iguais
+            return [1.0, 0.05 * len(text.split())]
+
+    monkeypatch.setattr(settings, "ROUTER_CACHE_SEMANTIC", True)
+    monkeypatch.setattr("app.embeddings.get_embeddings", lambda name: _Emb())
+
+    router_cache.put("voces tem cimento?", {}, dict(_ROUTE))
+    hit = router_cache.get("tem cimento ai?", {})
+    assert hit and hit["product_query"] == "cimento"
+    assert router_cache.get("voces tem areia?", {}) is None
+    assert router_cache.stats()["hits_semantic"] == 1
+
+    monkeypatch.setattr(settings, "ROUTER_CACHE_SIM_THRESHOLD", 1.01)
+    assert router_cache.get("tem cimento ai?", {}) is None
+    assert np.isclose(router_cache.stats()["hit_rate"], 1 / 3, atol=1e-3)
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+from app import catalog_cache, index_status, product_search, rag_products
+
+
+class _FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+class _FakeCollection:
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def query(self, query_embeddings, n_results, where=None, include=None):
+        self.calls.append({"n": len(query_embeddings), "k": n_results, "where": where})
+        picked = [self.results[int(v[0])] for v in query_embeddings]
+        return {
+            "metadatas": [[{"id_produto": pid} for pid, _ in hits][:n_results] for hits in picked],
+            "distances": [[d for _, d in hits][:n_results] for hits in picked],
+        }
+
+
+def _live(pid, preco=10.0):
+    return {"id_produto": pid, "nome": f"Produto {pid}", "unidade": "UN", "preco": preco, "estoque": 5.0, "ativo": True}
+
+
+def _setup(monkeypatch, results):
+    index_status.reset()
+    emb = _FakeEmbeddings()
+    col = _FakeCollection(results)
+    lookups = []
+
+    def _get_many(ids):
+        ids = list(ids)
+        lookups.append(ids)
+        return {i: _live(i) for i in ids if i != 404}
+
+    monkeypatch.setattr(rag_products, "_vectorstore", SimpleNamespace(_collection=col))
+    monkeypatch.setattr(rag_products, "_ensure_index_ready", lambda: True)
+    monkeypatch.setattr(rag_products, "_get_embeddings", lambda: emb)
+    monkeypatch.setattr(catalog_cache, "get_many", _get_many)
+    return emb, col, lookups
+
+
+def test_batch_uses_one_forward_pass_one_query_and_one_lookup(monkeypatch):
+    # a "embedding" fake e o tamanho do texto: indexa o resultado de cada query
+    emb, col, lookups = _setup(monkeypatch, {3: [(1, 0.1), (2, 0.5)], 5: [(404, 0.1), (3, 0.2)]})
+
+    out = rag_products.search_products_batch(["abc", "", "abcde"], k=2, min_score=0.0)
+
+    assert [[r["id_produto"] for r in hits] for hits in out] == [[1, 2], [], [3]]
+    assert emb.calls == [["abc", "abcde"]]
+    assert len(col.calls) == 1 and col.calls[0]["n"] == 2
+    assert len(lookups) == 1
+
+
+def test_batch_applies_min_score(monkeypatch):
+    _setup(monkeypatch, {3: [(1, 0.1), (2, 9.0)]})
+    out = rag_products.search_products_batch(["abc"], k=2, min_score=0.5)
+    assert [r["id_produto"] for r in out[0]] == [1]
+
+
+def test_db_batch_falls_back_to_sql_in_a_single_session(monkeypatch):
+    sessions = []
+
+    class _Query:
+        def filter(self, *args):
+            return self
+
+        def limit(self, k):
+            return self
+
+        def all(self):
+            return [SimpleNamespace(id=9, nome="Areia Media", preco=140, unidade="M3", estoque_atual=3, descricao="")]
+
+    class _Session:
+        def __init__(self):
+            sessions.append(self)
+            self.closed = False
+
+        def query(self, model):
+            return _Query()
+
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(product_search, "SessionLocal", _Session)
+    monkeypatch.setattr(
+        product_search,
+        "search_products_batch",
+        lambda qs, k, min_score, **filters: [[_live(1) | {"score": 0.9}], [], []],
+    )
+
+    out = product_search.db_find_best_products_batch(["cimento", "tijolo", "brita"], k=3)
+
+    assert out[0][0]["id"] == 1
+    assert out[1][0]["id"] == 9 and out[2][0]["id"] == 9
+    assert len(sessions) == 1 and sessions[0].closed
+
+
+def test_db_batch_pushes_filters_and_retries_without_category(monkeypatch):
+    calls = []
+
+    def _batch(qs, k, min_score, **filters):
+        calls.append((list(qs), filters))
+        if filters.get("category"):
+            return [[], [_live(2) | {"score": 0.8}]]
+        return [[_live(5) | {"score": 0.7}]]
+
+    monkeypatch.setattr(catalog_cache, "category_ids", lambda hint: [1] if hint == "cimento" else [])
+    monkeypatch.setattr(product_search, "search_products_batch", _batch)
+
+    out = product_search.db_find_best_products_batch(["cimento para laje", "cimento"], k=3, category_hint="cimento")
+
+    assert [[r["id"] for r in hits] for hits in out] == [[5], [2]]
+    assert calls == [
+        (["cimento para laje", "cimento"], {"in_stock": True, "category": "cimento"}),
+        (["cimento para laje"], {"in_stock": True}),
+    ]
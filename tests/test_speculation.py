@@ -0,0 +1,93 @@
+import threading
+import time
+
+from app import flow_controller, settings, speculation
+
+
+def _route(action="SEARCH_PRODUCTS"):
+    return {
+        "intent": "FIND_PRODUCT",
+        "product_query": "areia fina",
+        "category_hint": "areia",
+        "constraints": {},
+        "action": action,
+        "clarifying_question": None,
+        "confidence": 0.9,
+    }
+
+
+def test_route_is_reused_only_for_the_same_state():
+    turn = speculation.SpeculativeTurn()
+    turn.start_route(lambda cancelled: ({"cart_has_items": False}, "rota"))
+    assert turn.route_for({"cart_has_items": False}) == "rota"
+
+    stale = speculation.SpeculativeTurn()
+    stale.start_route(lambda cancelled: ({"cart_has_items": False}, "rota"))
+    assert stale.route_for({"cart_has_items": True}) is None
+
+
+def test_catalog_prefetch_matches_on_content_terms():
+    turn = speculation.SpeculativeTurn()
+    turn.start_catalog("tem areia fina", lambda: [{"id": 1, "nome": "Areia fina"}])
+    assert turn.catalog_for("areia fina") == [{"id": 1, "nome": "Areia fina"}]
+    assert turn.catalog_for("areia grossa") is None
+
+
+def test_cancel_stops_work_that_has_not_started():
+    ran = []
+    gate = threading.Event()
+    turn = speculation.SpeculativeTurn()
+
+    def _slow(cancelled):
+        gate.wait(1.0)
+        if cancelled.is_set():
+            return None
+        ran.append("llm")
+        return "k", "rota"
+
+    turn.start_route(_slow)
+    turn.cancel()
+    gate.set()
+    time.sleep(0.05)
+    assert ran == []
+    assert turn.route_for("k") is None
+
+
+def test_start_speculation_runs_router_and_prefetch_in_parallel(monkeypatch):
+    monkeypatch.setattr(settings, "ROUTER_SPECULATIVE_ENABLED", True)
+    monkeypatch.setattr(flow_controller, "list_orcamento_items", lambda *_: [])
+    calls = []
+
+    def _route_intent(message, state_summary):
+        calls.append(message)
+        time.sleep(0.2)
+        return _route()
+
+    def _find(query, k=6, category_hint=None):
+        time.sleep(0.2)
+        return [{"id": 7, "nome": "Areia fina"}]
+
+    monkeypatch.setattr(flow_controller, "route_intent", _route_intent)
+    monkeypatch.setattr(flow_controller, "db_find_best_products", _find)
+
+    st = {}
+    started = time.perf_counter()
+    turn = flow_controller._start_speculation("s1", "tem areia fina?", st)
+    assert turn is not None
+
+    key = (flow_controller._build_state_summary("s1", st), flow_controller._build_known_context(st, {}))
+    route, from_llm = turn.route_for(key)
+    options = turn.catalog_for("areia fina")
+    # LLM e busca em paralelo: ~max(0.2, 0.2), nao a soma
+    assert time.perf_counter() - started < 0.35
+    assert route["action"] == "SEARCH_PRODUCTS" and from_llm is True
+    assert options == [{"id": 7, "nome": "Areia fina"}]
+    assert calls == ["tem areia fina?"]
+
+
+def test_no_speculation_for_deterministic_turns(monkeypatch):
+    monkeypatch.setattr(settings, "ROUTER_SPECULATIVE_ENABLED", True)
+    assert flow_controller._start_speculation("s1", "bom dia", {}) is None
+    assert flow_controller._start_speculation("s1", "tem areia?", {"awaiting_qty": True}) is None
+    monkeypatch.setattr(settings, "ROUTER_SPECULATIVE_ENABLED", False)
+    assert flow_controller._start_speculation("s1", "tem areia?", {}) is None
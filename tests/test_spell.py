@@ -0,0 +1,80 @@
+import pytest
+
+from app import spell
+from app.parsing import extract_product_hint
+from app.text_utils import has_product_intent, norm
+
+
+@pytest.fixture(autouse=True)
+def offline_index():
+    # indice so com vocabulario de dominio (sem banco nem lexico do sistema)
+    spell.set_index(spell.build_index(include_catalog=False, lexicon=()))
+    yield
+    spell.set_index(None)
+
+
+@pytest.mark.parametrize(
+    "typo,expected",
+    [
+        ("cimeto", "cimento"),
+        ("argamaça", "argamassa"),
+        ("tijolu", "tijolo"),
+        ("porcelanto", "porcelanato"),
+        ("impermiabilizante", "impermeabilizante"),
+    ],
+)
+def test_corrects_common_typos(typo, expected):
+    assert spell.correct_token(norm(typo)) == expected
+
+
+@pytest.mark.parametrize("word", ["maria", "mesa", "preciso", "sacos", "200kg", "cp"])
+def test_keeps_known_short_or_unrelated_tokens(word):
+    assert spell.correct_token(norm(word)) == norm(word)
+
+
+@pytest.mark.parametrize(
+    "word",
+    ["forro", "liso", "lisa", "pino", "fino", "pinta", "seco", "seca"],
+)
+def test_keeps_real_words_close_to_products(word):
+    # 1 edicao de "ferro", "piso", "lixa", "fio", "tinta", "saco"...: palavra real, nao erro
+    assert spell.correct_token(word) == word
+
+
+def test_real_words_do_not_change_the_product_hint():
+    assert spell.correct_text("quero forro de pvc") == "quero forro de pvc"
+    assert extract_product_hint("quero forro de pvc") != "ferro"
+
+
+def test_lexicon_words_are_never_corrected():
+    idx = spell.build_index(include_catalog=False, lexicon=["pisa", "tinto"])
+    assert spell.correct_token("pisa", idx) == "pisa"
+    assert spell.correct_token("tinto", idx) == "tinto"
+    assert spell.correct_token("tinnta", idx) == "tinta"
+
+
+def test_short_token_needs_a_clear_winner():
+    # "sabo": "saco" e "sapo" empatam em 1 edicao -> nao arrisca; "tnta" so tem "tinta"
+    idx = spell.SymSpellIndex()
+    for word, count in (("saco", 50), ("sapo", 50), ("tinta", 100)):
+        idx.add(word, count)
+    assert spell.correct_token("sabo", idx) == "sabo"
+    assert spell.correct_token("tnta", idx) == "tinta"
+
+
+def test_extra_words_join_vocabulary():
+    idx = spell.build_index(extra_words=["votoran"], include_catalog=False)
+    assert spell.correct_text("cimento votorann", idx) == "cimento votoran"
+
+
+def test_typos_no_longer_hide_product_intent():
+    assert has_product_intent("me ve 10 tijolu")
+    assert extract_product_hint("quero cimeto") == "cimento"
+
+
+def test_corrections_are_counted_for_tuning():
+    spell._stats.clear()
+    spell.correct_text("cimeto cimeto tinnta")
+    stats = {(s["token"], s["corrected"]): s["count"] for s in spell.correction_stats()}
+    assert stats[("cimeto", "cimento")] == 2
+    assert stats[("tinnta", "tinta")] == 1
@@ -0,0 +1,65 @@
+import pytest
+
+from app import llm_service, settings, synthesis_table
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TECHNICAL_SYNTHESIS_TABLE_PATH", str(tmp_path / "synthesis.json"))
+    monkeypatch.setattr(settings, "TECHNICAL_SYNTHESIS_TABLE_ENABLED", True)
+    synthesis_table.reset()
+    yield tmp_path / "synthesis.json"
+    synthesis_table.reset()
+
+
+def _fake_llm(product, ctx, factors):
+    env = f" {ctx['environment']}" if ctx.get("environment") else ""
+    return f"Para {ctx['application']}{env}, o ideal e {product} com {factors[0]} adequada ao uso."
+
+
+def test_enumerates_investigation_space_respecting_skips():
+    contexts = list(synthesis_table.iter_contexts())
+    cimento = [c for p, c in contexts if p == "cimento"]
+    # area interna pula a pergunta de exposicao
+    assert {"application": "laje", "environment": "interna", "load_type": "residencial"} in cimento
+    assert not any(c.get("environment") == "interna" and "exposure" in c for c in cimento)
+    # aplicacao que ja diz o ambiente nao combina com o ambiente oposto
+    assert not any(c["application"] == "area externa" and c["environment"] == "interna" for c in cimento)
+    # argamassa_type nao entra no prompt: uma entrada por aplicacao
+    assert sorted(c["application"] for p, c in contexts if p == "argamassa") == ["assentamento", "cola", "reboco"]
+
+
+def test_live_path_uses_table_and_falls_back_to_llm(table, monkeypatch):
+    monkeypatch.setattr(llm_service, "llm_technical_synthesis", _fake_llm)
+    stats = synthesis_table.build_table()
+    assert stats["generated"] > 0 and stats["failed"] == 0
+    assert synthesis_table.build_table()["kept"] == stats["generated"]
+
+    calls = []
+
+    def _live_llm(product, ctx, factors):
+        calls.append(ctx)
+        return "sintese ao vivo"
+
+    monkeypatch.setattr(llm_service, "llm_technical_synthesis", _live_llm)
+    factors = llm_service.extract_product_factors("cimento")
+    ctx = {"product": "cimento", "application": "laje", "environment": "externo", "exposure": "exposta", "load_type": "garagem"}
+    out = llm_service.generate_technical_synthesis("cimento", ctx, factors)
+    assert out.startswith("Para laje externa") and not calls
+
+    # aplicacao fora dos enums: LLM com o texto original
+    ctx["application"] = "muro de arrimo"
+    assert llm_service.generate_technical_synthesis("cimento", ctx, factors) == "sintese ao vivo"
+    assert calls and calls[0]["application"] == "muro de arrimo"
+
+
+def test_stale_prompt_and_invalid_synthesis_are_not_served(table, monkeypatch):
+    monkeypatch.setattr(llm_service, "llm_technical_synthesis", _fake_llm)
+    synthesis_table.build_table()
+    ctx = {"application": "reboco", "environment": "interna", "load_type": "residencial"}
+    assert synthesis_table.lookup("cimento", ctx, llm_service.extract_product_factors("cimento"))
+    # fatores diferentes => prompt diferente => entrada velha nao vale
+    assert synthesis_table.lookup("cimento", ctx, ["outro fator"]) is None
+
+    assert synthesis_table.validate_synthesis("Para laje externa, use CP IV por durabilidade.", {"application": "laje", "environment": "interna"})
+    assert synthesis_table.validate_synthesis("Curto.", {"application": "laje"}) == "curta demais"